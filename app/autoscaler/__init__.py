@@ -0,0 +1,18 @@
+"""
+Autoscaler module: policy scaling worker, backend metrik/scaler dan simulator offline
+"""
+
+from .policy import QueueSample, ThresholdPolicy, RatePolicy, create_policy
+from .controller import WorkerAutoscaler
+from .simulator import SimulatedCluster, simulate, load_trace
+
+__all__ = [
+    "QueueSample",
+    "ThresholdPolicy",
+    "RatePolicy",
+    "create_policy",
+    "WorkerAutoscaler",
+    "SimulatedCluster",
+    "simulate",
+    "load_trace",
+]
@@ -0,0 +1,401 @@
+"""
+Backend metrik dan scaler untuk WorkerAutoscaler.
+
+Metric source punya satu method `sample() -> QueueSample`; scaler punya
+`current() -> int` dan `scale(target) -> bool`. Autoscaler asli memakai
+RabbitMQ + docker-compose, simulator memakai model cluster in-process
+dengan interface yang sama.
+
+- AUTOSCALER_METRICS: management (default, fallback ke amqp) | amqp
+- AUTOSCALER_SCALER: docker (default, Docker Engine API lewat socket) | compose
+"""
+
+import os
+import time
+import logging
+import json
+import socket
+import subprocess
+import http.client
+from urllib.parse import quote, urlencode
+import pika
+import requests
+from app.autoscaler.policy import QueueSample
+
+logger = logging.getLogger(__name__)
+
+
+def queue_names(queue_name: str = None, shards: int = None) -> list:
+    """Nama queue yang dipantau (satu per shard jika QUEUE_SHARDS > 0)"""
+    queue_name = queue_name or os.getenv("QUEUE_NAME", "telegram_updates")
+    shards = shards if shards is not None else int(os.getenv("QUEUE_SHARDS", 0))
+    if shards > 0:
+        return [f"{queue_name}.{shard}" for shard in range(shards)]
+    return [queue_name]
+
+
+class AmqpSource:
+    """Depth dan jumlah consumer lewat passive declare di satu koneksi AMQP yang dipakai ulang"""
+
+    def __init__(self):
+        self.rabbitmq_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
+        self.rabbitmq_port = int(os.getenv("RABBITMQ_PORT", 5672))
+        self.rabbitmq_user = os.getenv("RABBITMQ_USER", "guest")
+        self.rabbitmq_pass = os.getenv("RABBITMQ_PASS", "guest")
+        self.queue_names = queue_names()
+        self.connection = None
+        self.channel = None
+
+    def _get_channel(self):
+        if self.connection is None or self.connection.is_closed:
+            credentials = pika.PlainCredentials(self.rabbitmq_user, self.rabbitmq_pass)
+            parameters = pika.ConnectionParameters(
+                host=self.rabbitmq_host,
+                port=self.rabbitmq_port,
+                credentials=credentials,
+                heartbeat=60,
+                connection_attempts=3,
+                retry_delay=2
+            )
+            self.connection = pika.BlockingConnection(parameters)
+            self.channel = None
+        if self.channel is None or self.channel.is_closed:
+            # Passive declare queue yang tidak ada menutup channel; buka lagi
+            self.channel = self.connection.channel()
+        return self.channel
+
+    def get_queue_counts(self):
+        """Return (jumlah messages, jumlah consumer) di semua queue"""
+        try:
+            channel = self._get_channel()
+            # Layani heartbeat karena koneksi dibiarkan terbuka antar check
+            self.connection.process_data_events(0)
+
+            # Passive declare untuk get queue info tanpa create
+            message_count = 0
+            consumer_counts = []
+            for queue_name in self.queue_names:
+                queue = channel.queue_declare(queue=queue_name, passive=True)
+                message_count += queue.method.message_count
+                consumer_counts.append(queue.method.consumer_count)
+            # Shard: tiap worker subscribe ke semua shard, jadi jumlah worker
+            # terhubung = maks per queue (bukan jumlah semua consumer)
+            return message_count, max(consumer_counts) if len(consumer_counts) > 1 else consumer_counts[0]
+        except Exception as e:
+            logger.error(f"Error getting queue length: {e}")
+            self.close()
+            return 0, None
+
+    def get_queue_length(self):
+        """Get jumlah messages di RabbitMQ queue"""
+        return self.get_queue_counts()[0]
+
+    def sample(self) -> QueueSample:
+        ready, consumers = self.get_queue_counts()
+        return QueueSample(time.time(), ready, consumers=consumers)
+
+    def close(self):
+        try:
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
+
+
+# Kolom yang diminta dari management API (respons kecil, satu request untuk semua shard)
+QUEUE_COLUMNS = ",".join([
+    "name",
+    "messages_ready",
+    "messages_unacknowledged",
+    "consumers",
+    "consumer_utilisation",
+    "head_message_timestamp",
+    "message_stats.publish_details.rate",
+    "message_stats.ack_details.rate",
+])
+
+
+class ManagementApiSource:
+    """
+    Publish/ack rate, consumer utilisation dan umur pesan dari management API.
+    Satu session HTTP keep-alive, satu request per sampel untuk semua shard.
+    Catatan: RabbitMQ memperbarui statistik setiap collect_statistics_interval
+    (default 5 detik); check lebih cepat dari itu membaca angka yang sama.
+    """
+
+    def __init__(self, fallback=None):
+        host = os.getenv("RABBITMQ_HOST", "rabbitmq")
+        self.management_url = os.getenv("RABBITMQ_MANAGEMENT_URL", f"http://{host}:15672").rstrip("/")
+        self.vhost = os.getenv("RABBITMQ_VHOST", "/")
+        self.queue_names = set(queue_names())
+        self.fallback = fallback
+
+        self.session = requests.Session()
+        self.session.auth = (os.getenv("RABBITMQ_USER", "guest"), os.getenv("RABBITMQ_PASS", "guest"))
+
+    def sample(self) -> QueueSample:
+        if self.fallback is None:
+            return self._sample()
+        try:
+            return self._sample()
+        except Exception as e:
+            logger.warning(f"Management API unavailable, falling back to AMQP: {e}")
+        return self.fallback.sample()
+
+    def _get_queues(self) -> list:
+        response = self.session.get(
+            f"{self.management_url}/api/queues/{quote(self.vhost, safe='')}",
+            params={"columns": QUEUE_COLUMNS},
+            timeout=5
+        )
+        response.raise_for_status()
+        return [queue for queue in response.json() if queue.get("name") in self.queue_names]
+
+    def _active_workers(self) -> int:
+        """
+        Jumlah koneksi worker yang aktif di minimal satu shard.
+        Standby single-active-consumer (active=false) tidak dihitung.
+        """
+        response = self.session.get(
+            f"{self.management_url}/api/consumers/{quote(self.vhost, safe='')}",
+            timeout=5
+        )
+        response.raise_for_status()
+        connections = set()
+        for consumer in response.json():
+            if (consumer.get("queue") or {}).get("name") not in self.queue_names:
+                continue
+            if consumer.get("active", True):
+                connections.add((consumer.get("channel_details") or {}).get("connection_name"))
+        return len(connections)
+
+    def _sample(self) -> QueueSample:
+        now = time.time()
+        ready = unacked = consumers = 0
+        publish_rate = ack_rate = 0.0
+        utilisation = []
+        head_age = 0.0
+        for queue in self._get_queues():
+            stats = queue.get("message_stats") or {}
+            ready += queue.get("messages_ready", 0)
+            unacked += queue.get("messages_unacknowledged", 0)
+            consumers += queue.get("consumers", 0)
+            publish_rate += (stats.get("publish_details") or {}).get("rate", 0.0)
+            ack_rate += (stats.get("ack_details") or {}).get("rate", 0.0)
+            if queue.get("consumer_utilisation") is not None:
+                utilisation.append(queue["consumer_utilisation"])
+            if queue.get("head_message_timestamp"):
+                head_age = max(head_age, now - queue["head_message_timestamp"])
+        if len(self.queue_names) > 1:
+            # Consumer per queue menghitung tiap worker sekali per shard
+            consumers = self._active_workers()
+        return QueueSample(
+            timestamp=now,
+            ready=ready,
+            unacked=unacked,
+            consumers=consumers,
+            publish_rate=publish_rate,
+            ack_rate=ack_rate,
+            utilisation=sum(utilisation) / len(utilisation) if utilisation else None,
+            head_age=head_age
+        )
+
+    def close(self):
+        self.session.close()
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+class ComposeScaler:
+    """Scale service worker lewat CLI docker-compose"""
+
+    def __init__(self, compose_file: str = None, service: str = None):
+        self.compose_file = compose_file or os.getenv("COMPOSE_FILE", "docker-compose.yml")
+        self.worker_service = service or os.getenv("WORKER_SERVICE_NAME", "worker")
+
+    def current(self):
+        """Jumlah worker container yang running, None jika gagal dibaca"""
+        try:
+            result = subprocess.run(
+                ["docker-compose", "-f", self.compose_file, "ps", "-q", self.worker_service],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+            # Count non-empty lines (container IDs)
+            return len([line for line in result.stdout.strip().split('\n') if line])
+        except Exception as e:
+            logger.error(f"Error getting worker count: {e}")
+            return None
+
+    def scale(self, target: int) -> bool:
+        try:
+            subprocess.run(
+                ["docker-compose", "-f", self.compose_file, "up", "-d", "--scale",
+                 f"{self.worker_service}={target}", "--no-recreate"],
+                check=True,
+                capture_output=True
+            )
+            return True
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error scaling workers: {e}")
+            logger.error(f"stderr: {e.stderr.decode() if e.stderr else 'N/A'}")
+            return False
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DockerEngineClient:
+    """Client minimal Docker Engine API di atas unix socket (koneksi keep-alive)"""
+
+    def __init__(self, socket_path: str = None, timeout: float = None):
+        self.socket_path = socket_path or os.getenv("DOCKER_SOCKET", "/var/run/docker.sock")
+        self.timeout = timeout or float(os.getenv("DOCKER_API_TIMEOUT", 60))
+        self.connection = None
+
+    def request(self, method: str, path: str, params: dict = None, body: dict = None):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+
+        # Satu kali retry jika koneksi keep-alive sudah ditutup daemon
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = _UnixHTTPConnection(self.socket_path, self.timeout)
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+
+        if response.status >= 400:
+            raise RuntimeError(f"Docker API {method} {path}: {response.status} {data[:200]!r}")
+        return json.loads(data) if data else None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class DockerEngineScaler:
+    """
+    Scale service worker lewat Docker Engine API, tanpa proses CLI.
+    Container worker dikenali dari label compose (project + service).
+    Scale up meng-clone konfigurasi worker yang sedang jalan, scale down
+    menghentikan container bernomor tertinggi (graceful stop, lalu dihapus).
+    Jika belum ada worker untuk dijadikan template, scale diserahkan ke
+    fallback (docker-compose).
+    """
+
+    def __init__(self, client: DockerEngineClient = None, project: str = None, service: str = None,
+                 fallback=None):
+        self.client = client or DockerEngineClient()
+        self.worker_service = service or os.getenv("WORKER_SERVICE_NAME", "worker")
+        self.project = project or os.getenv("COMPOSE_PROJECT_NAME", "")
+        self.stop_timeout = int(os.getenv("WORKER_STOP_TIMEOUT", 30))
+        self.fallback = fallback
+
+    def _project(self) -> str:
+        if not self.project:
+            # Autoscaler berjalan di project compose yang sama: baca label container sendiri
+            own = self.client.request("GET", f"/containers/{socket.gethostname()}/json")
+            self.project = own["Config"]["Labels"]["com.docker.compose.project"]
+        return self.project
+
+    def _containers(self) -> list:
+        """Container worker yang running, urut nomor container compose"""
+        filters = {"label": [
+            f"com.docker.compose.project={self._project()}",
+            f"com.docker.compose.service={self.worker_service}",
+        ]}
+        containers = self.client.request("GET", "/containers/json", {"filters": json.dumps(filters)})
+        return sorted(containers, key=self._number)
+
+    @staticmethod
+    def _number(container: dict) -> int:
+        return int(container["Labels"].get("com.docker.compose.container-number", 0))
+
+    def current(self):
+        """Jumlah worker container yang running, None jika gagal dibaca"""
+        try:
+            return len(self._containers())
+        except Exception as e:
+            logger.error(f"Error getting worker count: {e}")
+            return None
+
+    def scale(self, target: int) -> bool:
+        try:
+            containers = self._containers()
+            if len(containers) < target:
+                if not containers:
+                    return self.fallback.scale(target) if self.fallback is not None else False
+                numbers = [self._number(container) for container in containers]
+                template = self.client.request("GET", f"/containers/{containers[0]['Id']}/json")
+                for number in range(max(numbers) + 1, max(numbers) + 1 + target - len(containers)):
+                    self._clone(template, number)
+            for container in reversed(containers[target:]):
+                self.client.request("POST", f"/containers/{container['Id']}/stop", {"t": self.stop_timeout})
+                self.client.request("DELETE", f"/containers/{container['Id']}")
+            return True
+        except Exception as e:
+            logger.error(f"Error scaling workers: {e}")
+            return False
+
+    def _clone(self, template: dict, number: int):
+        config = dict(template["Config"])
+        config.pop("Hostname", None)  # hostname default = id container baru
+        config["Labels"] = dict(config.get("Labels") or {}, **{
+            "com.docker.compose.container-number": str(number),
+        })
+        networks = list(template["NetworkSettings"]["Networks"])
+        config["HostConfig"] = template["HostConfig"]
+        # Create hanya menerima satu network, sisanya di-connect setelahnya
+        config["NetworkingConfig"] = {"EndpointsConfig": {
+            network: {"Aliases": [self.worker_service]} for network in networks[:1]
+        }}
+        name = f"{self._project()}-{self.worker_service}-{number}"
+        created = self.client.request("POST", "/containers/create", {"name": name}, config)
+        for network in networks[1:]:
+            self.client.request("POST", f"/networks/{network}/connect", body={
+                "Container": created["Id"],
+                "EndpointConfig": {"Aliases": [self.worker_service]},
+            })
+        self.client.request("POST", f"/containers/{created['Id']}/start")
+        logger.info(f"Started worker container {name}")
+
+
+def create_metric_source():
+    """Pilih sumber metrik dari env AUTOSCALER_METRICS (management | amqp)"""
+    backend = os.getenv("AUTOSCALER_METRICS", "management").lower()
+    if backend == "management":
+        return ManagementApiSource(fallback=AmqpSource())
+    if backend == "amqp":
+        return AmqpSource()
+    raise ValueError(f"Unknown autoscaler metrics backend: {backend}")
+
+
+def create_scaler():
+    """Pilih scaler dari env AUTOSCALER_SCALER (docker | compose)"""
+    backend = os.getenv("AUTOSCALER_SCALER", "docker").lower()
+    if backend == "docker":
+        return DockerEngineScaler(fallback=ComposeScaler())
+    if backend == "compose":
+        return ComposeScaler()
+    raise ValueError(f"Unknown autoscaler scaler backend: {backend}")
@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+from app.autoscaler.policy import create_policy
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerAutoscaler:
+    """
+    Loop autoscaler: ambil sampel metrik, tanya policy, scale.
+    Backend metrik/scaler bisa diganti (lihat app.autoscaler.backends),
+    simulator memakai step() yang sama dengan backend in-process.
+    """
+
+    def __init__(self, metrics=None, scaler=None, policy=None, min_workers: int = None, max_workers: int = None):
+        # Scaling Configuration
+        self.min_workers = min_workers or int(os.getenv("MIN_WORKERS", 1))
+        self.max_workers = max_workers or int(os.getenv("MAX_WORKERS", 10))
+        self.check_interval = float(os.getenv("CHECK_INTERVAL", 5))  # seconds
+        self.policy = policy or create_policy(min_workers=self.min_workers, max_workers=self.max_workers)
+
+        if metrics is None or scaler is None:
+            from app.autoscaler.backends import create_metric_source, create_scaler
+            metrics = metrics or create_metric_source()
+            scaler = scaler or create_scaler()
+        self.metrics = metrics
+        self.scaler = scaler
+
+        # Rekam laju masuk per check untuk di-replay simulator
+        self.trace_file = os.getenv("AUTOSCALER_TRACE_FILE", "")
+
+        self.current_workers = self.min_workers
+
+    def get_current_worker_count(self):
+        """Get jumlah worker yang running (nilai terakhir jika gagal dibaca)"""
+        count = self.scaler.current()
+        if count is not None:
+            self.current_workers = count if count > 0 else self.min_workers
+        return self.current_workers
+
+    def scale_workers(self, target_count):
+        """Scale workers ke target count"""
+        if target_count < self.min_workers:
+            target_count = self.min_workers
+        elif target_count > self.max_workers:
+            target_count = self.max_workers
+
+        if target_count == self.current_workers:
+            return False
+
+        logger.info(f"Scaling workers from {self.current_workers} to {target_count}")
+        if not self.scaler.scale(target_count):
+            return False
+        self.current_workers = target_count
+        logger.info(f"Successfully scaled to {target_count} workers")
+        return True
+
+    def _record(self, sample):
+        if self.trace_file and sample.publish_rate is not None:
+            with open(self.trace_file, "a") as f:
+                f.write(f"{sample.timestamp:.0f},{sample.publish_rate:.3f}\n")
+
+    def step(self, now: float = None):
+        """Satu putaran check; return target baru atau None"""
+        sample = self.metrics.sample()
+        current_workers = self.get_current_worker_count()
+        self._record(sample)
+
+        logger.info(f"Workers: {current_workers} | {sample}")
+
+        # Check if scaling needed
+        target_workers = self.policy.decide(sample, current_workers, time.time() if now is None else now)
+        if target_workers is None or not self.scale_workers(target_workers):
+            return None
+        return target_workers
+
+    def run(self):
+        """Main loop untuk monitoring dan scaling"""
+        logger.info("Worker Autoscaler started")
+        logger.info(f"Configuration:")
+        logger.info(f"  Min workers: {self.min_workers}")
+        logger.info(f"  Max workers: {self.max_workers}")
+        logger.info(f"  Policy: {self.policy.name}")
+        logger.info(f"  Backends: {type(self.metrics).__name__}, {type(self.scaler).__name__}")
+        logger.info(f"  Check interval: {self.check_interval}s")
+
+        # Initial scale to min workers
+        self.get_current_worker_count()
+        if self.current_workers < self.min_workers:
+            self.scale_workers(self.min_workers)
+
+        while True:
+            try:
+                self.step()
+            except KeyboardInterrupt:
+                logger.info("Autoscaler stopped by user")
+                break
+            except Exception as e:
+                logger.error(f"Error in autoscaler loop: {e}")
+
+            # Wait before next check
+            time.sleep(self.check_interval)
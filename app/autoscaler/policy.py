@@ -0,0 +1,201 @@
+"""
+Policy scaling worker.
+
+Policy hanya menghitung target dari sampel metrik dan waktu yang diberikan
+(tanpa I/O, tanpa time.time()), sehingga bisa dijalankan oleh autoscaler
+asli maupun simulator offline.
+
+- ThresholdPolicy: perilaku lama (pesan per worker, +/-1 worker per step,
+  satu cooldown).
+- RatePolicy: target = (laju masuk + backlog / waktu drain) dibagi laju
+  layanan per worker, lompat proporsional dengan hysteresis.
+"""
+
+import os
+import math
+from collections import deque
+
+
+class QueueSample:
+    """Satu sampel metrik queue. Field yang tidak tersedia bernilai None."""
+
+    __slots__ = ("timestamp", "ready", "unacked", "consumers", "publish_rate", "ack_rate",
+                 "utilisation", "head_age")
+
+    def __init__(self, timestamp, ready, unacked=0, consumers=None, publish_rate=None, ack_rate=None,
+                 utilisation=None, head_age=None):
+        self.timestamp = timestamp
+        self.ready = ready  # pesan menunggu di queue
+        self.unacked = unacked  # pesan sedang diproses worker
+        self.consumers = consumers  # worker yang benar-benar menerima pesan (tanpa standby/starting)
+        self.publish_rate = publish_rate  # pesan/detik masuk
+        self.ack_rate = ack_rate  # pesan/detik selesai
+        self.utilisation = utilisation  # consumer_utilisation RabbitMQ (0..1)
+        self.head_age = head_age  # detik pesan tertua menunggu
+
+    def __repr__(self):
+        return (
+            f"QueueSample(ready={self.ready}, unacked={self.unacked}, consumers={self.consumers}, "
+            f"publish_rate={self.publish_rate}, ack_rate={self.ack_rate}, "
+            f"utilisation={self.utilisation}, head_age={self.head_age})"
+        )
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    return max(low, min(value, high))
+
+
+class ThresholdPolicy:
+    """Policy lama: ready/worker dibanding threshold, satu langkah per cooldown"""
+
+    name = "threshold"
+
+    def __init__(self, min_workers: int = None, max_workers: int = None):
+        self.min_workers = min_workers or int(os.getenv("MIN_WORKERS", 1))
+        self.max_workers = max_workers or int(os.getenv("MAX_WORKERS", 10))
+        self.scale_up_threshold = int(os.getenv("SCALE_UP_THRESHOLD", 10))  # messages per worker
+        self.scale_down_threshold = int(os.getenv("SCALE_DOWN_THRESHOLD", 2))  # messages per worker
+        self.cooldown_period = float(os.getenv("COOLDOWN_PERIOD", 60))  # seconds
+        self.last_scale_time = float("-inf")
+
+    def decide(self, sample: QueueSample, workers: int, now: float):
+        """Return target worker, atau None jika tidak perlu scaling"""
+        if now - self.last_scale_time < self.cooldown_period:
+            return None
+        if workers == 0:
+            return self._scaled(self.min_workers, now)
+
+        messages_per_worker = sample.ready / workers
+        if messages_per_worker > self.scale_up_threshold and workers < self.max_workers:
+            return self._scaled(workers + 1, now)
+        if messages_per_worker < self.scale_down_threshold and workers > self.min_workers:
+            return self._scaled(workers - 1, now)
+        return None
+
+    def _scaled(self, target: int, now: float) -> int:
+        self.last_scale_time = now
+        return _clamp(target, self.min_workers, self.max_workers)
+
+
+class RatePolicy:
+    """
+    Policy berbasis laju.
+
+    desired = ceil((arrival + backlog / SCALE_DRAIN_SECONDS)
+                   / (service_rate_per_worker * SCALE_TARGET_UTILISATION))
+
+    - arrival dari publish rate (atau selisih backlog jika tidak tersedia)
+    - service rate per worker dari ack rate dibagi worker yang sibuk,
+      dihaluskan EWMA; awalnya SCALE_WORKER_RATE
+    - pesan tertua lebih lama dari SCALE_MAX_MESSAGE_AGE memaksa scale up
+      sebanding dengan umurnya
+    - scale up langsung ke target (maks SCALE_UP_MAX_FACTOR x per langkah),
+      scale down memakai target tertinggi selama SCALE_DOWN_WINDOW detik
+      dan hanya jika turun lebih dari SCALE_TOLERANCE
+    """
+
+    name = "rate"
+
+    def __init__(self, min_workers: int = None, max_workers: int = None):
+        self.min_workers = min_workers or int(os.getenv("MIN_WORKERS", 1))
+        self.max_workers = max_workers or int(os.getenv("MAX_WORKERS", 10))
+        self.target_utilisation = float(os.getenv("SCALE_TARGET_UTILISATION", 0.7))
+        self.drain_seconds = float(os.getenv("SCALE_DRAIN_SECONDS", 30))
+        self.max_message_age = float(os.getenv("SCALE_MAX_MESSAGE_AGE", 10))
+        self.up_max_factor = float(os.getenv("SCALE_UP_MAX_FACTOR", 4))
+        self.up_cooldown = float(os.getenv("SCALE_UP_COOLDOWN", 15))
+        self.down_window = float(os.getenv("SCALE_DOWN_WINDOW", 180))
+        self.tolerance = float(os.getenv("SCALE_TOLERANCE", 0.1))
+        self.rate_alpha = float(os.getenv("SCALE_RATE_ALPHA", 0.5))
+
+        self.service_rate = float(os.getenv("SCALE_WORKER_RATE", 5))  # pesan/detik per worker
+        self.arrival_rate = None
+        self._previous = None
+        self._desired = deque()  # (waktu, desired) untuk stabilisasi scale down
+        self.last_scale_up = float("-inf")
+
+    def _ewma(self, current, observed, alpha):
+        return observed if current is None else alpha * observed + (1 - alpha) * current
+
+    def observe(self, sample: QueueSample, workers: int):
+        """Perbarui estimasi laju masuk dan laju layanan per worker"""
+        backlog = sample.ready + sample.unacked
+
+        # Worker sibuk dihitung dari consumer aktif, bukan jumlah container:
+        # standby single-active-consumer dan worker yang masih start tidak
+        # memproses apa pun dan akan menurunkan estimasi laju per worker
+        active = workers if sample.consumers is None else min(workers, sample.consumers)
+        if sample.ready > 0:
+            busy = active
+        elif sample.utilisation is not None:
+            busy = active * (1 - sample.utilisation)
+        else:
+            busy = None
+
+        completed = sample.ack_rate
+        if completed is not None and busy is not None and busy >= 0.5 and completed > 0:
+            self.service_rate = self._ewma(self.service_rate, completed / busy, self.rate_alpha / 2)
+        if completed is None:
+            completed = min(busy or 0, workers) * self.service_rate
+
+        arrival = sample.publish_rate
+        if arrival is None:
+            if self._previous is None or sample.timestamp <= self._previous[0]:
+                arrival = completed
+            else:
+                elapsed = sample.timestamp - self._previous[0]
+                arrival = max(0.0, (backlog - self._previous[1]) / elapsed + completed)
+        self.arrival_rate = self._ewma(self.arrival_rate, arrival, self.rate_alpha)
+        self._previous = (sample.timestamp, backlog)
+
+    def desired_workers(self, sample: QueueSample, workers: int) -> int:
+        """Jumlah worker yang dibutuhkan menurut model laju (sebelum hysteresis)"""
+        demand = (self.arrival_rate or 0) + sample.ready / self.drain_seconds
+        capacity = max(self.service_rate, 1e-6) * self.target_utilisation
+        desired = math.ceil(demand / capacity - 1e-9)
+
+        if sample.head_age is not None and sample.head_age > self.max_message_age and workers > 0:
+            # Pesan sudah terlalu lama menunggu: model meleset, tambah sebanding umur
+            boost = min(sample.head_age / self.max_message_age, self.up_max_factor)
+            desired = max(desired, math.ceil(workers * boost))
+        return _clamp(desired, self.min_workers, self.max_workers)
+
+    def decide(self, sample: QueueSample, workers: int, now: float):
+        """Return target worker, atau None jika tidak perlu scaling"""
+        self.observe(sample, workers)
+        desired = self.desired_workers(sample, workers)
+
+        self._desired.append((now, desired))
+        while self._desired and self._desired[0][0] < now - self.down_window:
+            self._desired.popleft()
+
+        if workers < self.min_workers:
+            return self.min_workers
+
+        if desired > workers * (1 + self.tolerance):
+            if now - self.last_scale_up < self.up_cooldown:
+                return None
+            self.last_scale_up = now
+            # Reset jendela supaya scale down tidak langsung membatalkan scale up
+            self._desired.clear()
+            self._desired.append((now, desired))
+            return min(desired, max(workers + 1, math.floor(workers * self.up_max_factor)))
+
+        stable = max(target for _, target in self._desired)
+        if stable < workers * (1 - self.tolerance) and workers > self.min_workers:
+            return _clamp(stable, self.min_workers, self.max_workers)
+        return None
+
+
+POLICIES = {
+    ThresholdPolicy.name: ThresholdPolicy,
+    RatePolicy.name: RatePolicy,
+}
+
+
+def create_policy(name: str = None, **kwargs):
+    """Buat policy dari nama (default env SCALING_POLICY)"""
+    name = (name or os.getenv("SCALING_POLICY", "rate")).lower()
+    if name not in POLICIES:
+        raise ValueError(f"Unknown scaling policy: {name}")
+    return POLICIES[name](**kwargs)
@@ -0,0 +1,265 @@
+"""
+Simulator discrete-event untuk membandingkan policy scaling offline.
+
+Pesan datang sebagai proses Poisson mengikuti trace laju (pesan/detik untuk
+tiap detik; sintetis, atau rekaman AUTOSCALER_TRACE_FILE lewat load_trace).
+Tiap worker memproses satu pesan sekaligus dengan waktu layanan eksponensial
+(rata-rata 1/worker_rate), worker baru aktif setelah startup_delay, dan
+worker yang di-scale down menyelesaikan pesan yang sedang diproses dulu.
+
+SimulatedCluster mengimplementasikan interface metric source dan scaler
+(app.autoscaler.backends), sehingga yang dijalankan adalah
+WorkerAutoscaler.step() yang sama dengan produksi.
+"""
+
+import math
+import heapq
+import random
+from collections import deque
+from app.autoscaler.policy import QueueSample
+
+ARRIVAL, DONE, READY, CHECK = range(4)
+
+
+def burst_trace(duration: int = 1800, base: float = 5, peak: float = 60, start: int = 300,
+                length: int = 300) -> list:
+    """Trace sintetis: beban dasar lalu satu lonjakan"""
+    return [peak if start <= second < start + length else base for second in range(duration)]
+
+
+def diurnal_trace(duration: int = 3600, low: float = 2, high: float = 40, period: int = 1200) -> list:
+    """Trace sintetis: beban naik-turun seperti gelombang"""
+    return [
+        low + (high - low) * (1 - math.cos(2 * math.pi * second / period)) / 2
+        for second in range(duration)
+    ]
+
+
+def load_trace(path: str) -> list:
+    """
+    Baca trace rekaman menjadi laju per detik.
+    Format per baris: `timestamp,rate` (AUTOSCALER_TRACE_FILE) atau `rate`
+    saja (satu baris per detik). Laju ditahan sampai baris berikutnya.
+    """
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split(",")
+            if len(parts) == 1:
+                rows.append((float(len(rows)), float(parts[0])))
+            else:
+                rows.append((float(parts[0]), float(parts[1])))
+    if not rows:
+        raise ValueError(f"Empty trace: {path}")
+
+    rows.sort()
+    trace = []
+    span = 1
+    for (timestamp, rate), following in zip(rows, rows[1:] + [None]):
+        if following is not None:
+            span = max(1, round(following[0] - timestamp))
+        trace.extend([rate] * span)
+    return trace
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+class SimulatedCluster:
+    """Queue + pool worker in-process (metric source dan scaler sekaligus)"""
+
+    def __init__(self, trace: list, worker_rate: float, startup_delay: float, workers: int, seed: int = 42):
+        self.trace = trace
+        self.worker_rate = worker_rate
+        self.startup_delay = startup_delay
+        self.rng = random.Random(seed)
+
+        self.now = 0.0
+        self._events = []
+        self._seq = 0
+        self._arrivals = self._arrival_times()
+
+        self.queue = deque()  # waktu masuk pesan yang menunggu
+        self.idle = workers
+        self.busy = 0
+        self.starting = 0
+        self.draining = 0  # worker sibuk yang berhenti setelah pesan sekarang
+        self._cancelled = 0  # event READY milik worker yang batal di-start
+
+        self.waits = []
+        self.worker_seconds = 0.0
+        self.scale_history = []  # (waktu, dari, ke)
+
+        # Akumulasi sejak sampel terakhir
+        self._sampled_at = 0.0
+        self._arrived = 0
+        self._completed = 0
+        self._busy_area = 0.0
+        self._active_area = 0.0
+
+    def _arrival_times(self):
+        """Proses Poisson dengan laju konstan per detik"""
+        for second, rate in enumerate(self.trace):
+            if rate <= 0:
+                continue
+            moment = second + self.rng.expovariate(rate)
+            while moment < second + 1:
+                yield moment
+                moment += self.rng.expovariate(rate)
+
+    def push(self, moment: float, kind: int):
+        self._seq += 1
+        heapq.heappush(self._events, (moment, self._seq, kind))
+
+    def _advance(self, moment: float):
+        elapsed = moment - self.now
+        self.worker_seconds += (self.idle + self.busy + self.starting) * elapsed
+        self._busy_area += self.busy * elapsed
+        self._active_area += (self.idle + self.busy) * elapsed
+        self.now = moment
+
+    def _dispatch(self):
+        while self.idle and self.queue:
+            self.waits.append(self.now - self.queue.popleft())
+            self.idle -= 1
+            self.busy += 1
+            self.push(self.now + self.rng.expovariate(self.worker_rate), DONE)
+
+    def next_arrival(self):
+        moment = next(self._arrivals, None)
+        if moment is not None:
+            self.push(moment, ARRIVAL)
+
+    def handle(self, kind: int):
+        if kind == ARRIVAL:
+            self.queue.append(self.now)
+            self._arrived += 1
+            self.next_arrival()
+        elif kind == DONE:
+            self.busy -= 1
+            self._completed += 1
+            if self.draining:
+                self.draining -= 1
+            else:
+                self.idle += 1
+        elif kind == READY:
+            if self._cancelled:
+                self._cancelled -= 1
+                return
+            self.starting -= 1
+            self.idle += 1
+        self._dispatch()
+
+    @property
+    def workers(self) -> int:
+        return self.idle + self.busy - self.draining + self.starting
+
+    # Metric source
+    def sample(self) -> QueueSample:
+        elapsed = self.now - self._sampled_at
+        sample = QueueSample(
+            timestamp=self.now,
+            ready=len(self.queue),
+            unacked=self.busy,
+            consumers=self.idle + self.busy,
+            publish_rate=self._arrived / elapsed if elapsed else None,
+            ack_rate=self._completed / elapsed if elapsed else None,
+            # Proporsi waktu consumer siap menerima pesan (seperti consumer_utilisation)
+            utilisation=1 - self._busy_area / self._active_area if self._active_area else None,
+            head_age=self.now - self.queue[0] if self.queue else 0.0,
+        )
+        self._sampled_at = self.now
+        self._arrived = self._completed = 0
+        self._busy_area = self._active_area = 0.0
+        return sample
+
+    # Scaler
+    def current(self) -> int:
+        return self.workers
+
+    def scale(self, target: int) -> bool:
+        self.scale_history.append((self.now, self.workers, target))
+        change = target - self.workers
+        while change > 0 and self.draining:
+            self.draining -= 1
+            change -= 1
+        for _ in range(change):
+            self.starting += 1
+            self.push(self.now + self.startup_delay, READY)
+        for _ in range(-change):
+            # Batalkan worker yang belum aktif, lalu yang menganggur, lalu drain yang sibuk
+            if self.starting:
+                self.starting -= 1
+                self._cancelled += 1
+            elif self.idle:
+                self.idle -= 1
+            else:
+                self.draining += 1
+        return True
+
+
+def oscillations(scale_history: list) -> int:
+    """Jumlah pergantian arah scaling (naik lalu turun atau sebaliknya)"""
+    directions = [1 if target > before else -1 for _, before, target in scale_history if target != before]
+    return sum(1 for previous, current in zip(directions, directions[1:]) if previous != current)
+
+
+def simulate(policy, trace: list, worker_rate: float = 5, startup_delay: float = 10,
+             check_interval: float = 5, initial_workers: int = None, seed: int = 42,
+             max_drain: float = 3600) -> dict:
+    """
+    Jalankan trace melalui WorkerAutoscaler dengan policy ini.
+    Setelah trace habis simulasi berlanjut sampai queue kosong (maks max_drain detik).
+
+    Returns:
+        dict ringkasan: wait p50/p99/maks (detik), worker-seconds,
+        jumlah event scaling dan osilasi
+    """
+    from app.autoscaler.controller import WorkerAutoscaler
+
+    workers = initial_workers or policy.min_workers
+    cluster = SimulatedCluster(trace, worker_rate, startup_delay, workers, seed)
+    autoscaler = WorkerAutoscaler(
+        metrics=cluster,
+        scaler=cluster,
+        policy=policy,
+        min_workers=policy.min_workers,
+        max_workers=policy.max_workers,
+    )
+    autoscaler.current_workers = workers
+
+    end = float(len(trace))
+    cluster.next_arrival()
+    cluster.push(check_interval, CHECK)
+    while cluster._events:
+        moment, _, kind = heapq.heappop(cluster._events)
+        if moment >= end and not cluster.queue and not cluster.busy:
+            break
+        if moment > end + max_drain:
+            break
+        cluster._advance(moment)
+        if kind == CHECK:
+            autoscaler.step(moment)
+            cluster.push(moment + check_interval, CHECK)
+        else:
+            cluster.handle(kind)
+
+    waits = cluster.waits
+    return {
+        "policy": policy.name,
+        "messages": len(waits),
+        "p50_wait": percentile(waits, 50),
+        "p99_wait": percentile(waits, 99),
+        "max_wait": max(waits) if waits else 0.0,
+        "unserved": len(cluster.queue),
+        "worker_seconds": cluster.worker_seconds,
+        "scale_events": len(cluster.scale_history),
+        "oscillations": oscillations(cluster.scale_history),
+    }
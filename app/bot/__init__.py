@@ -3,6 +3,6 @@ Bot module untuk Telegram handlers dan API wrapper
 """
 
 from .handlers import BotHandler
-from .telegram_api import TelegramAPI
+from .telegram_api import TelegramAPI, AsyncTelegramAPI
 
-__all__ = ["BotHandler", "TelegramAPI"]
+__all__ = ["BotHandler", "TelegramAPI", "AsyncTelegramAPI"]
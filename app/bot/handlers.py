@@ -1,104 +1,150 @@
 import os
+import re
 import logging
 from sqlalchemy.orm import Session
 from app.bot.telegram_api import TelegramAPI
+from app.bot.router import CommandRouter, CommandContext
 from app.services.stock_service import StockService
+from app.services.leaderboard import PopularStocks, WINDOWS
 from app.database import crud
-from app.database.models import User
+from app.database.analytics import QueryLogBuffer
+from app.database.db import SessionLocal
+from app.database.user_cache import UserIdentityCache
 
 logger = logging.getLogger(__name__)
 
+# Argumen /alert: "BBCA > 9800" atau "BBCA < 9000"
+ALERT_PATTERN = re.compile(r"^([A-Za-z]+)\s*([<>])=?\s*([\d.,]+)$")
+
+# Harga: grup ribuan 3 digit dengan titik atau koma ("9.800", "1,250,000")
+# atau angka polos, opsional desimal maks 2 digit ("9.800,50", "98,5")
+PRICE_PATTERN = re.compile(r"^(\d{1,3}(?:([.,])\d{3})(?:\2\d{3})*|\d+)(?:([.,])(\d{1,2}))?$")
+ALERT_USAGE = "❌ Format salah. Gunakan: /alert BBCA > 9800 atau /alert BBCA < 9000"
+
+def parse_price(text: str) -> float:
+    """
+    Parse harga dari input user. "9.800" dibaca 9800 (penulisan Indonesia),
+    bukan 9.8. Raise ValueError untuk input tidak valid atau ambigu
+    (mis. "9.800.50": pemisah desimal sama dengan pemisah ribuan).
+    """
+    match = PRICE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Invalid price: {text}")
+    integer, group_sep, decimal_sep, fraction = match.groups()
+    if group_sep and decimal_sep == group_sep:
+        raise ValueError(f"Ambiguous price: {text}")
+    if group_sep:
+        integer = integer.replace(group_sep, "")
+    value = float(f"{integer}.{fraction}" if fraction else integer)
+    if value <= 0:
+        raise ValueError(f"Price must be positive: {text}")
+    return value
+
 class BotHandler:
     def __init__(self):
         self.telegram = TelegramAPI()
         self.stock_service = StockService()
+        self.watchlist_page_size = int(os.getenv("WATCHLIST_PAGE_SIZE", 20))
+        self.users = UserIdentityCache()
+        self.analytics = QueryLogBuffer(SessionLocal, users=self.users)
+        self.popular = PopularStocks(SessionLocal)
+        self.router = CommandRouter(users=self.users, on_throttled=self._handle_throttled)
+        self._register_commands()
+    
+    def _register_commands(self):
+        """Daftar command; command baru cukup ditambahkan di sini"""
+        add = self.router.add
+        add("start", self._handle_start)
+        add("help", self._handle_help)
+        add("harga", self._handle_stock_price, rate_class="quote",
+            usage="/harga BBCA", description="Cek harga saham", fallback=True)
+        add("info", self._handle_stock_info, rate_class="quote",
+            usage="/info BBCA", description="Info detail saham")
+        add("watchlist", self._handle_watchlist, needs_user=True, rate_class="quote",
+            description="Lihat watchlist Anda")
+        add("tambah", self._handle_add_watchlist, needs_user=True, rate_class="write",
+            usage="/tambah BBCA", description="Tambah ke watchlist")
+        add("hapus", self._handle_remove_watchlist, needs_user=True, rate_class="write",
+            usage="/hapus BBCA", description="Hapus dari watchlist")
+        add("alert", self._handle_add_alert, needs_user=True, rate_class="write",
+            usage="/alert BBCA > 9800", description="Pasang alert harga")
+        add("alerts", self._handle_list_alerts, needs_user=True, rate_class="quote",
+            description="Lihat alert aktif")
+        add("hapusalert", self._handle_remove_alert, needs_user=True, rate_class="write",
+            usage="/hapusalert ID", description="Hapus alert")
+        add("populer", self._handle_popular, rate_class="quote",
+            usage="/populer 24h", description="Saham paling dicari (1h/24h/7d)")
+        
+        self.router.add_callback("stock", self._handle_stock_info, rate_class="quote")
+        self.router.add_callback("watchlist", self._handle_watchlist_page, needs_user=True, rate_class="quote")
     
     def handle_message(self, message: dict, db: Session):
         """Handle incoming message"""
-        chat_id = message["chat"]["id"]
-        text = message.get("text", "")
-        user_data = message["from"]
-        
-        # Simpan/update user
-        user = crud.get_or_create_user(
-            db,
-            telegram_id=user_data["id"],
-            username=user_data.get("username"),
-            first_name=user_data.get("first_name"),
-            last_name=user_data.get("last_name")
-        )
-        
-        # Handle commands
-        if text.startswith("/start"):
-            self._handle_start(chat_id)
-        elif text.startswith("/help"):
-            self._handle_help(chat_id)
-        elif text.startswith("/harga"):
-            self._handle_stock_price(chat_id, text)
-        elif text.startswith("/watchlist"):
-            self._handle_watchlist(chat_id, user, db)
-        elif text.startswith("/tambah"):
-            self._handle_add_watchlist(chat_id, user, text, db)
-        elif text.startswith("/hapus"):
-            self._handle_remove_watchlist(chat_id, user, text, db)
-        elif text.startswith("/info"):
-            self._handle_stock_info(chat_id, text)
-        else:
-            # Anggap sebagai ticker symbol
-            self._handle_stock_price(chat_id, text)
+        # User di-resolve lazily sesuai metadata command: /start, /help dan
+        # query harga tidak menyentuh Postgres (analytics di-resolve saat flush)
+        self.router.dispatch_message(message, db, on_unknown=self._handle_unknown)
+    
+    def writes_db(self, update_data: dict) -> bool:
+        """True jika update ditangani command yang memakai session DB"""
+        command = self.router.command_for(update_data)
+        return command is not None and command.needs_db
+    
+    def close(self):
+        """Flush analytics dan tutup koneksi keluar (graceful shutdown)"""
+        self.analytics.close()
+        self.telegram.close()
     
     def handle_callback(self, callback: dict, db: Session):
         """Handle callback query dari inline buttons"""
-        callback_id = callback["id"]
-        chat_id = callback["message"]["chat"]["id"]
-        data = callback["data"]
-        
-        if data.startswith("stock_"):
-            symbol = data.replace("stock_", "")
-            self._handle_stock_info(chat_id, f"/info {symbol}")
+        self.router.dispatch_callback(callback, db)
         
         # Answer callback query
-        self.telegram.answer_callback_query(callback_id)
+        self.telegram.answer_callback_query(callback["id"])
+    
+    def _handle_unknown(self, chat_id: int):
+        """Command tidak dikenal: beri petunjuk hanya di chat private"""
+        if chat_id > 0:
+            self.telegram.send_message(chat_id, "❓ Perintah tidak dikenal. Gunakan /help.")
+    
+    def _handle_throttled(self, chat_id: int, command):
+        """Command ditolak rate limit per user: beri tahu, jangan diam saja"""
+        self.telegram.send_message(chat_id, "⏳ Terlalu banyak permintaan. Coba lagi sebentar lagi.")
     
-    def _handle_start(self, chat_id: int):
+    def _handle_start(self, ctx: CommandContext):
         """Handle /start command"""
         message = (
             "🤖 *Selamat datang di Stock Bot!*\n\n"
             "Bot ini membantu Anda memantau harga saham.\n\n"
             "Gunakan /help untuk melihat daftar perintah."
         )
-        self.telegram.send_message(chat_id, message)
+        self.telegram.send_message(ctx.chat_id, message)
     
-    def _handle_help(self, chat_id: int):
-        """Handle /help command"""
-        message = (
-            "📋 *Daftar Perintah:*\n\n"
-            "/harga BBCA - Cek harga saham\n"
-            "/info BBCA - Info detail saham\n"
-            "/watchlist - Lihat watchlist Anda\n"
-            "/tambah BBCA - Tambah ke watchlist\n"
-            "/hapus BBCA - Hapus dari watchlist\n\n"
-            "Atau langsung ketik kode saham (contoh: BBCA)"
-        )
-        self.telegram.send_message(chat_id, message)
-    
-    def _handle_stock_price(self, chat_id: int, text: str):
-        """Handle stock price request"""
-        parts = text.split()
-        if len(parts) < 2 and not text.startswith("/"):
-            symbol = text.strip().upper()
-        elif len(parts) >= 2:
-            symbol = parts[1].upper()
-        else:
+    def _handle_help(self, ctx: CommandContext):
+        """Handle /help command (daftar dari metadata router)"""
+        lines = ["📋 *Daftar Perintah:*", ""]
+        for command in self.router.commands():
+            if command.description:
+                lines.append(f"{command.usage} - {command.description}")
+        lines.append("")
+        lines.append("Atau langsung ketik kode saham (contoh: BBCA)")
+        self.telegram.send_message(ctx.chat_id, "\n".join(lines))
+    
+    def _handle_stock_price(self, ctx: CommandContext):
+        """Handle stock price request (/harga BBCA atau kode saham langsung)"""
+        chat_id = ctx.chat_id
+        if not ctx.args:
             self.telegram.send_message(
                 chat_id,
                 "❌ Format salah. Gunakan: /harga BBCA"
             )
             return
+        symbol = ctx.args[0].upper()
         
         stock_data = self.stock_service.get_stock_price(symbol)
         
         if stock_data:
+            if ctx.user_data is not None:
+                self.analytics.record_user(ctx.user_data, symbol, "price")
             change_emoji = "🟢" if stock_data["change_percent"] >= 0 else "🔴"
             message = (
                 f"📈 *{stock_data['symbol']}*\n\n"
@@ -116,27 +162,30 @@ class BotHandler:
             }
             
             self.telegram.send_message(chat_id, message, reply_markup=keyboard)
-        else:
+        elif not ctx.implicit:
+            # Teks biasa yang kebetulan 4 huruf tidak perlu dibalas
             self.telegram.send_message(
                 chat_id,
                 f"❌ Saham {symbol} tidak ditemukan."
             )
     
-    def _handle_stock_info(self, chat_id: int, text: str):
-        """Handle detailed stock info"""
-        parts = text.split()
-        if len(parts) >= 2:
-            symbol = parts[1].upper()
-        else:
+    def _handle_stock_info(self, ctx: CommandContext):
+        """Handle detailed stock info (/info BBCA atau tombol stock_BBCA)"""
+        chat_id = ctx.chat_id
+        if not ctx.args:
             self.telegram.send_message(
                 chat_id,
                 "❌ Format salah. Gunakan: /info BBCA"
             )
             return
+        symbol = ctx.args[0].upper()
         
         info = self.stock_service.get_stock_info(symbol)
         
         if info:
+            # Tombol inline tidak dicatat (sama seperti sebelumnya)
+            if ctx.callback is None and ctx.user_data is not None:
+                self.analytics.record_user(ctx.user_data, symbol, "info")
             message = (
                 f"ℹ️ *{info['symbol']} - {info['name']}*\n\n"
                 f"Harga: Rp {info['price']:,.0f}\n"
@@ -152,36 +201,109 @@ class BotHandler:
                 f"❌ Info untuk {symbol} tidak tersedia."
             )
     
-    def _handle_watchlist(self, chat_id: int, user: User, db: Session):
+    def _handle_popular(self, ctx: CommandContext):
+        """Handle /populer [1h|24h|7d]"""
+        chat_id = ctx.chat_id
+        window = ctx.args[0].lower() if ctx.args else "24h"
+        if window not in WINDOWS:
+            self.telegram.send_message(
+                chat_id,
+                "❌ Format salah. Gunakan: /populer 1h, /populer 24h atau /populer 7d"
+            )
+            return
+        
+        board = self.popular.top(window, 10)
+        if not board:
+            self.telegram.send_message(chat_id, f"📊 Belum ada data untuk {window} terakhir.")
+            return
+        
+        lines = [f"📊 *Saham Terpopuler ({window}):*", ""]
+        for rank, item in enumerate(board, 1):
+            lines.append(f"{rank}. {item['symbol']} - {item['count']:,} query")
+        self.telegram.send_message(chat_id, "\n".join(lines))
+    
+    def _handle_watchlist(self, ctx: CommandContext):
         """Handle watchlist command"""
-        watchlist = crud.get_user_watchlist(db, user.id)
+        chat_id = ctx.chat_id
+        watchlist = crud.get_user_watchlist(ctx.db, ctx.user_id)
         
         if watchlist:
-            message = "⭐ *Watchlist Anda:*\n\n"
-            for item in watchlist:
-                stock_data = self.stock_service.get_stock_price(item.symbol)
-                if stock_data:
-                    change_emoji = "🟢" if stock_data["change_percent"] >= 0 else "🔴"
-                    message += (
-                        f"• {item.symbol}: Rp {stock_data['price']:,.0f} "
-                        f"{change_emoji} {stock_data['change_percent']:+.2f}%\n"
-                    )
-            self.telegram.send_message(chat_id, message)
+            message, keyboard = self._render_watchlist(
+                [item.symbol for item in watchlist], 0
+            )
+            self.telegram.send_message(chat_id, message, reply_markup=keyboard)
         else:
             self.telegram.send_message(
                 chat_id,
                 "📋 Watchlist Anda masih kosong.\nGunakan /tambah BBCA untuk menambah."
             )
     
-    def _handle_add_watchlist(self, chat_id: int, user: User, text: str, db: Session):
+    def _handle_watchlist_page(self, ctx: CommandContext):
+        """Handle tombol next/prev watchlist: edit pesan ke halaman lain"""
+        if not ctx.text.isdigit():
+            return
+        watchlist = crud.get_user_watchlist(ctx.db, ctx.user_id)
+        if not watchlist:
+            return
+        
+        message, keyboard = self._render_watchlist(
+            [item.symbol for item in watchlist], int(ctx.text)
+        )
+        self.telegram.edit_message_text(
+            ctx.chat_id,
+            ctx.callback["message"]["message_id"],
+            message,
+            reply_markup=keyboard
+        )
+    
+    def _render_watchlist(self, symbols: list, page: int):
+        """
+        Render satu halaman watchlist.
+        Quote untuk semua symbol di halaman diambil dengan satu batch lookup.
+        
+        Returns:
+            (text, reply_markup) - reply_markup None jika hanya satu halaman
+        """
+        size = self.watchlist_page_size
+        total_pages = max(1, -(-len(symbols) // size))
+        page = min(max(page, 0), total_pages - 1)
+        page_symbols = symbols[page * size:(page + 1) * size]
+        
+        quotes = self.stock_service.get_stock_prices(page_symbols)
+        
+        header = "⭐ *Watchlist Anda:*"
+        if total_pages > 1:
+            header += f" ({page + 1}/{total_pages})"
+        lines = [header, ""]
+        for symbol in page_symbols:
+            stock_data = quotes.get(symbol)
+            if stock_data:
+                change_emoji = "🟢" if stock_data["change_percent"] >= 0 else "🔴"
+                lines.append(
+                    f"• {symbol}: Rp {stock_data['price']:,.0f} "
+                    f"{change_emoji} {stock_data['change_percent']:+.2f}%"
+                )
+        message = "\n".join(lines) + "\n"
+        
+        if total_pages == 1:
+            return message, None
+        
+        buttons = []
+        if page > 0:
+            buttons.append({"text": "⬅️ Prev", "callback_data": f"watchlist_{page - 1}"})
+        if page < total_pages - 1:
+            buttons.append({"text": "Next ➡️", "callback_data": f"watchlist_{page + 1}"})
+        return message, {"inline_keyboard": [buttons]}
+    
+    def _handle_add_watchlist(self, ctx: CommandContext):
         """Handle add to watchlist"""
-        parts = text.split()
-        if len(parts) >= 2:
-            symbol = parts[1].upper()
+        chat_id = ctx.chat_id
+        if ctx.args:
+            symbol = ctx.args[0].upper()
             
             # Validasi saham exists
             if self.stock_service.get_stock_price(symbol):
-                if crud.add_to_watchlist(db, user.id, symbol):
+                if crud.add_to_watchlist(ctx.db, ctx.user_id, symbol):
                     self.telegram.send_message(
                         chat_id,
                         f"✅ {symbol} ditambahkan ke watchlist."
@@ -202,13 +324,13 @@ class BotHandler:
                 "❌ Format salah. Gunakan: /tambah BBCA"
             )
     
-    def _handle_remove_watchlist(self, chat_id: int, user: User, text: str, db: Session):
+    def _handle_remove_watchlist(self, ctx: CommandContext):
         """Handle remove from watchlist"""
-        parts = text.split()
-        if len(parts) >= 2:
-            symbol = parts[1].upper()
+        chat_id = ctx.chat_id
+        if ctx.args:
+            symbol = ctx.args[0].upper()
             
-            if crud.remove_from_watchlist(db, user.id, symbol):
+            if crud.remove_from_watchlist(ctx.db, ctx.user_id, symbol):
                 self.telegram.send_message(
                     chat_id,
                     f"✅ {symbol} dihapus dari watchlist."
@@ -222,4 +344,62 @@ class BotHandler:
             self.telegram.send_message(
                 chat_id,
                 "❌ Format salah. Gunakan: /hapus BBCA"
-            )
\ No newline at end of file
+            )
+    
+    def _handle_add_alert(self, ctx: CommandContext):
+        """Handle /alert BBCA > 9800"""
+        chat_id = ctx.chat_id
+        match = ALERT_PATTERN.match(ctx.text)
+        try:
+            threshold = parse_price(match.group(3)) if match else None
+        except ValueError:
+            threshold = None
+        if threshold is None:
+            self.telegram.send_message(chat_id, ALERT_USAGE)
+            return
+        
+        symbol = match.group(1).upper()
+        direction = "above" if match.group(2) == ">" else "below"
+        
+        if not self.stock_service.get_stock_price(symbol):
+            self.telegram.send_message(chat_id, f"❌ Saham {symbol} tidak ditemukan.")
+            return
+        
+        alert = crud.create_alert(ctx.db, ctx.user_id, chat_id, symbol, direction, threshold)
+        self.telegram.send_message(
+            chat_id,
+            f"🔔 Alert #{alert.id} dipasang: {symbol} {match.group(2)} Rp {threshold:,.0f}"
+        )
+    
+    def _handle_list_alerts(self, ctx: CommandContext):
+        """Handle /alerts"""
+        chat_id = ctx.chat_id
+        alerts = crud.get_user_alerts(ctx.db, ctx.user_id)
+        if not alerts:
+            self.telegram.send_message(
+                chat_id,
+                "🔕 Belum ada alert aktif.\nGunakan /alert BBCA > 9800 untuk memasang."
+            )
+            return
+        
+        lines = ["🔔 *Alert Aktif:*", ""]
+        for alert in alerts:
+            sign = ">" if alert.direction == "above" else "<"
+            lines.append(f"#{alert.id} {alert.symbol} {sign} Rp {alert.threshold:,.0f}")
+        self.telegram.send_message(chat_id, "\n".join(lines))
+    
+    def _handle_remove_alert(self, ctx: CommandContext):
+        """Handle /hapusalert ID"""
+        chat_id = ctx.chat_id
+        if not ctx.args or not ctx.args[0].lstrip("#").isdigit():
+            self.telegram.send_message(
+                chat_id,
+                "❌ Format salah. Gunakan: /hapusalert ID"
+            )
+            return
+        
+        alert_id = int(ctx.args[0].lstrip("#"))
+        if crud.deactivate_alert(ctx.db, ctx.user_id, alert_id):
+            self.telegram.send_message(chat_id, f"✅ Alert #{alert_id} dihapus.")
+        else:
+            self.telegram.send_message(chat_id, f"❌ Alert #{alert_id} tidak ditemukan.")
\ No newline at end of file
@@ -0,0 +1,366 @@
+"""
+Scheduler pengiriman ke Telegram Bot API yang sadar rate limit.
+
+Telegram membatasi bot ~30 pesan/detik secara global, ~1 pesan/detik per
+chat private dan ~20 pesan/menit per grup. Scheduler memakai token bucket
+global + per chat, antrian berprioritas (callback answer > reply > broadcast)
+dan menghormati `retry_after` dari response 429.
+
+State bucket disimpan di backend yang bisa diganti:
+- MemoryRateLimitBackend: default, per proses
+- RedisRateLimitBackend: dibagi antar worker (RATE_LIMIT_BACKEND=redis)
+"""
+
+import os
+import time
+import itertools
+import threading
+import logging
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CALLBACK = 0
+PRIORITY_REPLY = 1
+PRIORITY_BROADCAST = 2
+
+GLOBAL_KEY = "tg:global"
+
+
+class TelegramRetryAfter(Exception):
+    """Response 429 dari Telegram beserta retry_after (detik)"""
+
+    def __init__(self, retry_after: float, description: str = ""):
+        super().__init__(f"Too Many Requests: retry after {retry_after}s {description}".strip())
+        self.retry_after = retry_after
+
+
+class MemoryRateLimitBackend:
+    """Token bucket in-process (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, last_refill, blocked_until]
+
+    def try_acquire(self, buckets: list) -> float:
+        """
+        Ambil satu token dari semua bucket sekaligus (all-or-nothing).
+
+        Args:
+            buckets: list (key, rate per detik, burst)
+
+        Returns:
+            0 jika berhasil, selain itu detik yang harus ditunggu
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait, states = self._check(buckets, now)
+            if wait > 0:
+                return wait
+
+            for key, tokens, blocked in states:
+                self._buckets[key] = [tokens - 1, now, blocked]
+            return 0.0
+
+    def peek(self, buckets: list) -> float:
+        """Seperti try_acquire tapi tanpa mengambil token"""
+        with self._lock:
+            return self._check(buckets, time.monotonic())[0]
+
+    def _check(self, buckets: list, now: float):
+        wait = 0.0
+        states = []
+        for key, rate, burst in buckets:
+            tokens, last, blocked = self._buckets.get(key, (burst, now, 0.0))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if blocked > now:
+                wait = max(wait, blocked - now)
+            elif tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+            states.append((key, tokens, blocked))
+        return wait, states
+
+    def block(self, key: str, seconds: float):
+        """Tahan bucket selama `seconds` (dari retry_after)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.setdefault(key, [0.0, now, 0.0])
+            state[0] = 0.0
+            state[1] = now
+            state[2] = max(state[2], now + seconds)
+
+
+class RedisRateLimitBackend:
+    """Token bucket di Redis supaya limit berlaku untuk semua worker"""
+
+    ACQUIRE_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local peek = ARGV[#KEYS * 2 + 1] == '1'
+    local wait = 0
+    local states = {}
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[2 * i - 1])
+        local burst = tonumber(ARGV[2 * i])
+        local data = redis.call('HMGET', key, 'tokens', 'ts', 'blocked')
+        local tokens = tonumber(data[1]) or burst
+        local ts = tonumber(data[2]) or now
+        local blocked = tonumber(data[3]) or 0
+        tokens = math.min(burst, tokens + (now - ts) * rate)
+        if blocked > now then
+            wait = math.max(wait, blocked - now)
+        elseif tokens < 1 then
+            wait = math.max(wait, (1 - tokens) / rate)
+        end
+        states[i] = tokens
+    end
+    if wait > 0 or peek then
+        return tostring(wait)
+    end
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[2 * i - 1])
+        local burst = tonumber(ARGV[2 * i])
+        redis.call('HSET', key, 'tokens', tostring(states[i] - 1), 'ts', tostring(now))
+        redis.call('EXPIRE', key, math.ceil(burst / rate) + 60)
+    end
+    return '0'
+    """
+
+    BLOCK_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local seconds = tonumber(ARGV[1])
+    redis.call('HSET', KEYS[1], 'tokens', '0', 'ts', tostring(now), 'blocked', tostring(now + seconds))
+    redis.call('EXPIRE', KEYS[1], math.ceil(seconds) + 60)
+    return 1
+    """
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, hanya dibutuhkan untuk backend ini
+
+        self.client = redis.Redis.from_url(url)
+        self._acquire = self.client.register_script(self.ACQUIRE_SCRIPT)
+        self._block = self.client.register_script(self.BLOCK_SCRIPT)
+
+    def try_acquire(self, buckets: list) -> float:
+        return self._run_acquire(buckets, peek=False)
+
+    def peek(self, buckets: list) -> float:
+        return self._run_acquire(buckets, peek=True)
+
+    def _run_acquire(self, buckets: list, peek: bool) -> float:
+        keys = [key for key, _, _ in buckets]
+        args = []
+        for _, rate, burst in buckets:
+            args.extend([rate, burst])
+        args.append(1 if peek else 0)
+        return float(self._acquire(keys=keys, args=args))
+
+    def block(self, key: str, seconds: float):
+        self._block(keys=[key], args=[seconds])
+
+
+def create_backend():
+    """Pilih backend dari env RATE_LIMIT_BACKEND (memory | redis)"""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisRateLimitBackend(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    return MemoryRateLimitBackend()
+
+
+class RateLimits:
+    """Konfigurasi bucket Telegram"""
+
+    def __init__(self):
+        self.global_rate = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+        self.chat_rate = float(os.getenv("TELEGRAM_CHAT_RATE", 1))
+        self.chat_burst = float(os.getenv("TELEGRAM_CHAT_BURST", 1))
+        self.group_rate = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MIN", 20)) / 60
+
+    def buckets_for(self, chat_id) -> list:
+        """Bucket yang harus dilewati untuk mengirim ke chat_id"""
+        buckets = [(GLOBAL_KEY, self.global_rate, self.global_rate)]
+        if chat_id is not None:
+            # chat_id negatif = grup/channel
+            rate = self.group_rate if int(chat_id) < 0 else self.chat_rate
+            buckets.append((chat_key(chat_id), rate, self.chat_burst))
+        return buckets
+
+
+def chat_key(chat_id) -> str:
+    return f"tg:chat:{chat_id}"
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "chat_id", "fn", "future", "attempts")
+
+    def __init__(self, priority, seq, chat_id, fn):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.fn = fn
+        self.future = Future()
+        self.attempts = 0
+
+
+class SendScheduler:
+    """
+    Antrian berprioritas untuk request keluar ke Telegram.
+    Satu thread dispatcher memilih job prioritas tertinggi yang bucket-nya
+    tersedia, lalu menjalankan request di thread pool.
+    Future yang dibatalkan pemanggil (deadline habis) tidak dikirim lagi.
+    """
+
+    def __init__(self, backend=None, limits: RateLimits = None, max_workers: int = 20):
+        self.backend = backend or create_backend()
+        self.limits = limits or RateLimits()
+        self.max_retries = int(os.getenv("TELEGRAM_MAX_RETRIES", 5))
+
+        self._jobs = []
+        self._inflight = set()  # chat_id yang request-nya sedang berjalan
+        self._active = 0  # job yang sedang dieksekusi (bisa kembali ke antrian setelah 429)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tg-send")
+        self._running = True
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="tg-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, chat_id, fn, priority: int = PRIORITY_REPLY) -> Future:
+        """
+        Jadwalkan fn() (request ke Telegram) untuk chat_id.
+        chat_id None berarti hanya kena limit global.
+        """
+        job = _Job(priority, next(self._seq), chat_id, fn)
+        self._enqueue(job)
+        return job.future
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    def _enqueue(self, job: _Job):
+        with self._cond:
+            self._jobs.append(job)
+            self._cond.notify()
+
+    def _dispatch_loop(self):
+        global_bucket = self.limits.buckets_for(None)
+        while self._running:
+            with self._cond:
+                while not self._jobs and self._running:
+                    self._cond.wait()
+                # Job yang sudah dibatalkan pemanggil (deadline habis) dibuang tanpa dikirim
+                self._jobs = [job for job in self._jobs if not job.future.cancelled()]
+                # Urutkan per prioritas lalu urutan masuk (FIFO per chat terjaga)
+                jobs = sorted(self._jobs, key=lambda j: (j.priority, j.seq))
+                blocked_chats = set(self._inflight)
+
+            # Bucket global dicek sekali per putaran: selama kosong tidak ada job
+            # yang bisa jalan, jadi antrian tidak di-scan (satu round trip, bukan
+            # satu per job). Dalam scan dispatcher hanya mengambil satu token
+            # global, jadi bucket global tidak habis di tengah scan oleh proses ini
+            try:
+                global_wait = self.backend.peek(global_bucket)
+            except Exception as e:
+                logger.error(f"Rate limit backend error: {e}")
+                global_wait = 0.0
+
+            ready = None
+            min_wait = global_wait or None
+            if global_wait == 0:
+                for job in jobs:
+                    # Jangan mendahului job lebih lama di chat yang sama
+                    if job.chat_id in blocked_chats:
+                        continue
+                    try:
+                        wait = self.backend.try_acquire(self.limits.buckets_for(job.chat_id))
+                    except Exception as e:
+                        logger.error(f"Rate limit backend error: {e}")
+                        wait = 0.0
+                    if wait == 0:
+                        ready = job
+                        break
+                    blocked_chats.add(job.chat_id)
+                    min_wait = wait if min_wait is None else min(min_wait, wait)
+
+            if ready is None:
+                with self._cond:
+                    # Bangun lebih cepat jika ada job baru masuk
+                    self._cond.wait(timeout=min(min_wait or 0.05, 1.0))
+                continue
+
+            with self._cond:
+                self._jobs.remove(ready)
+                if ready.chat_id is not None:
+                    self._inflight.add(ready.chat_id)
+                self._active += 1
+            self._pool.submit(self._execute, ready)
+
+    def _execute(self, job: _Job):
+        if job.future.cancelled():
+            # Dibatalkan setelah dipilih dispatcher, sebelum request dikirim
+            self._done(job)
+            return
+        try:
+            result = job.fn()
+            self._done(job)
+            _resolve(job.future, result=result)
+        except TelegramRetryAfter as e:
+            job.attempts += 1
+            key = chat_key(job.chat_id) if job.chat_id is not None else GLOBAL_KEY
+            self.backend.block(key, e.retry_after)
+            if job.attempts > self.max_retries:
+                self._done(job)
+                _resolve(job.future, error=e)
+                return
+            logger.warning(
+                f"Telegram 429 for chat {job.chat_id}, retry in {e.retry_after}s "
+                f"(attempt {job.attempts}/{self.max_retries})"
+            )
+            self._requeue(job)
+        except Exception as e:
+            self._done(job)
+            _resolve(job.future, error=e)
+
+    def _requeue(self, job: _Job):
+        """
+        Kembalikan job ke antrian lalu lepas chat-nya dalam satu lock, supaya
+        dispatcher tidak sempat mengirim job berikutnya di chat yang sama
+        (job ini tetap paling depan karena seq lamanya)
+        """
+        with self._cond:
+            self._jobs.append(job)
+            self._inflight.discard(job.chat_id)
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _done(self, job: _Job):
+        with self._cond:
+            self._inflight.discard(job.chat_id)
+            self._active -= 1
+            self._cond.notify_all()
+
+    def shutdown(self):
+        """
+        Hentikan dispatcher setelah antrian kosong dan tidak ada request
+        berjalan (job yang kena 429 bisa kembali ke antrian)
+        """
+        with self._cond:
+            while self._jobs or self._active:
+                self._cond.wait(timeout=0.05)
+            self._running = False
+            self._cond.notify_all()
+        self._dispatcher.join()
+        self._pool.shutdown(wait=True)
+
+
+def _resolve(future: Future, result=None, error: BaseException = None):
+    """Set hasil future; diabaikan jika pemanggil sudah membatalkannya"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
@@ -0,0 +1,216 @@
+"""
+Router command bot.
+
+Command didaftarkan sekali beserta metadata-nya, lalu setiap message
+di-dispatch dengan satu lookup dict pada token command (O(1)), bukan
+rantai startswith. Suffix `@namabot` di grup ditangani: command untuk bot
+lain diabaikan.
+
+Metadata per command:
+- needs_db: handler memakai session DB (selain itu ctx.db = None)
+- needs_user: user id internal di-resolve (cache/upsert) sebelum handler
+- rate_class: bucket rate limit per user (free | quote | write). Hanya
+  ditegakkan jika COMMAND_RATE_LIMIT=true (satu panggilan backend limiter
+  per command); command yang kena limit dibalas lewat on_throttled.
+
+Teks biasa hanya diteruskan ke command fallback jika berbentuk kode saham
+(4 huruf); obrolan lain ditolak sebelum kerja DB atau service apa pun.
+"""
+
+import os
+import re
+import logging
+from app import tracing
+from app.bot.rate_limiter import create_backend
+
+logger = logging.getLogger(__name__)
+
+# Kode saham IDX: 4 huruf (BBCA, TLKM, ...)
+TICKER_PATTERN = re.compile(r"^[A-Za-z]{4}$")
+
+
+class Command:
+    __slots__ = ("name", "handler", "needs_db", "needs_user", "rate_class", "usage", "description")
+
+    def __init__(self, name, handler, needs_db, needs_user, rate_class, usage, description):
+        self.name = name
+        self.handler = handler
+        self.needs_db = needs_db or needs_user
+        self.needs_user = needs_user
+        self.rate_class = rate_class
+        self.usage = usage
+        self.description = description
+
+
+class CommandContext:
+    """Argumen untuk handler command/callback"""
+
+    __slots__ = ("chat_id", "user_data", "text", "args", "db", "user_id", "implicit", "callback")
+
+    def __init__(self, chat_id, user_data, text, args, db=None, user_id=None, implicit=False, callback=None):
+        self.chat_id = chat_id
+        self.user_data = user_data
+        self.text = text  # argumen setelah token command, sudah di-strip
+        self.args = args  # text.split()
+        self.db = db
+        self.user_id = user_id
+        self.implicit = implicit  # True jika dari teks biasa (fallback ticker)
+        self.callback = callback  # dict callback_query untuk handler callback
+
+
+class CommandRouter:
+    def __init__(self, users=None, limiter=None, bot_username: str = None, on_throttled=None):
+        self.users = users  # UserIdentityCache untuk command needs_user
+        self.enforce_rate_limit = os.getenv("COMMAND_RATE_LIMIT", "false").lower() == "true"
+        # Backend (Redis jika dikonfigurasi) hanya dibuat jika limit ditegakkan
+        self.limiter = limiter or (create_backend() if self.enforce_rate_limit else None)
+        self.on_throttled = on_throttled  # on_throttled(chat_id, command)
+        username = bot_username if bot_username is not None else os.getenv("TELEGRAM_BOT_USERNAME", "")
+        self.bot_username = username.lstrip("@").lower()
+
+        burst = float(os.getenv("COMMAND_BURST", 5))
+        self.rate_classes = {
+            "free": None,
+            "quote": (float(os.getenv("COMMAND_QUOTE_RATE_PER_MIN", 30)) / 60, burst),
+            "write": (float(os.getenv("COMMAND_WRITE_RATE_PER_MIN", 10)) / 60, burst),
+        }
+
+        self._commands = {}  # nama/alias -> Command
+        self._callbacks = {}  # prefix callback_data -> Command
+        self.fallback = None  # Command untuk teks berbentuk kode saham
+        self.stats = {"dispatched": 0, "unknown": 0, "ignored": 0, "throttled": 0}
+
+    def add(self, name: str, handler, aliases=(), needs_db: bool = False, needs_user: bool = False,
+            rate_class: str = "free", usage: str = None, description: str = None, fallback: bool = False):
+        """Daftarkan command `/name` (tanpa slash)"""
+        if rate_class not in self.rate_classes:
+            raise ValueError(f"Unknown rate class: {rate_class}")
+        command = Command(name, handler, needs_db, needs_user, rate_class, usage or f"/{name}", description)
+        for key in (name, *aliases):
+            if key in self._commands:
+                raise ValueError(f"Command already registered: /{key}")
+            self._commands[key] = command
+        if fallback:
+            self.fallback = command
+        return command
+
+    def add_callback(self, prefix: str, handler, needs_db: bool = False, needs_user: bool = False,
+                     rate_class: str = "free"):
+        """Daftarkan handler callback_data `<prefix>_<argumen>`"""
+        if prefix in self._callbacks:
+            raise ValueError(f"Callback already registered: {prefix}")
+        command = Command(prefix, handler, needs_db, needs_user, rate_class, None, None)
+        self._callbacks[prefix] = command
+        return command
+
+    def commands(self) -> list:
+        """Command terdaftar (tanpa alias), urut pendaftaran"""
+        return list({id(command): command for command in self._commands.values()}.values())
+
+    def resolve(self, text: str):
+        """
+        Cari command untuk teks message.
+
+        Returns:
+            (command, argumen, implicit). command None untuk command yang
+            tidak dikenal; (None, None, False) jika teks harus diabaikan.
+        """
+        if not text:
+            return None, None, False
+
+        if text[0] != "/":
+            stripped = text.strip()
+            if self.fallback is not None and TICKER_PATTERN.match(stripped):
+                return self.fallback, stripped, True
+            return None, None, False
+
+        # Sama dengan filter webhook (ingest): argumen boleh dipisah spasi atau baris baru
+        parts = text[1:].split(maxsplit=1)
+        token = parts[0] if parts else ""
+        rest = parts[1] if len(parts) > 1 else ""
+        name, _, mention = token.partition("@")
+        if mention and self.bot_username and mention.lower() != self.bot_username:
+            # Command untuk bot lain di grup yang sama
+            return None, None, False
+        return self._commands.get(name.lower()), rest.strip(), False
+
+    def command_for(self, update_data: dict):
+        """Command yang akan menangani update ini (None jika tidak ada)"""
+        if "message" in update_data:
+            return self.resolve(update_data["message"].get("text", ""))[0]
+        if "callback_query" in update_data:
+            prefix = (update_data["callback_query"].get("data") or "").partition("_")[0]
+            return self._callbacks.get(prefix)
+        return None
+
+    def _allowed(self, command: Command, user_data: dict) -> bool:
+        if not self.enforce_rate_limit:
+            return True
+        limit = self.rate_classes[command.rate_class]
+        if limit is None or not user_data:
+            return True
+        rate, burst = limit
+        key = f"cmd:{command.rate_class}:{user_data['id']}"
+        return self.limiter.try_acquire([(key, rate, burst)]) == 0
+
+    def _run(self, command: Command, ctx: CommandContext, db):
+        with tracing.start_span(
+            f"command.{command.name}",
+            attributes={"command.rate_class": command.rate_class, "chat_id": ctx.chat_id}
+        ) as span:
+            if not self._allowed(command, ctx.user_data):
+                self.stats["throttled"] += 1
+                span.set_attribute("command.throttled", True)
+                logger.info(f"Throttled {command.name} for user {ctx.user_data.get('id')}")
+                if self.on_throttled is not None:
+                    self.on_throttled(ctx.chat_id, command)
+                return False
+            if command.needs_db:
+                ctx.db = db
+            if command.needs_user:
+                ctx.user_id = self.users.resolve(db, ctx.user_data)
+            self.stats["dispatched"] += 1
+            command.handler(ctx)
+            return True
+
+    def dispatch_message(self, message: dict, db, on_unknown=None) -> bool:
+        """
+        Dispatch message ke handler command.
+        on_unknown(chat_id) dipanggil untuk `/command` yang tidak terdaftar.
+        """
+        text = message.get("text", "")
+        command, rest, implicit = self.resolve(text)
+        if command is None:
+            if rest is None:
+                self.stats["ignored"] += 1
+            else:
+                self.stats["unknown"] += 1
+                if on_unknown is not None:
+                    on_unknown(message["chat"]["id"])
+            return False
+
+        ctx = CommandContext(
+            message["chat"]["id"],
+            message.get("from"),
+            rest,
+            rest.split(),
+            implicit=implicit
+        )
+        return self._run(command, ctx, db)
+
+    def dispatch_callback(self, callback: dict, db) -> bool:
+        """Dispatch callback_query berdasarkan prefix callback_data"""
+        prefix, _, rest = (callback.get("data") or "").partition("_")
+        command = self._callbacks.get(prefix)
+        if command is None:
+            self.stats["ignored"] += 1
+            return False
+
+        ctx = CommandContext(
+            callback["message"]["chat"]["id"],
+            callback.get("from"),
+            rest,
+            [rest] if rest else [],
+            callback=callback
+        )
+        return self._run(command, ctx, db)
@@ -1,79 +1,369 @@
 import os
+import asyncio
+import threading
 import requests
+import httpx
 import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from app import metrics, tracing
+from app.bot.rate_limiter import (
+    SendScheduler,
+    TelegramRetryAfter,
+    RateLimits,
+    MemoryRateLimitBackend,
+    create_backend,
+    chat_key,
+    GLOBAL_KEY,
+    PRIORITY_CALLBACK,
+    PRIORITY_REPLY,
+    PRIORITY_BROADCAST,
+)
 
 logger = logging.getLogger(__name__)
 
+def _retry_after_error(data: dict) -> TelegramRetryAfter:
+    """Buat TelegramRetryAfter dari body response 429"""
+    retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+    return TelegramRetryAfter(float(retry_after), data.get("description", ""))
+
 class TelegramAPI:
     def __init__(self):
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
-    
-    def send_message(self, chat_id: int, text: str, reply_markup=None):
+        self.timeout = float(os.getenv("TELEGRAM_TIMEOUT", 10))
+        self.pool_size = int(os.getenv("TELEGRAM_POOL_SIZE", 20))
+
+        # Session persistent: koneksi TCP+TLS ke api.telegram.org dipakai ulang
+        self.adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=True
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+
+        self._requests = 0
+        self._connections_seen = 0  # koneksi pool yang sudah dilaporkan ke metrics
+        self._lock = threading.Lock()
+
+        # Semua pengiriman lewat scheduler rate limit (global + per chat)
+        self.rate_limited = os.getenv("TELEGRAM_RATE_LIMIT", "true").lower() == "true"
+        self.send_deadline = float(os.getenv("TELEGRAM_SEND_DEADLINE", 60))
+        self.scheduler = SendScheduler(max_workers=self.pool_size) if self.rate_limited else None
+
+    def _post(self, method: str, payload: dict = None) -> dict:
+        """POST ke Bot API lewat session pool"""
+        with self._lock:
+            self._requests += 1
+        metrics.TELEGRAM_REQUESTS.labels("sync").inc()
+        with metrics.TELEGRAM_SECONDS.labels(method).time(), tracing.start_span(
+            f"telegram.{method}", kind=tracing.KIND_CLIENT
+        ) as span:
+            response = self.session.post(
+                f"{self.base_url}/{method}",
+                json=payload,
+                timeout=self.timeout
+            )
+            span.set_attribute("http.status_code", response.status_code)
+        self._record_connections()
+        if response.status_code == 429:
+            metrics.TELEGRAM_RATE_LIMITED.labels(method).inc()
+            raise _retry_after_error(response.json())
+        if response.status_code >= 400:
+            metrics.ERRORS.labels("telegram").inc()
+        response.raise_for_status()
+        return response.json()
+
+    def _send(self, chat_id, method: str, payload: dict, priority: int) -> dict:
+        """Kirim lewat scheduler dan tunggu hasilnya"""
+        if self.scheduler is None:
+            return self._post(method, payload)
+        # Thread scheduler tidak mewarisi contextvars: bawa span aktif
+        post = tracing.wrap(self._post)
+        future = self.scheduler.submit(
+            chat_id,
+            lambda: post(method, payload),
+            priority=priority
+        )
+        try:
+            return future.result(timeout=self.send_deadline)
+        except FutureTimeoutError:
+            # Pemanggil sudah menyerah: jangan sampai pesan terkirim belakangan
+            # (duplikat jika di-retry, atau keluar urutan)
+            future.cancel()
+            raise
+
+    def _connections_opened(self) -> int:
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def _record_connections(self):
+        """Tambahkan koneksi baru di pool (sejak request terakhir) ke metrics"""
+        opened = self._connections_opened()
+        with self._lock:
+            new = opened - self._connections_seen
+            self._connections_seen = max(opened, self._connections_seen)
+        if new > 0:
+            metrics.TELEGRAM_CONNECTIONS.labels("sync").inc(new)
+
+    def get_connection_stats(self) -> dict:
+        """Statistik reuse koneksi (requests vs koneksi yang dibuka)"""
+        connections = self._connections_opened()
+        return {
+            "requests": self._requests,
+            "connections_opened": connections,
+            "reused": max(self._requests - connections, 0)
+        }
+
+    def send_message(self, chat_id: int, text: str, reply_markup=None, priority: int = PRIORITY_REPLY):
         """Kirim pesan ke user"""
-        url = f"{self.base_url}/sendMessage"
-        
         payload = {
             "chat_id": chat_id,
             "text": text,
             "parse_mode": "Markdown"
         }
-        
+
         if reply_markup:
             payload["reply_markup"] = reply_markup
-        
+
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._send(chat_id, "sendMessage", payload, priority)
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
             return None
-    
+
+    def enqueue_message(self, chat_id: int, text: str, priority: int = PRIORITY_BROADCAST):
+        """
+        Jadwalkan pesan tanpa menunggu terkirim (untuk notifikasi massal).
+        Return Future, atau hasil langsung jika scheduler nonaktif.
+        """
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        }
+
+        if self.scheduler is None:
+            return self.send_message(chat_id, text)
+        post = tracing.wrap(self._post)
+        future = self.scheduler.submit(
+            chat_id,
+            lambda: post("sendMessage", payload),
+            priority=priority
+        )
+        future.add_done_callback(self._log_failed_send)
+        return future
+
+    @staticmethod
+    def _log_failed_send(future):
+        if future.exception() is not None:
+            logger.error(f"Failed to send message: {future.exception()}")
+
+    def edit_message_text(self, chat_id: int, message_id: int, text: str, reply_markup=None):
+        """Edit pesan yang sudah terkirim (misal untuk pindah halaman)"""
+        payload = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        }
+
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+
+        try:
+            return self._send(chat_id, "editMessageText", payload, PRIORITY_REPLY)
+        except Exception as e:
+            logger.error(f"Failed to edit message: {e}")
+            return None
+
     def answer_callback_query(self, callback_query_id: str, text: str = ""):
         """Answer callback query"""
-        url = f"{self.base_url}/answerCallbackQuery"
-        
         payload = {
             "callback_query_id": callback_query_id,
             "text": text
         }
-        
+
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._send(None, "answerCallbackQuery", payload, PRIORITY_CALLBACK)
         except Exception as e:
             logger.error(f"Failed to answer callback: {e}")
             return None
-    
+
     def set_webhook(self, webhook_url: str):
         """Set webhook URL"""
-        url = f"{self.base_url}/setWebhook"
-        
         payload = {
             "url": webhook_url,
             "allowed_updates": ["message", "callback_query"]
         }
-        
+
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
+            result = self._post("setWebhook", payload)
             logger.info(f"Webhook set to: {webhook_url}")
-            return response.json()
+            return result
         except Exception as e:
             logger.error(f"Failed to set webhook: {e}")
             return None
-    
+
     def delete_webhook(self):
         """Delete webhook"""
-        url = f"{self.base_url}/deleteWebhook"
-        
         try:
-            response = requests.post(url, timeout=10)
-            response.raise_for_status()
+            result = self._post("deleteWebhook")
             logger.info("Webhook deleted")
-            return response.json()
+            return result
         except Exception as e:
             logger.error(f"Failed to delete webhook: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def close(self):
+        """Tutup semua koneksi di pool"""
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+        self.session.close()
+
+
+class AsyncTelegramAPI:
+    """
+    Varian async dari TelegramAPI berbasis httpx.AsyncClient.
+    Koneksi keep-alive dipakai ulang, dan HTTP/2 (TELEGRAM_HTTP2=true)
+    memultiplex banyak request di satu koneksi.
+    """
+
+    def __init__(self):
+        self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
+        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.timeout = float(os.getenv("TELEGRAM_TIMEOUT", 10))
+        self.pool_size = int(os.getenv("TELEGRAM_POOL_SIZE", 20))
+        self.http2 = os.getenv("TELEGRAM_HTTP2", "false").lower() == "true"
+
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=float(os.getenv("TELEGRAM_KEEPALIVE_EXPIRY", 60))
+            )
+        )
+
+        self._requests = 0
+        self._connections = 0
+
+        self.rate_limited = os.getenv("TELEGRAM_RATE_LIMIT", "true").lower() == "true"
+        self.max_retries = int(os.getenv("TELEGRAM_MAX_RETRIES", 5))
+        self.rate_backend = create_backend()
+        self.rate_limits = RateLimits()
+        # Backend Redis memakai client sync: dijalankan di thread supaya
+        # round trip-nya tidak memblokir event loop
+        self._offload_backend = not isinstance(self.rate_backend, MemoryRateLimitBackend)
+
+    async def _trace(self, event_name: str, info: dict):
+        """Hitung koneksi TCP baru lewat trace extension httpcore"""
+        if event_name == "connection.connect_tcp.complete":
+            self._connections += 1
+            metrics.TELEGRAM_CONNECTIONS.labels("async").inc()
+
+    async def _backend(self, fn, *args):
+        if self._offload_backend:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _post(self, method: str, payload: dict = None) -> dict:
+        """POST ke Bot API lewat client pool"""
+        self._requests += 1
+        metrics.TELEGRAM_REQUESTS.labels("async").inc()
+        with metrics.TELEGRAM_SECONDS.labels(method).time(), tracing.start_span(
+            f"telegram.{method}", kind=tracing.KIND_CLIENT
+        ) as span:
+            response = await self.client.post(
+                f"{self.base_url}/{method}",
+                json=payload,
+                extensions={"trace": self._trace}
+            )
+            span.set_attribute("http.status_code", response.status_code)
+        if response.status_code == 429:
+            metrics.TELEGRAM_RATE_LIMITED.labels(method).inc()
+            raise _retry_after_error(response.json())
+        if response.status_code >= 400:
+            metrics.ERRORS.labels("telegram").inc()
+        response.raise_for_status()
+        return response.json()
+
+    async def _send(self, chat_id, method: str, payload: dict) -> dict:
+        """Tunggu token rate limit, kirim, ulangi jika kena 429"""
+        attempts = 0
+        while True:
+            if self.rate_limited:
+                buckets = self.rate_limits.buckets_for(chat_id)
+                while (wait := await self._backend(self.rate_backend.try_acquire, buckets)) > 0:
+                    await asyncio.sleep(wait)
+            try:
+                return await self._post(method, payload)
+            except TelegramRetryAfter as e:
+                attempts += 1
+                key = chat_key(chat_id) if chat_id is not None else GLOBAL_KEY
+                await self._backend(self.rate_backend.block, key, e.retry_after)
+                if attempts > self.max_retries:
+                    raise
+                logger.warning(f"Telegram 429 for chat {chat_id}, retry in {e.retry_after}s")
+
+    def get_connection_stats(self) -> dict:
+        """Statistik reuse koneksi (requests vs koneksi yang dibuka)"""
+        return {
+            "requests": self._requests,
+            "connections_opened": self._connections,
+            "reused": max(self._requests - self._connections, 0)
+        }
+
+    async def send_message(self, chat_id: int, text: str, reply_markup=None):
+        """Kirim pesan ke user"""
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        }
+
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+
+        try:
+            return await self._send(chat_id, "sendMessage", payload)
+        except Exception as e:
+            logger.error(f"Failed to send message: {e}")
+            return None
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, reply_markup=None):
+        """Edit pesan yang sudah terkirim (misal untuk pindah halaman)"""
+        payload = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        }
+
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+
+        try:
+            return await self._send(chat_id, "editMessageText", payload)
+        except Exception as e:
+            logger.error(f"Failed to edit message: {e}")
+            return None
+
+    async def answer_callback_query(self, callback_query_id: str, text: str = ""):
+        """Answer callback query"""
+        payload = {
+            "callback_query_id": callback_query_id,
+            "text": text
+        }
+
+        try:
+            return await self._send(None, "answerCallbackQuery", payload)
+        except Exception as e:
+            logger.error(f"Failed to answer callback: {e}")
+            return None
+
+    async def close(self):
+        """Tutup semua koneksi di pool"""
+        await self.client.aclose()
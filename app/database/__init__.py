@@ -2,17 +2,25 @@
 Database module untuk models, connection, dan CRUD operations
 """
 
-from .db import Base, SessionLocal, get_db, init_db
-from .models import User, Watchlist, StockQuery
-from . import crud
+from .db import Base, SessionLocal, get_db, init_db, get_async_engine, get_async_sessionmaker, get_async_db
+from .models import User, Watchlist, StockQuery, PriceAlert, StockQueryHourly, StockQueryRollup, ProcessedUpdate
+from . import crud, async_crud
 
 __all__ = [
     "Base",
     "SessionLocal",
     "get_db",
     "init_db",
+    "get_async_engine",
+    "get_async_sessionmaker",
+    "get_async_db",
     "User",
     "Watchlist",
     "StockQuery",
+    "PriceAlert",
+    "StockQueryHourly",
+    "StockQueryRollup",
+    "ProcessedUpdate",
     "crud",
+    "async_crud",
 ]
@@ -0,0 +1,177 @@
+"""
+Write-behind buffer untuk analytics StockQuery.
+
+Handler cukup memanggil `record()` (non-blocking, tanpa round trip DB).
+Thread background mem-flush buffer dengan satu multi-row INSERT setiap
+ANALYTICS_BATCH_SIZE baris atau ANALYTICS_FLUSH_INTERVAL_MS, mana yang
+lebih dulu. Buffer dibatasi ANALYTICS_BUFFER_SIZE; jika penuh (DB lambat
+atau mati) baris baru di-drop dan dihitung, bukan memblokir user.
+"""
+
+import os
+import time
+import atexit
+import threading
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLogBuffer:
+    def __init__(self, session_factory, users=None):
+        self.session_factory = session_factory
+        self.users = users  # UserIdentityCache untuk baris dari record_user()
+        self.batch_size = int(os.getenv("ANALYTICS_BATCH_SIZE", 500))
+        self.flush_interval = float(os.getenv("ANALYTICS_FLUSH_INTERVAL_MS", 1000)) / 1000
+        self.max_size = int(os.getenv("ANALYTICS_BUFFER_SIZE", 50000))
+
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self.stats = {"recorded": 0, "flushed": 0, "dropped": 0, "failed_flushes": 0}
+
+        self._thread = threading.Thread(target=self._flush_loop, name="analytics-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, user_id: int, symbol: str, query_type: str):
+        """Catat satu query (dipanggil dari hot path handler)"""
+        return self._append({
+            "user_id": user_id,
+            "symbol": symbol,
+            "query_type": query_type,
+            "created_at": datetime.now(timezone.utc),
+        })
+
+    def record_user(self, user_data: dict, symbol: str, query_type: str):
+        """
+        Seperti record(), tapi dengan objek `from` Telegram. User id internal
+        di-resolve di thread flush lewat cache, bukan di hot path.
+        """
+        if self.users is None:
+            raise ValueError("record_user requires a user cache")
+        return self._append({
+            "user": user_data,
+            "symbol": symbol,
+            "query_type": query_type,
+            "created_at": datetime.now(timezone.utc),
+        })
+
+    def _append(self, row: dict) -> bool:
+        with self._cond:
+            if len(self._rows) >= self.max_size:
+                self.stats["dropped"] += 1
+                return False
+            self._rows.append(row)
+            self.stats["recorded"] += 1
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def _take_batch(self) -> list:
+        batch = []
+        while self._rows and len(batch) < self.batch_size:
+            batch.append(self._rows.popleft())
+        return batch
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while self._running and len(self._rows) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(timeout=remaining)
+                batch = self._take_batch()
+                running = self._running
+
+            if batch:
+                self._write(batch)
+            if not running:
+                return
+
+    def _write(self, batch: list):
+        from app.database import crud
+
+        db = self.session_factory()
+        try:
+            rows = self._resolve_users(db, batch)
+            try:
+                crud.bulk_log_stock_queries(db, rows)
+                flushed = len(rows)
+            except Exception as e:
+                # Satu baris buruk tidak boleh membuang satu batch penuh:
+                # ulangi per baris dan buang hanya yang gagal
+                db.rollback()
+                logger.warning(f"Bulk insert of {len(rows)} query logs failed, retrying row by row: {e}")
+                flushed = self._write_rows(db, rows)
+            with self._cond:
+                self.stats["flushed"] += flushed
+                self.stats["dropped"] += len(batch) - flushed
+                if flushed < len(batch):
+                    self.stats["failed_flushes"] += 1
+        except Exception as e:
+            db.rollback()
+            with self._cond:
+                self.stats["failed_flushes"] += 1
+                self.stats["dropped"] += len(batch)
+            logger.error(f"Failed to flush {len(batch)} query logs: {e}")
+        finally:
+            db.close()
+
+    def _resolve_users(self, db, batch: list) -> list:
+        """Isi user_id untuk baris dari record_user(); baris yang gagal di-resolve dibuang"""
+        rows = []
+        for row in batch:
+            if "user" in row:
+                user = row.pop("user")
+                try:
+                    if not user or user.get("id") is None:
+                        raise ValueError("missing telegram id")
+                    row["user_id"] = self.users.resolve(db, user)
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Dropping query log for unresolvable user {user!r}: {e}")
+                    continue
+            rows.append(row)
+        return rows
+
+    def _write_rows(self, db, rows: list) -> int:
+        from app.database import crud
+
+        written = 0
+        for row in rows:
+            try:
+                crud.bulk_log_stock_queries(db, [row])
+                written += 1
+            except OperationalError:
+                # DB tidak bisa dihubungi, bukan baris yang buruk: sisa batch ikut gagal
+                raise
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Dropping query log {row}: {e}")
+        return written
+
+    def flush(self):
+        """Flush semua baris yang tertunda secara sinkron"""
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self):
+        """Hentikan thread flush dan tulis sisa buffer (graceful shutdown)"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+        logger.info(f"Analytics buffer closed: {self.stats}")
@@ -0,0 +1,231 @@
+"""
+Versi async dari crud.py untuk AsyncSession (lihat db.get_async_sessionmaker).
+Setiap fungsi punya signature dan perilaku yang sama dengan padanannya di crud.
+"""
+
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.models import User, Watchlist, StockQuery, PriceAlert, ProcessedUpdate
+from app.database.crud import (
+    _upsert_user_stmt,
+    _mark_triggered_stmt,
+    _increment_hourly_stmt,
+    _popular_stocks_stmt,
+    _insert,
+)
+
+logger = logging.getLogger(__name__)
+
+async def get_or_create_user(
+    db: AsyncSession,
+    telegram_id: int,
+    username: str = None,
+    first_name: str = None,
+    last_name: str = None
+) -> User:
+    """Get user atau buat baru jika belum ada"""
+    user = await get_user_by_telegram_id(db, telegram_id)
+
+    if not user:
+        user = User(
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        logger.info(f"Created new user: {telegram_id}")
+    else:
+        # Update user info jika ada perubahan
+        updated = False
+        if username and user.username != username:
+            user.username = username
+            updated = True
+        if first_name and user.first_name != first_name:
+            user.first_name = first_name
+            updated = True
+        if last_name and user.last_name != last_name:
+            user.last_name = last_name
+            updated = True
+
+        if updated:
+            await db.commit()
+            await db.refresh(user)
+
+    return user
+
+async def upsert_user(
+    db: AsyncSession,
+    telegram_id: int,
+    username: str = None,
+    first_name: str = None,
+    last_name: str = None
+) -> int:
+    """Insert atau update user dalam satu statement, return id internal"""
+    stmt = _upsert_user_stmt(db.bind.dialect.name, telegram_id, username, first_name, last_name)
+    user_id = (await db.execute(stmt)).scalar_one()
+    await db.commit()
+    return user_id
+
+async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> User:
+    """Ambil user berdasarkan telegram_id, None jika belum terdaftar"""
+    result = await db.execute(select(User).where(User.telegram_id == telegram_id).limit(1))
+    return result.scalars().first()
+
+async def get_user_watchlist(db: AsyncSession, user_id: int) -> list:
+    """Ambil semua watchlist user"""
+    result = await db.execute(select(Watchlist).where(Watchlist.user_id == user_id).order_by(Watchlist.id))
+    return list(result.scalars().all())
+
+async def add_to_watchlist(db: AsyncSession, user_id: int, symbol: str) -> bool:
+    """Tambah symbol ke watchlist"""
+    try:
+        db.add(Watchlist(user_id=user_id, symbol=symbol))
+        await db.commit()
+        logger.info(f"Added {symbol} to watchlist for user {user_id}")
+        return True
+    except IntegrityError:
+        await db.rollback()
+        logger.info(f"{symbol} already in watchlist for user {user_id}")
+        return False
+
+async def remove_from_watchlist(db: AsyncSession, user_id: int, symbol: str) -> bool:
+    """Hapus symbol dari watchlist"""
+    result = await db.execute(
+        delete(Watchlist).where(
+            Watchlist.user_id == user_id,
+            Watchlist.symbol == symbol
+        )
+    )
+    await db.commit()
+
+    if result.rowcount:
+        logger.info(f"Removed {symbol} from watchlist for user {user_id}")
+        return True
+    return False
+
+async def create_alert(
+    db: AsyncSession,
+    user_id: int,
+    chat_id: int,
+    symbol: str,
+    direction: str,
+    threshold: float
+) -> PriceAlert:
+    """Buat alert harga baru"""
+    alert = PriceAlert(
+        user_id=user_id,
+        chat_id=chat_id,
+        symbol=symbol,
+        direction=direction,
+        threshold=threshold
+    )
+    db.add(alert)
+    await db.commit()
+    await db.refresh(alert)
+    logger.info(f"Created alert {alert.id}: {symbol} {direction} {threshold} for user {user_id}")
+    return alert
+
+async def get_user_alerts(db: AsyncSession, user_id: int) -> list:
+    """Ambil alert aktif milik user"""
+    result = await db.execute(
+        select(PriceAlert).where(
+            PriceAlert.user_id == user_id,
+            PriceAlert.active.is_(True)
+        ).order_by(PriceAlert.symbol, PriceAlert.threshold)
+    )
+    return list(result.scalars().all())
+
+async def iter_active_alerts(db: AsyncSession, after_id: int = 0, batch_size: int = 10000):
+    """
+    Async generator semua alert aktif dengan id > after_id (keyset pagination).
+    Yield tuple (id, chat_id, symbol, direction, threshold).
+    """
+    last_id = after_id
+    while True:
+        result = await db.execute(
+            select(
+                PriceAlert.id,
+                PriceAlert.chat_id,
+                PriceAlert.symbol,
+                PriceAlert.direction,
+                PriceAlert.threshold
+            ).where(
+                PriceAlert.active.is_(True),
+                PriceAlert.id > last_id
+            ).order_by(PriceAlert.id).limit(batch_size)
+        )
+        rows = result.all()
+
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(row)
+        last_id = rows[-1].id
+
+async def deactivate_alert(db: AsyncSession, user_id: int, alert_id: int) -> bool:
+    """Nonaktifkan alert milik user"""
+    result = await db.execute(
+        update(PriceAlert).where(
+            PriceAlert.id == alert_id,
+            PriceAlert.user_id == user_id,
+            PriceAlert.active.is_(True)
+        ).values(active=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+async def mark_alerts_triggered(db: AsyncSession, alert_ids: list) -> list:
+    """Tandai alert sebagai triggered dalam satu UPDATE, return id yang berubah"""
+    if not alert_ids:
+        return []
+    result = await db.execute(_mark_triggered_stmt(alert_ids))
+    ids = [row.id for row in result]
+    await db.commit()
+    return ids
+
+async def log_stock_query(db: AsyncSession, user_id: int, symbol: str, query_type: str):
+    """Log query untuk analytics"""
+    try:
+        db.add(StockQuery(
+            user_id=user_id,
+            symbol=symbol,
+            query_type=query_type
+        ))
+        await db.execute(_increment_hourly_stmt(
+            db.bind.dialect.name,
+            [{"symbol": symbol, "created_at": datetime.now(timezone.utc)}]
+        ))
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Failed to log query: {e}")
+
+async def bulk_log_stock_queries(db: AsyncSession, rows: list) -> int:
+    """Insert banyak baris StockQuery sekaligus (multi-row INSERT)"""
+    if not rows:
+        return 0
+    await db.execute(insert(StockQuery), rows)
+    await db.execute(_increment_hourly_stmt(db.bind.dialect.name, rows))
+    await db.commit()
+    return len(rows)
+
+async def get_popular_stocks(db: AsyncSession, limit: int = 10, since: datetime = None) -> list:
+    """Ambil saham paling sering dicari dari counter per jam"""
+    result = await db.execute(_popular_stocks_stmt(limit, since))
+    return [{"symbol": r.symbol, "count": int(r.count)} for r in result]
+
+async def is_update_processed(db: AsyncSession, update_id: int) -> bool:
+    """Cek marker update yang sudah diproses (lookup primary key)"""
+    return await db.get(ProcessedUpdate, update_id) is not None
+
+async def mark_update_processed(db: AsyncSession, update_id: int):
+    """Tandai update sudah diproses (idempotent)"""
+    stmt = _insert(db.bind.dialect.name, ProcessedUpdate).values(update_id=update_id)
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=[ProcessedUpdate.update_id]))
+    await db.commit()
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from app.database.models import User, Watchlist, StockQuery
+from app.database.models import User, Watchlist, StockQuery, PriceAlert, StockQueryHourly, ProcessedUpdate
+from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,9 +46,58 @@ def get_or_create_user(
     
     return user
 
+def _insert(dialect: str, table):
+    """INSERT dengan dukungan ON CONFLICT sesuai dialect"""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
+
+def _upsert_user_stmt(dialect: str, telegram_id: int, username: str, first_name: str, last_name: str):
+    """Statement upsert user, dipakai juga oleh async_crud"""
+    from sqlalchemy import func
+    
+    stmt = _insert(dialect, User).values(
+        telegram_id=telegram_id,
+        username=username,
+        first_name=first_name,
+        last_name=last_name
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={
+            "username": func.coalesce(stmt.excluded.username, User.username),
+            "first_name": func.coalesce(stmt.excluded.first_name, User.first_name),
+            "last_name": func.coalesce(stmt.excluded.last_name, User.last_name),
+            "updated_at": func.now(),
+        }
+    ).returning(User.id)
+
+def upsert_user(
+    db: Session,
+    telegram_id: int,
+    username: str = None,
+    first_name: str = None,
+    last_name: str = None
+) -> int:
+    """
+    Insert atau update user dalam satu statement
+    (INSERT ... ON CONFLICT DO UPDATE ... RETURNING id).
+    Field profil yang kosong tidak menimpa nilai lama.
+    """
+    stmt = _upsert_user_stmt(db.bind.dialect.name, telegram_id, username, first_name, last_name)
+    user_id = db.execute(stmt).scalar_one()
+    db.commit()
+    return user_id
+
+def get_user_by_telegram_id(db: Session, telegram_id: int) -> User:
+    """Ambil user berdasarkan telegram_id, None jika belum terdaftar"""
+    return db.query(User).filter(User.telegram_id == telegram_id).first()
+
 def get_user_watchlist(db: Session, user_id: int) -> list:
-    """Ambil semua watchlist user"""
-    return db.query(Watchlist).filter(Watchlist.user_id == user_id).all()
+    """Ambil semua watchlist user, urut sesuai waktu ditambahkan (stabil untuk paging)"""
+    return db.query(Watchlist).filter(Watchlist.user_id == user_id).order_by(Watchlist.id).all()
 
 def add_to_watchlist(db: Session, user_id: int, symbol: str) -> bool:
     """Tambah symbol ke watchlist"""
@@ -76,6 +126,93 @@ def remove_from_watchlist(db: Session, user_id: int, symbol: str) -> bool:
         return True
     return False
 
+def create_alert(
+    db: Session,
+    user_id: int,
+    chat_id: int,
+    symbol: str,
+    direction: str,
+    threshold: float
+) -> PriceAlert:
+    """Buat alert harga baru"""
+    alert = PriceAlert(
+        user_id=user_id,
+        chat_id=chat_id,
+        symbol=symbol,
+        direction=direction,
+        threshold=threshold
+    )
+    db.add(alert)
+    db.commit()
+    db.refresh(alert)
+    logger.info(f"Created alert {alert.id}: {symbol} {direction} {threshold} for user {user_id}")
+    return alert
+
+def get_user_alerts(db: Session, user_id: int) -> list:
+    """Ambil alert aktif milik user"""
+    return db.query(PriceAlert).filter(
+        PriceAlert.user_id == user_id,
+        PriceAlert.active.is_(True)
+    ).order_by(PriceAlert.symbol, PriceAlert.threshold).all()
+
+def iter_active_alerts(db: Session, after_id: int = 0, batch_size: int = 10000):
+    """
+    Iterasi semua alert aktif dengan id > after_id, urut id.
+    Pakai keyset pagination supaya aman untuk jutaan baris.
+    Yield tuple (id, chat_id, symbol, direction, threshold).
+    """
+    last_id = after_id
+    while True:
+        rows = db.query(
+            PriceAlert.id,
+            PriceAlert.chat_id,
+            PriceAlert.symbol,
+            PriceAlert.direction,
+            PriceAlert.threshold
+        ).filter(
+            PriceAlert.active.is_(True),
+            PriceAlert.id > last_id
+        ).order_by(PriceAlert.id).limit(batch_size).all()
+        
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(row)
+        last_id = rows[-1].id
+
+def deactivate_alert(db: Session, user_id: int, alert_id: int) -> bool:
+    """Nonaktifkan alert milik user"""
+    updated = db.query(PriceAlert).filter(
+        PriceAlert.id == alert_id,
+        PriceAlert.user_id == user_id,
+        PriceAlert.active.is_(True)
+    ).update({PriceAlert.active: False}, synchronize_session=False)
+    db.commit()
+    return updated > 0
+
+def mark_alerts_triggered(db: Session, alert_ids: list) -> list:
+    """
+    Tandai alert sebagai triggered dalam satu UPDATE.
+    Return id yang benar-benar berubah (masih aktif), supaya alert yang
+    sudah dihapus user tidak ikut dikirim.
+    """
+    if not alert_ids:
+        return []
+    result = db.execute(_mark_triggered_stmt(alert_ids))
+    ids = [row.id for row in result]
+    db.commit()
+    return ids
+
+def _mark_triggered_stmt(alert_ids: list):
+    from sqlalchemy import update, func
+    
+    return (
+        update(PriceAlert)
+        .where(PriceAlert.id.in_(alert_ids), PriceAlert.active.is_(True))
+        .values(active=False, triggered_at=func.now())
+        .returning(PriceAlert.id)
+    )
+
 def log_stock_query(db: Session, user_id: int, symbol: str, query_type: str):
     """Log query untuk analytics"""
     try:
@@ -85,22 +222,73 @@ def log_stock_query(db: Session, user_id: int, symbol: str, query_type: str):
             query_type=query_type
         )
         db.add(query)
+        db.execute(_increment_hourly_stmt(
+            db.bind.dialect.name,
+            [{"symbol": symbol, "created_at": datetime.now(timezone.utc)}]
+        ))
         db.commit()
     except Exception as e:
         db.rollback()
         logger.error(f"Failed to log query: {e}")
 
-def get_popular_stocks(db: Session, limit: int = 10) -> list:
-    """Ambil saham paling sering dicari"""
-    from sqlalchemy import func
+def bulk_log_stock_queries(db: Session, rows: list) -> int:
+    """
+    Insert banyak baris StockQuery sekaligus (multi-row INSERT) dan
+    update counter per jam di transaksi yang sama.
+    rows: list dict dengan key user_id, symbol, query_type, created_at
+    """
+    if not rows:
+        return 0
+    from sqlalchemy import insert
+    
+    db.execute(insert(StockQuery), rows)
+    db.execute(_increment_hourly_stmt(db.bind.dialect.name, rows))
+    db.commit()
+    return len(rows)
+
+def _increment_hourly_stmt(dialect: str, rows: list):
+    """
+    Upsert counter stock_query_hourly: baris digabung per (jam, symbol)
+    dulu, jadi satu batch hanya menyentuh satu baris per symbol.
+    """
+    counts = {}
+    for row in rows:
+        created_at = row.get("created_at") or datetime.now(timezone.utc)
+        key = (created_at.replace(minute=0, second=0, microsecond=0), row["symbol"])
+        counts[key] = counts.get(key, 0) + 1
     
-    results = db.query(
-        StockQuery.symbol,
-        func.count(StockQuery.symbol).label('count')
-    ).group_by(
-        StockQuery.symbol
-    ).order_by(
-        func.count(StockQuery.symbol).desc()
-    ).limit(limit).all()
+    stmt = _insert(dialect, StockQueryHourly).values([
+        {"bucket": bucket, "symbol": symbol, "query_count": count}
+        for (bucket, symbol), count in counts.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[StockQueryHourly.bucket, StockQueryHourly.symbol],
+        set_={"query_count": StockQueryHourly.query_count + stmt.excluded.query_count}
+    )
+
+def _popular_stocks_stmt(limit: int, since: datetime = None):
+    from sqlalchemy import select, func
     
-    return [{"symbol": r.symbol, "count": r.count} for r in results]
\ No newline at end of file
+    total = func.sum(StockQueryHourly.query_count).label("count")
+    stmt = select(StockQueryHourly.symbol, total)
+    if since is not None:
+        stmt = stmt.where(StockQueryHourly.bucket >= since.replace(minute=0, second=0, microsecond=0))
+    return stmt.group_by(StockQueryHourly.symbol).order_by(total.desc()).limit(limit)
+
+def get_popular_stocks(db: Session, limit: int = 10, since: datetime = None) -> list:
+    """
+    Ambil saham paling sering dicari dari counter per jam.
+    since: hanya hitung bucket sejak waktu ini (resolusi per jam).
+    """
+    results = db.execute(_popular_stocks_stmt(limit, since))
+    return [{"symbol": r.symbol, "count": int(r.count)} for r in results]
+
+def is_update_processed(db: Session, update_id: int) -> bool:
+    """Cek marker update yang sudah diproses (lookup primary key)"""
+    return db.get(ProcessedUpdate, update_id) is not None
+
+def mark_update_processed(db: Session, update_id: int):
+    """Tandai update sudah diproses (idempotent)"""
+    stmt = _insert(db.bind.dialect.name, ProcessedUpdate).values(update_id=update_id)
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[ProcessedUpdate.update_id]))
+    db.commit()
@@ -1,12 +1,33 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app import metrics, tracing
 
 # Database URL dari environment variable
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/telebot")
 
+# URL async (asyncpg), default diturunkan dari DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    make_url(DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    if DATABASE_URL.startswith("postgresql") else DATABASE_URL
+)
+
+def _pool_options(url: str) -> dict:
+    """Setting pool dari env (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE)"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    }
+
 # Create engine
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, **_pool_options(DATABASE_URL))
+metrics.instrument_engine(engine)
+tracing.instrument_engine(engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -14,6 +35,40 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class untuk models
 Base = declarative_base()
 
+# Engine async dibuat lazily: proses yang hanya sync tidak butuh asyncpg
+_async_engine = None
+_async_sessionmaker = None
+
+def get_async_engine():
+    """Engine async (asyncpg) dengan pool dan prepared statement cache"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = make_url(ASYNC_DATABASE_URL)
+        if url.get_driver_name() == "asyncpg":
+            # 0 untuk menonaktifkan (misal di belakang pgbouncer transaction mode)
+            url = url.update_query_dict({
+                "prepared_statement_cache_size": os.getenv("DB_STATEMENT_CACHE_SIZE", "100")
+            })
+        _async_engine = create_async_engine(url, pool_pre_ping=True, **_pool_options(ASYNC_DATABASE_URL))
+        metrics.instrument_engine(_async_engine.sync_engine)
+        tracing.instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+def get_async_sessionmaker():
+    """Factory AsyncSession (expire_on_commit=False supaya objek tetap bisa dibaca)"""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_sessionmaker = async_sessionmaker(
+            get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_sessionmaker
+
 def get_db():
     """Dependency untuk mendapatkan database session"""
     db = SessionLocal()
@@ -22,7 +77,28 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency untuk mendapatkan async database session"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+async def dispose_async_engine():
+    """Tutup semua koneksi pool async (graceful shutdown)"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
+
 def init_db():
-    """Initialize database - buat semua tabel"""
-    from app.database import models  # Import models setelah Base dibuat
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """
+    Jalankan migrasi Alembic sampai head (sama dengan `alembic upgrade head`).
+    Tidak lagi dipanggil saat import; jalankan sekali per deploy.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    config = Config(os.path.join(root, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
@@ -0,0 +1,292 @@
+"""
+Maintenance tabel analytics stock_queries (Postgres).
+
+- Partisi range per hari/bulan (STOCK_QUERY_PARTITION=daily|monthly),
+  dibuat STOCK_QUERY_PARTITIONS_AHEAD periode ke depan, plus partisi
+  default supaya insert tidak pernah gagal.
+- Baris yang terlanjur masuk partisi default (maintenance telat, jam
+  server meleset) dipindah ke partisinya saat partisi itu dibuat.
+- Retention: partisi yang seluruhnya lebih tua dari
+  STOCK_QUERY_RETENTION_DAYS di-drop (DROP TABLE, tanpa DELETE/vacuum);
+  baris lama di partisi default dihapus dengan DELETE.
+- Rollup per jam ke stock_query_rollups untuk jam yang sudah lewat;
+  rollup dan counter stock_query_hourly disimpan
+  STOCK_QUERY_ROLLUP_RETENTION_DAYS hari.
+- Marker deduplikasi processed_updates dihapus setelah UPDATE_DEDUP_TTL.
+
+Jalankan sekali (cron) atau terus-menerus:
+    python -m app.database.maintenance
+    python -m app.database.maintenance --loop
+"""
+
+import os
+import re
+import time
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+TABLE = "stock_queries"
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_PATTERN = re.compile(rf"^{TABLE}_p(\d{{6}}|\d{{8}})$")
+
+
+def _period_start(moment: datetime, period: str) -> datetime:
+    start = moment.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.replace(day=1) if period == "monthly" else start
+
+
+def _next_period(start: datetime, period: str) -> datetime:
+    if period == "monthly":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start: datetime, period: str) -> str:
+    """stock_queries_p20261017 (harian) atau stock_queries_p202610 (bulanan)"""
+    return f"{TABLE}_p{start.strftime('%Y%m' if period == 'monthly' else '%Y%m%d')}"
+
+
+def partition_bounds(name: str):
+    """Return (start, end) dari nama partisi, None jika bukan partisi periode"""
+    match = PARTITION_PATTERN.match(name)
+    if not match:
+        return None
+    suffix = match.group(1)
+    period = "monthly" if len(suffix) == 6 else "daily"
+    start = datetime.strptime(suffix, "%Y%m" if period == "monthly" else "%Y%m%d").replace(tzinfo=timezone.utc)
+    return start, _next_period(start, period)
+
+
+class StockQueryMaintenance:
+    def __init__(self, engine):
+        self.engine = engine
+        self.period = os.getenv("STOCK_QUERY_PARTITION", "daily").lower()
+        if self.period not in ("daily", "monthly"):
+            raise ValueError(f"Invalid STOCK_QUERY_PARTITION: {self.period}")
+        self.ahead = int(os.getenv("STOCK_QUERY_PARTITIONS_AHEAD", 7))
+        self.retention = timedelta(days=int(os.getenv("STOCK_QUERY_RETENTION_DAYS", 30)))
+        self.rollup_retention = timedelta(days=int(os.getenv("STOCK_QUERY_ROLLUP_RETENTION_DAYS", 365)))
+        self.dedup_ttl = timedelta(seconds=int(os.getenv("UPDATE_DEDUP_TTL", 86400)))
+
+    def is_partitioned(self, conn) -> bool:
+        return conn.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": TABLE}
+        ).scalar() == "p"
+
+    def list_partitions(self, conn) -> list:
+        rows = conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ), {"table": TABLE})
+        return sorted(row.relname for row in rows)
+
+    def ensure_partitions(self, conn, now: datetime = None) -> list:
+        """Buat partisi periode sekarang + `ahead` periode ke depan (idempotent)"""
+        now = now or datetime.now(timezone.utc)
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+        existing = set(self.list_partitions(conn))
+        created = []
+        start = _period_start(now, self.period)
+        for _ in range(self.ahead + 1):
+            end = _next_period(start, self.period)
+            name = partition_name(start, self.period)
+            if name not in existing:
+                try:
+                    # Savepoint: partisi yang gagal tidak membatalkan maintenance lain
+                    with conn.begin_nested():
+                        self._create_partition(conn, start, end)
+                    created.append(name)
+                except Exception as e:
+                    logger.error(f"Failed to create partition {name}: {e}")
+            start = end
+        return created
+
+    def _create_partition(self, conn, start: datetime, end: datetime):
+        name = partition_name(start, self.period)
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        has_default = conn.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+        params = {"start": start, "end": end}
+        if not has_default or not conn.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)"
+        ), params).scalar():
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} {bounds}"))
+            return
+
+        # Postgres menolak partisi baru yang rentangnya sudah berisi baris di
+        # partisi default: pindahkan baris itu ke tabel baru lalu attach
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        moved = conn.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ), params).rowcount
+        conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} {bounds}"))
+        logger.info(f"Moved {moved} rows from {DEFAULT_PARTITION} into {name}")
+
+    def drop_expired_partitions(self, conn, now: datetime = None) -> list:
+        """Drop partisi yang batas atasnya sudah lewat masa retention"""
+        cutoff = (now or datetime.now(timezone.utc)) - self.retention
+        dropped = []
+        for name in self.list_partitions(conn):
+            bounds = partition_bounds(name)
+            if bounds and bounds[1] <= cutoff:
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+        return dropped
+
+    def prune_default_partition(self, conn, now: datetime = None) -> int:
+        """Hapus baris partisi default yang lebih tua dari retention (tidak kena DROP partisi)"""
+        if not conn.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar():
+            return 0
+        cutoff = (now or datetime.now(timezone.utc)) - self.retention
+        return conn.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"),
+            {"cutoff": cutoff}
+        ).rowcount
+
+    def rollup(self, conn, now: datetime = None) -> int:
+        """
+        Rollup jam-jam yang sudah lewat sejak rollup terakhir (idempotent).
+        Filter rentang created_at membuat planner hanya membaca partisi terkait.
+        """
+        end = (now or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+        last = conn.execute(text("SELECT max(bucket) FROM stock_query_rollups")).scalar()
+        if last is not None:
+            # Jam terakhir dihitung ulang: baris analytics bisa telat di-flush
+            start = last
+        else:
+            start = conn.execute(text(f"SELECT date_trunc('hour', min(created_at)) FROM {TABLE}")).scalar()
+        if start is None or start >= end:
+            return 0
+
+        result = conn.execute(text(
+            "INSERT INTO stock_query_rollups (bucket, symbol, query_type, query_count, user_count) "
+            "SELECT date_trunc('hour', created_at), symbol, query_type, count(*), count(DISTINCT user_id) "
+            f"FROM {TABLE} WHERE created_at >= :start AND created_at < :end "
+            "GROUP BY 1, 2, 3 "
+            "ON CONFLICT (bucket, symbol, query_type) DO UPDATE SET "
+            "query_count = EXCLUDED.query_count, user_count = EXCLUDED.user_count"
+        ), {"start": start, "end": end})
+        return result.rowcount
+
+    def prune_rollups(self, conn, now: datetime = None) -> int:
+        cutoff = (now or datetime.now(timezone.utc)) - self.rollup_retention
+        deleted = 0
+        for table in ("stock_query_rollups", "stock_query_hourly"):
+            deleted += conn.execute(text(f"DELETE FROM {table} WHERE bucket < :cutoff"), {"cutoff": cutoff}).rowcount
+        return deleted
+
+    def prune_processed_updates(self, conn, now: datetime = None) -> int:
+        """Hapus marker deduplikasi update yang sudah lewat UPDATE_DEDUP_TTL"""
+        cutoff = (now or datetime.now(timezone.utc)) - self.dedup_ttl
+        return conn.execute(
+            text("DELETE FROM processed_updates WHERE processed_at < :cutoff"),
+            {"cutoff": cutoff}
+        ).rowcount
+
+    def convert_legacy_table(self, conn, now: datetime = None):
+        """
+        Ubah stock_queries lama (tabel biasa) menjadi tabel terpartisi:
+        rename, buat parent baru + partisi yang menutup data lama, salin, drop.
+        """
+        from app.database.models import StockQuery
+
+        legacy = f"{TABLE}_legacy"
+        logger.info(f"Converting {TABLE} to a partitioned table")
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+        # Nama constraint (pkey, fkey), index dan sequence ikut dipindah supaya
+        # tabel baru memakai nama aslinya, bukan stock_queries_id_seq1 dst.
+        constraints = conn.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table)"
+        ), {"table": legacy}).scalars().all()
+        for constraint in constraints:
+            if constraint.startswith(f"{TABLE}_"):
+                renamed = legacy + constraint[len(TABLE):]
+                conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {constraint} TO {renamed}"))
+        for index in StockQuery.__table__.indexes:
+            conn.execute(text(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_legacy"))
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy}).scalar()
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+        StockQuery.__table__.create(conn)
+
+        oldest = conn.execute(text(f"SELECT min(created_at) FROM {legacy}")).scalar()
+        current = now or datetime.now(timezone.utc)
+        if oldest is not None:
+            start = _period_start(max(oldest, current - self.retention), self.period)
+            while start < current:
+                end = _next_period(start, self.period)
+                self._create_partition(conn, start, end)
+                start = end
+        self.ensure_partitions(conn, current)
+
+        # Data di luar retention tidak disalin
+        conn.execute(text(
+            f"INSERT INTO {TABLE} (id, user_id, symbol, query_type, created_at) "
+            f"SELECT id, user_id, symbol, query_type, COALESCE(created_at, now()) FROM {legacy} "
+            "WHERE created_at IS NULL OR created_at >= :cutoff"
+        ), {"cutoff": current - self.retention})
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+            f"COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)"
+        ))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+
+    def run(self, now: datetime = None) -> dict:
+        """Satu putaran maintenance dalam satu transaksi"""
+        now = now or datetime.now(timezone.utc)
+        with self.engine.begin() as conn:
+            if not self.is_partitioned(conn):
+                self.convert_legacy_table(conn, now)
+            report = {
+                "created": self.ensure_partitions(conn, now),
+                "rolled_up": self.rollup(conn, now),
+                "dropped": self.drop_expired_partitions(conn, now),
+                "pruned_default": self.prune_default_partition(conn, now),
+                "pruned_rollups": self.prune_rollups(conn, now),
+                "pruned_updates": self.prune_processed_updates(conn, now),
+            }
+        logger.info(f"Stock query maintenance: {report}")
+        return report
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Partisi, retention dan rollup stock_queries")
+    parser.add_argument("--loop", action="store_true", help="jalan terus setiap MAINTENANCE_INTERVAL detik")
+    parser.add_argument("--now", help="override waktu sekarang (ISO 8601, untuk test)")
+    args = parser.parse_args()
+
+    from app.database.db import engine
+
+    maintenance = StockQueryMaintenance(engine)
+    now = datetime.fromisoformat(args.now).astimezone(timezone.utc) if args.now else None
+
+    if not args.loop:
+        maintenance.run(now)
+        return
+
+    interval = float(os.getenv("MAINTENANCE_INTERVAL", 3600))
+    while True:
+        try:
+            maintenance.run()
+        except KeyboardInterrupt:
+            break
+        except Exception as e:
+            logger.error(f"Maintenance failed: {e}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, BigInteger, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, ForeignKey, UniqueConstraint, Float, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.db import Base
@@ -16,6 +16,7 @@ class User(Base):
     
     # Relationships
     watchlist = relationship("Watchlist", back_populates="user", cascade="all, delete-orphan")
+    alerts = relationship("PriceAlert", back_populates="user", cascade="all, delete-orphan")
 
 class Watchlist(Base):
     __tablename__ = "watchlist"
@@ -33,12 +34,84 @@ class Watchlist(Base):
         UniqueConstraint('user_id', 'symbol', name='unique_user_symbol'),
     )
 
+class PriceAlert(Base):
+    """Alert harga: kirim notifikasi saat harga melewati threshold"""
+    __tablename__ = "price_alerts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
+    symbol = Column(String, nullable=False)
+    direction = Column(String, nullable=False)  # above, below
+    threshold = Column(Float, nullable=False)
+    active = Column(Boolean, nullable=False, default=True, server_default="true")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    triggered_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="alerts")
+    
+    __table_args__ = (
+        # Engine load alert aktif per symbol, user lihat alert aktif miliknya
+        Index("ix_price_alerts_active_symbol", "active", "symbol"),
+        Index("ix_price_alerts_user_active", "user_id", "active"),
+        # Keyset scan iter_active_alerts (id > last_id WHERE active)
+        Index("ix_price_alerts_active_id", "id", postgresql_where=active.is_(True)),
+    )
+
 class StockQuery(Base):
-    """Log query untuk analytics"""
+    """
+    Log query untuk analytics.
+    Di Postgres tabel ini dipartisi per rentang created_at (lihat
+    app/database/maintenance.py), jadi created_at ikut primary key.
+    """
     __tablename__ = "stock_queries"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     symbol = Column(String, nullable=False, index=True)
     query_type = Column(String, nullable=False)  # price, info, watchlist
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    
+    __table_args__ = (
+        # Analytics per symbol dalam rentang waktu (juga partition pruning)
+        Index("ix_stock_queries_symbol_created_at", "symbol", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+class StockQueryHourly(Base):
+    """
+    Jumlah query per symbol per jam, di-update incremental saat query di-log.
+    Leaderboard /populer dibaca dari sini, bukan dari GROUP BY stock_queries.
+    """
+    __tablename__ = "stock_query_hourly"
+    
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # awal jam (UTC)
+    symbol = Column(String, primary_key=True)
+    query_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        # Covering index leaderboard: bucket >= since, index-only scan
+        Index("ix_stock_query_hourly_bucket", "bucket", postgresql_include=["symbol", "query_count"]),
+    )
+
+class StockQueryRollup(Base):
+    """
+    Rollup per jam dari stock_queries (per symbol dan query_type), dibuat
+    oleh maintenance untuk jam yang sudah lewat. Tetap tersedia setelah
+    partisi mentahnya di-drop oleh retention.
+    """
+    __tablename__ = "stock_query_rollups"
+    
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # awal jam (UTC)
+    symbol = Column(String, primary_key=True)
+    query_type = Column(String, primary_key=True)
+    query_count = Column(Integer, nullable=False)
+    user_count = Column(Integer, nullable=False)  # user unik di jam itu
+
+class ProcessedUpdate(Base):
+    """Marker update Telegram yang sudah selesai diproses (deduplikasi worker)"""
+    __tablename__ = "processed_updates"
+    
+    update_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -0,0 +1,58 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from app.database import crud
+
+logger = logging.getLogger(__name__)
+
+class UserIdentityCache:
+    """
+    Cache LRU telegram_id -> (user id internal, hash profil).
+    Selama profil tidak berubah, resolve user tidak menyentuh database;
+    saat miss atau profil berubah cukup satu upsert.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or int(os.getenv("USER_CACHE_SIZE", 100000))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _profile_hash(user_data: dict) -> int:
+        return hash((
+            user_data.get("username"),
+            user_data.get("first_name"),
+            user_data.get("last_name"),
+        ))
+
+    def resolve(self, db: Session, user_data: dict) -> int:
+        """Return id internal user untuk objek `from` Telegram"""
+        telegram_id = user_data["id"]
+        profile_hash = self._profile_hash(user_data)
+
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry is not None and entry[1] == profile_hash:
+                self._entries.move_to_end(telegram_id)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+
+        user_id = crud.upsert_user(
+            db,
+            telegram_id=telegram_id,
+            username=user_data.get("username"),
+            first_name=user_data.get("first_name"),
+            last_name=user_data.get("last_name")
+        )
+
+        with self._lock:
+            self._entries[telegram_id] = (user_id, profile_hash)
+            self._entries.move_to_end(telegram_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return user_id
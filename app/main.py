@@ -1,48 +1,100 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 import os
 from dotenv import load_dotenv
 import logging
-from app.queue.producer import QueueProducer
-from app.database.db import init_db
+from app import metrics, tracing
+from app.queue.async_producer import AsyncQueueProducer
+from app.queue.dedup import RecentIds
+from app.queue.ingest import WebhookIngest, IngestError, SECRET_TOKEN_HEADER
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Telegram Stock Bot")
-producer = QueueProducer()
+producer = AsyncQueueProducer()
 
-# Buat semua tabel
-init_db()
+# update_id yang baru di-publish, untuk membuang retry webhook dari Telegram
+recent_updates = RecentIds(int(os.getenv("WEBHOOK_DEDUP_SIZE", 10000)))
+
+# Validasi + filter update sebelum publish
+ingest = WebhookIngest()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
 
-@app.on_event("startup")
-async def startup_event():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     logger.info("Starting up webhook server...")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    producer.close()
+    if not await producer.connect():
+        # Tetap start (koneksi dicoba lagi per publish), tapi jangan diam-diam:
+        # selama broker belum ada webhook membalas 503
+        logger.error(
+            f"RabbitMQ unavailable at startup ({producer.rabbitmq_host}:{producer.rabbitmq_port}); "
+            "webhook will answer 503 until it can publish"
+        )
+    yield
+    await producer.close()
+    tracing.get_tracer().shutdown()
     logger.info("Shutting down webhook server...")
 
+app = FastAPI(title="Telegram Stock Bot", lifespan=lifespan)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post(f"/webhook/{WEBHOOK_SECRET}")
 async def webhook_handler(request: Request):
+    # Root trace update; traceparent dari proxy/load test dilanjutkan jika ada
+    with metrics.INGEST_SECONDS.time(), tracing.start_span(
+        "webhook.update", parent=tracing.extract(request.headers), kind=tracing.KIND_SERVER
+    ):
+        return await _ingest_update(request)
+
+async def _ingest_update(request: Request):
+    if not ingest.check_secret(request.headers.get(SECRET_TOKEN_HEADER)):
+        metrics.WEBHOOK_UPDATES.labels("unauthorized").inc()
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    try:
+        update = ingest.parse(await ingest.read_body(request))
+    except IngestError as e:
+        metrics.WEBHOOK_UPDATES.labels("invalid").inc()
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    # Update yang tidak menghasilkan kerja di worker tidak masuk queue
+    if not ingest.accept(update):
+        metrics.WEBHOOK_UPDATES.labels("dropped").inc()
+        return JSONResponse({"status": "ok"})
+    
     try:
-        update = await request.json()
-        logger.info(f"Received update: {update.get('update_id')}")
+        update_id = update.get("update_id")
+        tracing.current_span().set_attribute("update_id", update_id)
+        logger.info(f"Received update: {update_id}{tracing.log_suffix()}")
+        
+        if update_id is not None and update_id in recent_updates:
+            logger.info(f"Duplicate update {update_id}, skipped")
+            metrics.WEBHOOK_UPDATES.labels("duplicate").inc()
+            return JSONResponse({"status": "ok"})
         
         # Push ke queue untuk diproses worker
-        producer.publish_update(update)
+        if not await producer.publish_update(update):
+            # RabbitMQ tidak tersedia: jangan tandai, 503 supaya Telegram retry
+            metrics.WEBHOOK_UPDATES.labels("error").inc()
+            return JSONResponse({"status": "unavailable"}, status_code=503)
+        # Ditandai setelah publish berhasil: jika gagal, retry Telegram tetap diterima
+        recent_updates.add(update_id)
+        metrics.WEBHOOK_UPDATES.labels("published").inc()
         
         return JSONResponse({"status": "ok"})
     except Exception as e:
+        metrics.WEBHOOK_UPDATES.labels("error").inc()
         logger.error(f"Error handling webhook: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
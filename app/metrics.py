@@ -0,0 +1,128 @@
+"""
+Metrik Prometheus untuk webhook dan worker.
+
+Histogram latency per tahap hot path:
+
+    ingest -> publish -> queue wait -> process (db, quote, send)
+
+Webhook mengekspos /metrics di port FastAPI; worker dan alert worker
+membuka HTTP server kecil di METRICS_PORT (0 = nonaktif).
+"""
+
+import os
+import time
+import logging
+from prometheus_client import Counter, Histogram, start_http_server
+
+logger = logging.getLogger(__name__)
+
+# Detik; rapat di bawah 100 ms untuk DB/cache, sampai menit untuk antrean
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 120, 300,
+)
+
+INGEST_SECONDS = Histogram(
+    "stockbot_webhook_ingest_seconds", "Durasi request webhook sampai dibalas",
+    buckets=LATENCY_BUCKETS
+)
+WEBHOOK_UPDATES = Counter(
+    "stockbot_webhook_updates_total", "Update yang diterima webhook per hasil", ["result"]
+)
+PUBLISH_SECONDS = Histogram(
+    "stockbot_queue_publish_seconds", "Durasi publish update ke RabbitMQ (sampai confirm)",
+    buckets=LATENCY_BUCKETS
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "stockbot_queue_wait_seconds", "Waktu update menunggu di queue (enqueue sampai diambil worker)",
+    buckets=LATENCY_BUCKETS
+)
+PROCESS_SECONDS = Histogram(
+    "stockbot_update_process_seconds", "Durasi proses satu update di worker", ["kind"],
+    buckets=LATENCY_BUCKETS
+)
+UPDATES_PROCESSED = Counter(
+    "stockbot_updates_processed_total", "Update yang selesai di worker per hasil", ["result"]
+)
+DB_SECONDS = Histogram(
+    "stockbot_db_query_seconds", "Durasi statement SQL", ["statement"],
+    buckets=LATENCY_BUCKETS
+)
+QUOTE_SECONDS = Histogram(
+    "stockbot_quote_fetch_seconds", "Durasi fetch quote ke provider (cache miss)", ["provider"],
+    buckets=LATENCY_BUCKETS
+)
+QUOTE_CACHE = Counter(
+    "stockbot_quote_cache_total", "Lookup quote cache per hasil", ["result"]
+)
+TELEGRAM_SECONDS = Histogram(
+    "stockbot_telegram_request_seconds", "Durasi request ke Bot API", ["method"],
+    buckets=LATENCY_BUCKETS
+)
+# Reuse koneksi = 1 - connections_opened / requests (per client sync/async)
+TELEGRAM_REQUESTS = Counter(
+    "stockbot_telegram_requests_total", "Request ke Bot API", ["client"]
+)
+TELEGRAM_CONNECTIONS = Counter(
+    "stockbot_telegram_connections_opened_total", "Koneksi TCP baru ke Bot API", ["client"]
+)
+TELEGRAM_RATE_LIMITED = Counter(
+    "stockbot_telegram_429_total", "Response 429 dari Bot API", ["method"]
+)
+ERRORS = Counter(
+    "stockbot_errors_total", "Error per komponen", ["component"]
+)
+
+# Header AMQP berisi waktu enqueue (epoch detik, float)
+ENQUEUED_AT_HEADER = "x-enqueued-at"
+
+
+def enqueue_headers() -> dict:
+    """Header yang ditambahkan producer ke setiap message"""
+    return {ENQUEUED_AT_HEADER: time.time()}
+
+
+def observe_queue_wait(properties):
+    """Catat waktu tunggu di queue dari header (fallback property timestamp); return detik atau None"""
+    headers = getattr(properties, "headers", None) or {}
+    enqueued_at = headers.get(ENQUEUED_AT_HEADER) or getattr(properties, "timestamp", None)
+    if not enqueued_at:
+        return None
+    wait = max(0.0, time.time() - float(enqueued_at))
+    QUEUE_WAIT_SECONDS.observe(wait)
+    return wait
+
+
+def _statement_type(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return keyword if keyword in ("select", "insert", "update", "delete") else "other"
+
+
+def instrument_engine(engine):
+    """Pasang timer ke semua statement engine SQLAlchemy (sync; untuk async pakai .sync_engine)"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        DB_SECONDS.labels(_statement_type(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if started:
+            started.pop()
+        ERRORS.labels("db").inc()
+
+
+def start_metrics_server(default_port: int = 9100):
+    """HTTP server /metrics untuk proses non-web (worker); METRICS_PORT=0 menonaktifkan"""
+    port = int(os.getenv("METRICS_PORT", default_port))
+    if port <= 0:
+        return
+    start_http_server(port)
+    logger.info(f"Metrics available on :{port}/metrics")
@@ -4,5 +4,6 @@ Queue module untuk RabbitMQ producer dan consumer
 
 from .producer import QueueProducer
 from .consumer import QueueConsumer
+from .async_producer import AsyncQueueProducer
 
-__all__ = ["QueueProducer", "QueueConsumer"]
+__all__ = ["QueueProducer", "QueueConsumer", "AsyncQueueProducer"]
@@ -0,0 +1,217 @@
+import asyncio
+import aio_pika
+from aio_pika.pool import Pool
+import os
+import time
+import logging
+from app import metrics, tracing
+from app.queue import sharding, wire
+
+logger = logging.getLogger(__name__)
+
+class AsyncQueueProducer:
+    """
+    Producer asyncio-native untuk webhook FastAPI.
+    Memakai satu koneksi robust dan pool channel dengan publisher confirms,
+    sehingga publish tidak memblokir event loop.
+
+    Jika PUBLISH_BATCH_SIZE > 0, update dikumpulkan selama
+    PUBLISH_BATCH_DELAY_MS atau sampai N message, lalu dikirim sekaligus
+    di satu channel. Setiap pemanggil menunggu confirm untuk message-nya.
+    """
+
+    def __init__(self):
+        self.rabbitmq_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
+        self.rabbitmq_port = int(os.getenv("RABBITMQ_PORT", 5672))
+        self.queue_name = os.getenv("QUEUE_NAME", "telegram_updates")
+        self.channel_pool_size = int(os.getenv("RABBITMQ_CHANNEL_POOL_SIZE", 10))
+        self.publish_timeout = float(os.getenv("RABBITMQ_PUBLISH_TIMEOUT", 5))
+        self.batch_size = int(os.getenv("PUBLISH_BATCH_SIZE", 0))
+        self.batch_delay = float(os.getenv("PUBLISH_BATCH_DELAY_MS", 5)) / 1000
+        self.shards = int(os.getenv("QUEUE_SHARDS", 0))
+        self.content_type = wire.producer_content_type()
+
+        self.connection = None
+        self.channel_pool = None
+        self._pending = None
+        self._flusher = None
+
+    async def connect(self):
+        """Membuat koneksi ke RabbitMQ dan pool channel"""
+        if self.connection and not self.connection.is_closed:
+            return True
+
+        try:
+            self.connection = await aio_pika.connect_robust(
+                host=self.rabbitmq_host,
+                port=self.rabbitmq_port,
+                login=os.getenv("RABBITMQ_USER", "guest"),
+                password=os.getenv("RABBITMQ_PASS", "guest"),
+                heartbeat=600
+            )
+            self.channel_pool = Pool(self._get_channel, max_size=self.channel_pool_size)
+
+            # Declare queue dengan durability
+            async with self.channel_pool.acquire() as channel:
+                if self.shards > 0:
+                    await sharding.declare_topology_async(channel, self.queue_name, self.shards)
+                else:
+                    await channel.declare_queue(self.queue_name, durable=True)
+
+            if self.batch_size > 0 and self._flusher is None:
+                self._pending = asyncio.Queue()
+                self._flusher = asyncio.create_task(self._flush_loop())
+
+            logger.info(f"Async producer connected to RabbitMQ at {self.rabbitmq_host}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to connect to RabbitMQ: {e}")
+            return False
+
+    async def _get_channel(self) -> aio_pika.abc.AbstractChannel:
+        """Buat channel baru dengan publisher confirms aktif"""
+        return await self.connection.channel(publisher_confirms=True)
+
+    def _route(self, update_data: dict) -> str:
+        """Routing key untuk update (nomor shard per chat jika sharding aktif)"""
+        if self.shards > 0:
+            return str(sharding.shard_for(sharding.get_chat_id(update_data), self.shards))
+        return self.queue_name
+
+    async def _publish(self, channel, message: aio_pika.Message, routing_key: str):
+        """Publish satu message di channel dan tunggu confirm"""
+        if self.shards > 0:
+            exchange = await channel.get_exchange(
+                sharding.exchange_name(self.queue_name), ensure=False
+            )
+        else:
+            exchange = channel.default_exchange
+        return await exchange.publish(
+            message,
+            routing_key=routing_key,
+            timeout=self.publish_timeout
+        )
+
+    def _build_message(self, update_data: dict) -> aio_pika.Message:
+        """Serialize update (format wire QUEUE_WIRE_FORMAT) menjadi AMQP message persistent"""
+        body, content_type = wire.encode_update(update_data, self.content_type)
+        return aio_pika.Message(
+            body=body,
+            content_type=content_type,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            timestamp=int(time.time()),  # Umur pesan untuk autoscaler
+            headers=tracing.inject(metrics.enqueue_headers())
+        )
+
+    async def publish_update(self, update_data: dict):
+        """
+        Publish update ke queue dan tunggu confirm dari broker.
+        Return False jika RabbitMQ tidak bisa dihubungi (pemanggil wajib cek),
+        raise jika publish/confirm gagal.
+        """
+        if not self.connection or self.connection.is_closed:
+            if not await self.connect():
+                logger.warning("Cannot publish update: RabbitMQ not available")
+                return False
+
+        routing_key = self._route(update_data)
+
+        try:
+            with metrics.PUBLISH_SECONDS.time(), tracing.start_span(
+                "queue.publish", kind=tracing.KIND_PRODUCER, attributes={"messaging.destination": routing_key}
+            ):
+                message = self._build_message(update_data)
+                if self._flusher is not None:
+                    future = asyncio.get_running_loop().create_future()
+                    self._pending.put_nowait((message, routing_key, future))
+                    await future
+                else:
+                    async with self.channel_pool.acquire() as channel:
+                        await self._publish(channel, message, routing_key)
+            logger.info(f"Published update {update_data.get('update_id')}")
+            return True
+        except Exception as e:
+            metrics.ERRORS.labels("publish").inc()
+            logger.error(f"Failed to publish update: {e}")
+            raise
+
+    async def _flush_loop(self):
+        """Kumpulkan message sampai batch penuh atau delay habis, lalu flush"""
+        loop = asyncio.get_running_loop()
+        # Task get() dipertahankan antar iterasi, tidak dibatalkan saat delay
+        # habis: wait_for(get()) di Python 3.11 bisa membuang item yang keluar
+        # dari queue tepat saat timeout sehingga future publish-nya menggantung
+        getter = None
+        stopping = False
+        try:
+            while not stopping:
+                if getter is None:
+                    getter = asyncio.ensure_future(self._pending.get())
+                item = await getter
+                getter = None
+                if item is None:
+                    break
+                batch = [item]
+                deadline = loop.time() + self.batch_delay
+
+                while len(batch) < self.batch_size:
+                    if not self._pending.empty():
+                        item = self._pending.get_nowait()
+                    else:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            break
+                        getter = asyncio.ensure_future(self._pending.get())
+                        done, _ = await asyncio.wait((getter,), timeout=remaining)
+                        if not done:
+                            # Getter tetap jalan; hasilnya jadi awal batch berikutnya
+                            break
+                        item = getter.result()
+                        getter = None
+                    if item is None:
+                        # Sinyal shutdown: flush batch terakhir lalu berhenti
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                await self._flush(batch)
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+    async def _flush(self, batch: list):
+        """Kirim satu batch secara pipelined dan resolve future tiap message"""
+        try:
+            async with self.channel_pool.acquire() as channel:
+                # Semua publish dikirim dulu, confirm ditunggu bersamaan
+                results = await asyncio.gather(
+                    *(
+                        self._publish(channel, message, routing_key)
+                        for message, routing_key, _ in batch
+                    ),
+                    return_exceptions=True
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        logger.debug(f"Flushed batch of {len(batch)} messages")
+
+    async def close(self):
+        """Flush sisa batch, tutup pool channel dan koneksi"""
+        if self._flusher is not None:
+            self._pending.put_nowait(None)
+            await self._flusher
+            self._flusher = None
+
+        if self.channel_pool and not self.channel_pool.is_closed:
+            await self.channel_pool.close()
+        if self.connection and not self.connection.is_closed:
+            await self.connection.close()
@@ -2,17 +2,57 @@ import pika
 import os
 import logging
 import time
+import math
+import random
+import requests
+from app.queue import sharding
 
 logger = logging.getLogger(__name__)
 
 class QueueConsumer:
+    """
+    Consumer pika untuk queue update (atau shard queue jika QUEUE_SHARDS > 0).
+
+    Shard queue memakai single-active-consumer: RabbitMQ mengaktifkan consumer
+    yang paling dulu subscribe, sehingga worker pertama aktif di semua shard.
+    Karena itu worker menyeimbangkan ulang tiap SHARD_REBALANCE_INTERVAL detik:
+    jumlah shard yang aktif di worker ini (dibaca dari management API)
+    dibandingkan dengan jatah ceil(shard / jumlah consumer), kelebihannya
+    di-cancel lalu subscribe ulang sehingga pindah ke antrean standby dan
+    consumer berikutnya (biasanya worker baru) menjadi aktif.
+    """
+
     def __init__(self):
         self.rabbitmq_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
         self.rabbitmq_port = int(os.getenv("RABBITMQ_PORT", 5672))
         self.queue_name = os.getenv("QUEUE_NAME", "telegram_updates")
+        self.prefetch_count = int(os.getenv("WORKER_PREFETCH_COUNT", 1))
+        self.shards = int(os.getenv("QUEUE_SHARDS", 0))
+        self.queue_names = [self.queue_name]
+        self.shard_list = []
+        if self.shards > 0:
+            worker_shards = os.getenv("WORKER_SHARDS", "")
+            self.shard_list = sharding.parse_shard_list(worker_shards, self.shards)
+            if not worker_shards:
+                # Semua worker subscribe ke semua shard; urutan acak hanya
+                # membantu worker yang start bersamaan, sisanya lewat rebalance
+                random.shuffle(self.shard_list)
+            self.queue_names = [
+                sharding.shard_queue_name(self.queue_name, shard)
+                for shard in self.shard_list
+            ]
+        
+        self.rebalance_interval = float(os.getenv("SHARD_REBALANCE_INTERVAL", 30)) if self.shards > 0 else 0
+        host = os.getenv("RABBITMQ_HOST", "rabbitmq")
+        self.management_url = os.getenv("RABBITMQ_MANAGEMENT_URL", f"http://{host}:15672").rstrip("/")
+        self.vhost = os.getenv("RABBITMQ_VHOST", "/")
+        self._session = None
         
         self.connection = None
         self.channel = None
+        self._callback = None
+        self._is_busy = None
+        self._consumer_tags = {}  # shard -> consumer tag
         self._connect()
     
     def _connect(self):
@@ -37,13 +77,18 @@ class QueueConsumer:
                 self.channel = self.connection.channel()
                 
                 # Declare queue
-                self.channel.queue_declare(
-                    queue=self.queue_name,
-                    durable=True
-                )
+                if self.shards > 0:
+                    sharding.declare_topology(
+                        self.channel, self.queue_name, self.shards, self.shard_list
+                    )
+                else:
+                    self.channel.queue_declare(
+                        queue=self.queue_name,
+                        durable=True
+                    )
                 
                 # Set prefetch count untuk load balancing antar worker
-                self.channel.basic_qos(prefetch_count=1)
+                self.channel.basic_qos(prefetch_count=self.prefetch_count)
                 
                 logger.info(f"Consumer connected to RabbitMQ at {self.rabbitmq_host}")
                 return
@@ -54,15 +99,27 @@ class QueueConsumer:
                 else:
                     raise
     
-    def consume(self, callback):
-        """Mulai consume messages dari queue"""
+    def consume(self, callback, is_busy=None):
+        """
+        Mulai consume messages dari queue.
+        is_busy(shard): True jika masih ada message shard itu yang diproses
+        (mode concurrent); shard yang sibuk tidak dipindahkan saat rebalance.
+        """
+        self._callback = callback
+        self._is_busy = is_busy
         try:
-            self.channel.basic_consume(
-                queue=self.queue_name,
-                on_message_callback=callback,
-                auto_ack=False  # Manual acknowledgment
-            )
-            logger.info(f"Starting to consume from {self.queue_name}")
+            if self.shards > 0:
+                for shard in self.shard_list:
+                    self._subscribe(shard)
+                if self.rebalance_interval > 0:
+                    self._schedule_rebalance()
+            else:
+                self.channel.basic_consume(
+                    queue=self.queue_name,
+                    on_message_callback=callback,
+                    auto_ack=False  # Manual acknowledgment
+                )
+            logger.info(f"Starting to consume from {', '.join(self.queue_names)}")
             self.channel.start_consuming()
         except KeyboardInterrupt:
             logger.info("Stopping consumer...")
@@ -71,6 +128,79 @@ class QueueConsumer:
             logger.error(f"Error consuming: {e}")
             raise
     
+    def _subscribe(self, shard: int):
+        self._consumer_tags[shard] = self.channel.basic_consume(
+            queue=sharding.shard_queue_name(self.queue_name, shard),
+            on_message_callback=self._callback,
+            auto_ack=False
+        )
+    
+    def _schedule_rebalance(self):
+        # Jitter supaya worker tidak melepas shard bersamaan
+        self.connection.call_later(self.rebalance_interval * random.uniform(0.5, 1.5), self._rebalance)
+    
+    def _shard_states(self) -> dict:
+        """nama queue -> (consumer tag aktif, jumlah consumer) dari management API"""
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.auth = (os.getenv("RABBITMQ_USER", "guest"), os.getenv("RABBITMQ_PASS", "guest"))
+        response = self._session.get(
+            f"{self.management_url}/api/queues/{requests.utils.quote(self.vhost, safe='')}",
+            params={"columns": "name,consumers,single_active_consumer_tag"},
+            timeout=5
+        )
+        response.raise_for_status()
+        return {
+            queue["name"]: (queue.get("single_active_consumer_tag"), queue.get("consumers") or 0)
+            for queue in response.json()
+        }
+    
+    def rebalance(self) -> int:
+        """Lepas shard aktif di atas jatah; return jumlah shard yang dilepas"""
+        states = self._shard_states()
+        active = []
+        consumers = 1
+        for shard, tag in self._consumer_tags.items():
+            active_tag, count = states.get(sharding.shard_queue_name(self.queue_name, shard), (None, 0))
+            consumers = max(consumers, count)
+            if active_tag == tag:
+                active.append(shard)
+        
+        fair_share = math.ceil(len(self.shard_list) / consumers)
+        released = 0
+        for shard in active[fair_share:]:
+            if self._is_busy is not None and self._is_busy(shard):
+                continue
+            self.channel.basic_cancel(self._consumer_tags.pop(shard))
+            self._subscribe(shard)
+            released += 1
+        if released:
+            logger.info(
+                f"Released {released} of {len(active)} active shards "
+                f"(fair share {fair_share} for {consumers} consumers)"
+            )
+        return released
+    
+    def _rebalance(self):
+        try:
+            self.rebalance()
+        except Exception as e:
+            logger.warning(f"Shard rebalance skipped: {e}")
+        self._schedule_rebalance()
+    
+    def add_callback_threadsafe(self, callback):
+        """Jadwalkan callback di thread koneksi (untuk ack dari thread lain)"""
+        self.connection.add_callback_threadsafe(callback)
+    
+    def flush(self):
+        """
+        Jalankan callback threadsafe yang masih antre (ack dari thread pool)
+        dan kirim ke broker. Dipanggil setelah stop_consuming: tanpa ini ack
+        terakhir hilang saat koneksi ditutup dan message di-redeliver.
+        """
+        if self.connection and self.connection.is_open:
+            self.connection.process_data_events(time_limit=0)
+    
     def close(self):
         """Tutup koneksi"""
         if self.connection and not self.connection.is_closed:
@@ -0,0 +1,170 @@
+"""
+Deduplikasi update Telegram berdasarkan update_id.
+
+Telegram me-retry webhook yang lambat/gagal dan RabbitMQ me-redeliver
+message saat worker crash, jadi update yang sama bisa datang lebih dari
+sekali.
+
+- Webhook: RecentIds, ring buffer + set update_id terbaru (O(1), memori
+  tetap). Update yang sudah di-publish tidak di-publish ulang.
+- Worker: UpdateDeduplicator, RecentIds lokal di depan marker "processed"
+  yang durable (UPDATE_DEDUP_BACKEND = postgres | redis | memory). Update
+  yang sudah selesai diproses di-drop sebelum kerja DB/HTTP apa pun.
+  Marker durable hanya dipakai untuk update yang ditangani command dengan
+  needs_db; /start, /help dan query harga cukup dicek di cache lokal
+  sehingga tetap tidak menyentuh Postgres (redelivery-nya paling banyak
+  menghasilkan balasan ganda).
+
+Marker ditulis setelah update selesai diproses (at-least-once): crash di
+tengah proses berarti update diproses ulang, bukan hilang.
+"""
+
+import os
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class RecentIds:
+    """Set update_id terbaru dengan kapasitas tetap (FIFO eviction)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._order = deque()
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, update_id) -> bool:
+        return update_id in self._ids
+
+    def add(self, update_id) -> bool:
+        """Tambah id, return False jika sudah ada"""
+        with self._lock:
+            if update_id in self._ids:
+                return False
+            self._ids.add(update_id)
+            self._order.append(update_id)
+            if len(self._order) > self.capacity:
+                self._ids.discard(self._order.popleft())
+            return True
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class MemoryProcessedStore:
+    """Marker per proses (tidak durable), untuk development"""
+
+    def __init__(self, capacity: int = 100000):
+        self._ids = RecentIds(capacity)
+
+    def is_processed(self, update_id: int) -> bool:
+        return update_id in self._ids
+
+    def mark_processed(self, update_id: int):
+        self._ids.add(update_id)
+
+
+class RedisProcessedStore:
+    """Marker di Redis dengan TTL, dibagi antar worker"""
+
+    def __init__(self, url: str, ttl: int, prefix: str = "tg:update:"):
+        import redis  # optional dependency, hanya dibutuhkan untuk backend ini
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def is_processed(self, update_id: int) -> bool:
+        return bool(self.client.exists(f"{self.prefix}{update_id}"))
+
+    def mark_processed(self, update_id: int):
+        self.client.set(f"{self.prefix}{update_id}", 1, ex=self.ttl)
+
+
+class PostgresProcessedStore:
+    """
+    Marker di tabel processed_updates (satu lookup primary key).
+    Baris lebih tua dari UPDATE_DEDUP_TTL dihapus oleh app.database.maintenance.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def is_processed(self, update_id: int) -> bool:
+        from app.database import crud
+
+        db = self.session_factory()
+        try:
+            return crud.is_update_processed(db, update_id)
+        finally:
+            db.close()
+
+    def mark_processed(self, update_id: int):
+        from app.database import crud
+
+        db = self.session_factory()
+        try:
+            crud.mark_update_processed(db, update_id)
+        finally:
+            db.close()
+
+
+def create_processed_store():
+    """Pilih backend marker dari env UPDATE_DEDUP_BACKEND (postgres | redis | memory)"""
+    backend = os.getenv("UPDATE_DEDUP_BACKEND", "postgres").lower()
+    if backend == "redis":
+        return RedisProcessedStore(
+            os.getenv("REDIS_URL", "redis://redis:6379/0"),
+            ttl=int(os.getenv("UPDATE_DEDUP_TTL", 86400))
+        )
+    if backend == "postgres":
+        from app.database.db import SessionLocal
+        return PostgresProcessedStore(SessionLocal)
+    if backend == "memory":
+        return MemoryProcessedStore()
+    raise ValueError(f"Unknown update dedup backend: {backend}")
+
+
+class UpdateDeduplicator:
+    """Cache lokal + marker durable untuk worker"""
+
+    def __init__(self, store=None, local_size: int = None):
+        self.store = store if store is not None else create_processed_store()
+        self.local = RecentIds(local_size or int(os.getenv("UPDATE_DEDUP_LOCAL_SIZE", 10000)))
+        self.stats = {"duplicates": 0, "store_errors": 0}
+
+    def is_duplicate(self, update_id, durable: bool = True) -> bool:
+        """True jika update sudah pernah selesai diproses (durable=False: cache lokal saja)"""
+        if update_id is None:
+            return False
+        if update_id in self.local:
+            self.stats["duplicates"] += 1
+            return True
+        if not durable:
+            return False
+        try:
+            processed = self.store.is_processed(update_id)
+        except Exception as e:
+            # Marker tidak tersedia: lebih baik proses ulang daripada drop
+            self.stats["store_errors"] += 1
+            logger.warning(f"Dedup store unavailable: {e}")
+            return False
+        if processed:
+            self.local.add(update_id)
+            self.stats["duplicates"] += 1
+        return processed
+
+    def mark_processed(self, update_id, durable: bool = True):
+        if update_id is None:
+            return
+        self.local.add(update_id)
+        if not durable:
+            return
+        try:
+            self.store.mark_processed(update_id)
+        except Exception as e:
+            self.stats["store_errors"] += 1
+            logger.warning(f"Failed to mark update {update_id} processed: {e}")
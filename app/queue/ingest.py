@@ -0,0 +1,120 @@
+"""
+Tahap ingest webhook: validasi dan filter update sebelum publish ke queue.
+
+- Header X-Telegram-Bot-Api-Secret-Token dicocokkan dengan
+  WEBHOOK_SECRET_TOKEN (diset lewat set_webhook.py), jika diisi.
+- Body dibatasi WEBHOOK_MAX_BODY_BYTES (cek Content-Length lalu saat
+  streaming) dan di-parse dengan orjson.
+- Update yang tidak akan menghasilkan kerja di worker dibuang di sini
+  (tetap dibalas 200 supaya Telegram tidak me-retry): jenis update selain
+  message/callback_query, message tanpa teks (foto, join/leave grup),
+  pesan dari bot, obrolan biasa yang bukan kode saham, dan command untuk
+  bot lain (/cmd@bot_lain). Aturannya sama dengan CommandRouter di worker.
+"""
+
+import os
+import hmac
+import logging
+import orjson
+from app.bot.router import TICKER_PATTERN
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class IngestError(Exception):
+    """Request webhook ditolak; status_code dipakai sebagai status HTTP"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class WebhookIngest:
+    def __init__(self, secret_token: str = None, max_body_bytes: int = None, bot_username: str = None):
+        token = secret_token if secret_token is not None else os.getenv("WEBHOOK_SECRET_TOKEN", "")
+        self.secret_token = token.encode()
+        self.max_body_bytes = max_body_bytes or int(os.getenv("WEBHOOK_MAX_BODY_BYTES", 65536))
+        username = bot_username if bot_username is not None else os.getenv("TELEGRAM_BOT_USERNAME", "")
+        self.bot_username = username.lstrip("@").lower()
+        self.stats = {"accepted": 0, "dropped": {}}
+
+    def check_secret(self, header_value: str) -> bool:
+        """Bandingkan secret token (constant time); lolos jika tidak dikonfigurasi"""
+        if not self.secret_token:
+            return True
+        return header_value is not None and hmac.compare_digest(header_value.encode(), self.secret_token)
+
+    async def read_body(self, request) -> bytes:
+        """Baca body request dengan batas ukuran"""
+        length = request.headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_body_bytes:
+            raise IngestError(413, "Request body too large")
+
+        chunks = []
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise IngestError(413, "Request body too large")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def parse(self, body: bytes) -> dict:
+        try:
+            update = orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise IngestError(400, f"Invalid JSON: {e}")
+        if not isinstance(update, dict):
+            raise IngestError(400, "Update must be a JSON object")
+        return update
+
+    def drop_reason(self, update: dict):
+        """Alasan update dibuang, None jika update perlu diproses worker"""
+        message = update.get("message")
+        if message is not None:
+            # Bentuk yang tidak sesuai Bot API dibuang di sini, bukan 500 / crash di worker
+            if not isinstance(message, dict) or not isinstance(message.get("chat"), dict):
+                return "unsupported"
+            text = message.get("text")
+            if not text:
+                return "no_text"
+            if not isinstance(text, str):
+                return "unsupported"
+            sender = message.get("from")
+            if sender is not None and not isinstance(sender, dict):
+                return "unsupported"
+            if (sender or {}).get("is_bot"):
+                return "from_bot"
+            if text[0] == "/":
+                parts = text[1:].split(maxsplit=1)
+                _, _, mention = (parts[0] if parts else "").partition("@")
+                if mention and self.bot_username and mention.lower() != self.bot_username:
+                    return "other_bot"
+                return None
+            if not TICKER_PATTERN.match(text.strip()):
+                return "chatter"
+            return None
+
+        callback = update.get("callback_query")
+        if callback is not None:
+            if not isinstance(callback, dict):
+                return "unsupported"
+            if not callback.get("data") or not callback.get("message"):
+                return "no_data"
+            if not isinstance(callback["message"], dict) or not isinstance(callback["message"].get("chat"), dict):
+                return "unsupported"
+            return None
+
+        return "unsupported"
+
+    def accept(self, update: dict) -> bool:
+        """Catat hasil filter ke stats, True jika update perlu di-publish"""
+        reason = self.drop_reason(update)
+        if reason is None:
+            self.stats["accepted"] += 1
+            return True
+        self.stats["dropped"][reason] = self.stats["dropped"].get(reason, 0) + 1
+        logger.debug(f"Dropped update {update.get('update_id')}: {reason}")
+        return False
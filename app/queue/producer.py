@@ -1,7 +1,9 @@
 import pika
-import json
 import os
+import time
 import logging
+from app import metrics, tracing
+from app.queue import sharding, wire
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +12,8 @@ class QueueProducer:
         self.rabbitmq_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
         self.rabbitmq_port = int(os.getenv("RABBITMQ_PORT", 5672))
         self.queue_name = os.getenv("QUEUE_NAME", "telegram_updates")
+        self.shards = int(os.getenv("QUEUE_SHARDS", 0))
+        self.content_type = wire.producer_content_type()
         
         self.connection = None
         self.channel = None
@@ -38,10 +42,13 @@ class QueueProducer:
             self.channel = self.connection.channel()
             
             # Declare queue dengan durability
-            self.channel.queue_declare(
-                queue=self.queue_name,
-                durable=True
-            )
+            if self.shards > 0:
+                sharding.declare_topology(self.channel, self.queue_name, self.shards)
+            else:
+                self.channel.queue_declare(
+                    queue=self.queue_name,
+                    durable=True
+                )
             self._connection_attempted = True
             logger.info(f"Connected to RabbitMQ at {self.rabbitmq_host}")
             return True
@@ -50,6 +57,13 @@ class QueueProducer:
             logger.error(f"Failed to connect to RabbitMQ: {e}")
             return False
     
+    def _route(self, update_data: dict):
+        """Tentukan exchange dan routing key (per chat jika sharding aktif)"""
+        if self.shards > 0:
+            shard = sharding.shard_for(sharding.get_chat_id(update_data), self.shards)
+            return sharding.exchange_name(self.queue_name), str(shard)
+        return '', self.queue_name
+    
     def publish_update(self, update_data: dict):
         """Publish update ke queue"""
         try:
@@ -58,17 +72,25 @@ class QueueProducer:
                     logger.warning("Cannot publish update: RabbitMQ not available")
                     return False
             
-            message = json.dumps(update_data)
-            self.channel.basic_publish(
-                exchange='',
-                routing_key=self.queue_name,
-                body=message,
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Make message persistent
+            message, content_type = wire.encode_update(update_data, self.content_type)
+            exchange, routing_key = self._route(update_data)
+            with metrics.PUBLISH_SECONDS.time(), tracing.start_span(
+                "queue.publish", kind=tracing.KIND_PRODUCER, attributes={"messaging.destination": routing_key}
+            ):
+                self.channel.basic_publish(
+                    exchange=exchange,
+                    routing_key=routing_key,
+                    body=message,
+                    properties=pika.BasicProperties(
+                        content_type=content_type,
+                        delivery_mode=2,  # Make message persistent
+                        timestamp=int(time.time()),  # Umur pesan untuk autoscaler
+                        headers=tracing.inject(metrics.enqueue_headers()),
+                    )
                 )
-            )
             logger.info(f"Published update {update_data.get('update_id')}")
         except Exception as e:
+            metrics.ERRORS.labels("publish").inc()
             logger.error(f"Failed to publish update: {e}")
             self._connect()  # Reconnect
             raise
@@ -0,0 +1,89 @@
+"""
+Helper untuk topologi queue yang di-shard per chat.
+
+Producer mem-publish ke direct exchange `<QUEUE_NAME>.sharded` dengan
+routing key nomor shard (chat_id % QUEUE_SHARDS). Setiap shard punya queue
+`<QUEUE_NAME>.<shard>` dengan single-active-consumer, sehingga update dari
+satu chat selalu diproses berurutan oleh satu worker walaupun worker
+di-scale horizontal. Shard aktif dibagi rata antar worker oleh
+QueueConsumer.rebalance().
+"""
+
+import aio_pika
+
+SHARD_QUEUE_ARGUMENTS = {"x-single-active-consumer": True}
+
+
+def get_chat_id(update_data: dict):
+    """Ambil chat_id dari update Telegram, None jika tidak ada"""
+    if "message" in update_data:
+        return update_data["message"]["chat"]["id"]
+    if "callback_query" in update_data:
+        return update_data["callback_query"]["message"]["chat"]["id"]
+    return None
+
+
+def shard_for(chat_id, shards: int) -> int:
+    """Nomor shard untuk chat_id (stabil antar proses)"""
+    if chat_id is None:
+        return 0
+    return int(chat_id) % shards
+
+
+def exchange_name(queue_name: str) -> str:
+    return f"{queue_name}.sharded"
+
+
+def shard_queue_name(queue_name: str, shard: int) -> str:
+    return f"{queue_name}.{shard}"
+
+
+def parse_shard_list(value: str, shards: int) -> list:
+    """
+    Parse daftar shard seperti "0,2,4-7".
+    String kosong berarti semua shard.
+    """
+    if not value:
+        return list(range(shards))
+
+    result = []
+    for part in value.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-", 1)
+            result.extend(range(int(start), int(end) + 1))
+        elif part:
+            result.append(int(part))
+
+    invalid = [s for s in result if not 0 <= s < shards]
+    if invalid:
+        raise ValueError(f"Invalid shard numbers {invalid} for {shards} shards")
+    return sorted(set(result))
+
+
+def declare_topology(channel, queue_name: str, shards: int, shard_list: list = None):
+    """Declare exchange, shard queues dan binding (pika)"""
+    exchange = exchange_name(queue_name)
+    channel.exchange_declare(exchange=exchange, exchange_type="direct", durable=True)
+
+    for shard in (range(shards) if shard_list is None else shard_list):
+        name = shard_queue_name(queue_name, shard)
+        channel.queue_declare(queue=name, durable=True, arguments=SHARD_QUEUE_ARGUMENTS)
+        channel.queue_bind(queue=name, exchange=exchange, routing_key=str(shard))
+
+
+async def declare_topology_async(channel, queue_name: str, shards: int):
+    """Declare exchange, shard queues dan binding (aio-pika)"""
+    exchange = await channel.declare_exchange(
+        exchange_name(queue_name),
+        aio_pika.ExchangeType.DIRECT,
+        durable=True
+    )
+
+    for shard in range(shards):
+        queue = await channel.declare_queue(
+            shard_queue_name(queue_name, shard),
+            durable=True,
+            arguments=SHARD_QUEUE_ARGUMENTS
+        )
+        await queue.bind(exchange, routing_key=str(shard))
@@ -0,0 +1,130 @@
+"""
+Format wire untuk update yang masuk queue.
+
+- JSON: update Telegram mentah (format lama), content type application/json
+- Compact v1: envelope msgpack berisi field yang dipakai handler saja,
+  content type application/vnd.stockbot.update.v1+msgpack
+
+Envelope v1 adalah array msgpack dengan posisi tetap:
+
+    [update_id, kind, chat_id, message_id, user_id, username,
+     first_name, last_name, text, callback_id, raw]
+
+kind: 0 = message, 1 = callback_query, 2 = lainnya. `raw` berisi update
+asli hanya untuk kind lainnya atau jika QUEUE_WIRE_INCLUDE_RAW=true.
+Decode menghasilkan dict berbentuk update Telegram (subset) sehingga
+handler tidak perlu berubah.
+
+Negosiasi: producer memilih format lewat QUEUE_WIRE_FORMAT, consumer
+memilih decoder dari content type tiap message dan menolak versi yang
+tidak dikenalnya. Saat upgrade format, deploy worker dulu baru webhook.
+"""
+
+import os
+import json
+import msgpack
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_COMPACT_V1 = "application/vnd.stockbot.update.v1+msgpack"
+
+FORMATS = {
+    "json": CONTENT_TYPE_JSON,
+    "msgpack": CONTENT_TYPE_COMPACT_V1,
+}
+
+KIND_MESSAGE = 0
+KIND_CALLBACK = 1
+KIND_OTHER = 2
+
+
+class UnsupportedContentType(ValueError):
+    """Message dengan format wire yang tidak dikenal consumer ini"""
+
+
+def producer_content_type() -> str:
+    """Content type yang dipakai producer (env QUEUE_WIRE_FORMAT)"""
+    name = os.getenv("QUEUE_WIRE_FORMAT", "msgpack").lower()
+    if name not in FORMATS:
+        raise ValueError(f"Unknown queue wire format: {name}")
+    return FORMATS[name]
+
+
+def _compact_v1(update: dict, include_raw: bool) -> list:
+    if "message" in update:
+        message = update["message"]
+        user = message.get("from") or {}
+        return [
+            update.get("update_id"), KIND_MESSAGE,
+            message["chat"]["id"], message.get("message_id"),
+            user.get("id"), user.get("username"), user.get("first_name"), user.get("last_name"),
+            message.get("text", ""), None,
+            update if include_raw else None,
+        ]
+    if "callback_query" in update:
+        callback = update["callback_query"]
+        message = callback.get("message") or {}
+        user = callback.get("from") or {}
+        return [
+            update.get("update_id"), KIND_CALLBACK,
+            (message.get("chat") or {}).get("id"), message.get("message_id"),
+            user.get("id"), user.get("username"), user.get("first_name"), user.get("last_name"),
+            callback.get("data"), callback.get("id"),
+            update if include_raw else None,
+        ]
+    # Jenis update lain belum punya field ringkas: simpan utuh
+    return [update.get("update_id"), KIND_OTHER, None, None, None, None, None, None, None, None, update]
+
+
+def _expand_v1(envelope: list) -> dict:
+    (update_id, kind, chat_id, message_id, user_id, username,
+     first_name, last_name, text, callback_id, raw) = envelope
+    if raw is not None:
+        return raw
+
+    # Update tanpa pengirim (mis. post channel) tetap tanpa "from", sama
+    # seperti jalur JSON; {"id": None} akan masuk upsert user sebagai NULL
+    user = None
+    if user_id is not None:
+        user = {"id": user_id}
+        if username is not None:
+            user["username"] = username
+        if first_name is not None:
+            user["first_name"] = first_name
+        if last_name is not None:
+            user["last_name"] = last_name
+    message = {"message_id": message_id, "chat": {"id": chat_id}}
+
+    if kind == KIND_MESSAGE:
+        if user is not None:
+            message["from"] = user
+        message["text"] = text
+        return {"update_id": update_id, "message": message}
+    callback = {"id": callback_id, "message": message, "data": text}
+    if user is not None:
+        callback["from"] = user
+    return {"update_id": update_id, "callback_query": callback}
+
+
+def encode_update(update: dict, content_type: str = None) -> tuple:
+    """
+    Serialize update untuk queue.
+
+    Returns:
+        (body bytes, content type)
+    """
+    content_type = content_type or producer_content_type()
+    if content_type == CONTENT_TYPE_COMPACT_V1:
+        include_raw = os.getenv("QUEUE_WIRE_INCLUDE_RAW", "false").lower() == "true"
+        return msgpack.packb(_compact_v1(update, include_raw), use_bin_type=True), content_type
+    if content_type == CONTENT_TYPE_JSON:
+        return json.dumps(update).encode(), content_type
+    raise UnsupportedContentType(content_type)
+
+
+def decode_update(body: bytes, content_type: str = None) -> dict:
+    """Parse body message queue sesuai content type (tanpa content type = JSON lama)"""
+    if content_type == CONTENT_TYPE_COMPACT_V1:
+        return _expand_v1(msgpack.unpackb(body, raw=False))
+    if content_type in (None, "", CONTENT_TYPE_JSON):
+        return json.loads(body)
+    raise UnsupportedContentType(content_type)
@@ -3,5 +3,13 @@ Services module untuk business logic
 """
 
 from .stock_service import StockService
+from .quote_cache import QuoteCache
+from .providers import MarketDataProvider, DummyProvider, ReplayProvider
 
-__all__ = ["StockService"]
+__all__ = [
+    "StockService",
+    "QuoteCache",
+    "MarketDataProvider",
+    "DummyProvider",
+    "ReplayProvider",
+]
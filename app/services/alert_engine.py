@@ -0,0 +1,280 @@
+"""
+Engine alert harga berbasis index threshold terurut.
+
+Per symbol ada dua sisi:
+- above: trigger saat harga >= threshold
+- below: trigger saat harga <= threshold
+
+Setiap sisi disimpan sebagai array paralel (array.array) yang terurut
+sehingga alert yang ter-trigger selalu berada di ujung array. Satu tick
+cukup bisect O(log n) lalu memotong suffix sepanjang k alert yang kena:
+O(log n + k), tanpa scan semua alert. Satu alert memakai 24 byte
+(threshold, id, chat_id), jadi sejuta alert muat di memori.
+"""
+
+import os
+import time
+import logging
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+logger = logging.getLogger(__name__)
+
+ABOVE = "above"
+BELOW = "below"
+
+# Batch sampai ukuran ini disisipkan satu per satu (memmove per insert);
+# lebih besar dari itu di-merge linear dengan isi yang sudah terurut
+INSERT_BATCH_MAX = 64
+
+
+class _Side:
+    """
+    Array terurut untuk satu arah alert.
+
+    Key disimpan naik, dan alert yang ter-trigger selalu suffix:
+    - below: key = threshold, trigger jika threshold >= price
+    - above: key = -threshold, trigger jika -threshold >= -price
+    """
+
+    __slots__ = ("keys", "ids", "chat_ids", "negate")
+
+    def __init__(self, negate: bool):
+        self.keys = array("d")
+        self.ids = array("q")
+        self.chat_ids = array("q")
+        self.negate = negate
+
+    def _key(self, value: float) -> float:
+        return -value if self.negate else value
+
+    def add(self, alert_id: int, chat_id: int, threshold: float):
+        key = self._key(threshold)
+        # bisect_right: alert baru dengan threshold sama masuk paling belakang
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, alert_id)
+        self.chat_ids.insert(position, chat_id)
+
+    def extend(self, alerts: list):
+        """
+        Tambah banyak alert (alert_id, chat_id, threshold).
+        Delta kecil (sync inkremental) disisipkan langsung; batch besar
+        (load awal/reload) diurutkan sendiri lalu di-merge O(n + k log k).
+        """
+        if len(alerts) <= INSERT_BATCH_MAX:
+            for alert_id, chat_id, threshold in alerts:
+                self.add(alert_id, chat_id, threshold)
+            return
+
+        # Sort stabil per key: urutan masuk terjaga untuk threshold yang sama
+        incoming = sorted(
+            ((self._key(threshold), alert_id, chat_id) for alert_id, chat_id, threshold in alerts),
+            key=lambda item: item[0]
+        )
+        if not self.keys:
+            merged = incoming
+        else:
+            # heapq.merge stabil: alert lama tetap di depan alert baru dengan key sama
+            merged = list(heapq.merge(
+                zip(self.keys, self.ids, self.chat_ids), incoming, key=lambda item: item[0]
+            ))
+        self.keys = array("d", (item[0] for item in merged))
+        self.ids = array("q", (item[1] for item in merged))
+        self.chat_ids = array("q", (item[2] for item in merged))
+
+    def remove(self, alert_id: int, threshold: float) -> bool:
+        key = self._key(threshold)
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == alert_id:
+                del self.keys[position]
+                del self.ids[position]
+                del self.chat_ids[position]
+                return True
+            position += 1
+        return False
+
+    def pop_triggered(self, price: float) -> list:
+        """Ambil dan hapus semua alert yang ter-trigger oleh price"""
+        start = bisect_left(self.keys, self._key(price))
+        if start == len(self.keys):
+            return []
+
+        triggered = [
+            (alert_id, chat_id, -key if self.negate else key)
+            for key, alert_id, chat_id in zip(
+                self.keys[start:], self.ids[start:], self.chat_ids[start:]
+            )
+        ]
+        del self.keys[start:]
+        del self.ids[start:]
+        del self.chat_ids[start:]
+        return triggered
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class AlertIndex:
+    """Index alert in-memory per symbol (thread-safe)"""
+
+    def __init__(self):
+        self._sides = {}  # (symbol, direction) -> _Side
+        self._lock = threading.Lock()
+        self.max_id = 0
+
+    def _side(self, symbol: str, direction: str) -> _Side:
+        side = self._sides.get((symbol, direction))
+        if side is None:
+            side = _Side(negate=direction == ABOVE)
+            self._sides[(symbol, direction)] = side
+        return side
+
+    def add(self, alert_id: int, chat_id: int, symbol: str, direction: str, threshold: float):
+        if direction not in (ABOVE, BELOW):
+            raise ValueError(f"Invalid alert direction: {direction}")
+        with self._lock:
+            self._side(symbol, direction).add(alert_id, chat_id, threshold)
+            self.max_id = max(self.max_id, alert_id)
+
+    def add_many(self, alerts):
+        """
+        Bulk load alert (alert_id, chat_id, symbol, direction, threshold).
+        Per sisi: delta kecil disisipkan di tempat, batch besar di-merge sekali.
+        """
+        grouped = {}
+        for alert_id, chat_id, symbol, direction, threshold in alerts:
+            if direction not in (ABOVE, BELOW):
+                raise ValueError(f"Invalid alert direction: {direction}")
+            grouped.setdefault((symbol, direction), []).append((alert_id, chat_id, threshold))
+
+        with self._lock:
+            for (symbol, direction), items in grouped.items():
+                self._side(symbol, direction).extend(items)
+                self.max_id = max(self.max_id, max(item[0] for item in items))
+        return sum(len(items) for items in grouped.values())
+
+    def remove(self, alert_id: int, symbol: str, direction: str, threshold: float) -> bool:
+        with self._lock:
+            side = self._sides.get((symbol, direction))
+            return side.remove(alert_id, threshold) if side else False
+
+    def on_tick(self, symbol: str, price: float) -> list:
+        """
+        Proses satu tick harga.
+
+        Returns:
+            list (alert_id, chat_id, symbol, direction, threshold) yang
+            ter-trigger; alert tersebut dihapus dari index
+        """
+        triggered = []
+        with self._lock:
+            for direction in (ABOVE, BELOW):
+                side = self._sides.get((symbol, direction))
+                if side:
+                    triggered.extend(
+                        (alert_id, chat_id, symbol, direction, threshold)
+                        for alert_id, chat_id, threshold in side.pop_triggered(price)
+                    )
+        return triggered
+
+    def symbols(self) -> list:
+        """Symbol yang punya minimal satu alert aktif"""
+        with self._lock:
+            return sorted({symbol for (symbol, _), side in self._sides.items() if len(side)})
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(side) for side in self._sides.values())
+
+
+class AlertEngine:
+    """
+    Menghubungkan AlertIndex dengan database dan TelegramAPI.
+    Alert yang ter-trigger ditandai di DB dalam satu UPDATE, dan hanya alert
+    yang masih aktif di DB (belum dihapus user) yang dikirim.
+    """
+
+    def __init__(self, telegram, session_factory):
+        self.telegram = telegram
+        self.session_factory = session_factory
+        self.index = AlertIndex()
+        # Sync inkremental hanya mengikuti id > max_id: alert dengan id lebih
+        # kecil yang commit belakangan (transaksi paralel) baru terbaca saat
+        # reload penuh berikutnya
+        self.full_sync_interval = float(os.getenv("ALERT_FULL_SYNC_INTERVAL", 300))
+        self._last_full_sync = None
+
+    def sync(self, now: float = None) -> int:
+        """Load alert aktif baru dari DB; reload penuh tiap ALERT_FULL_SYNC_INTERVAL detik"""
+        now = time.monotonic() if now is None else now
+        if self._last_full_sync is None or now - self._last_full_sync >= self.full_sync_interval:
+            self._last_full_sync = now
+            return self.reload()
+
+        from app.database import crud
+
+        db = self.session_factory()
+        try:
+            loaded = self.index.add_many(crud.iter_active_alerts(db, self.index.max_id))
+        finally:
+            db.close()
+
+        if loaded:
+            logger.info(f"Loaded {loaded} alerts (total {len(self.index)})")
+        return loaded
+
+    def reload(self) -> int:
+        """
+        Bangun ulang index dari semua alert aktif di DB lalu tukar.
+        Sekaligus membuang alert yang sudah dihapus user dari memori.
+        """
+        from app.database import crud
+
+        index = AlertIndex()
+        db = self.session_factory()
+        try:
+            loaded = index.add_many(crud.iter_active_alerts(db))
+        finally:
+            db.close()
+
+        # Alert yang ter-trigger setelah snapshot dibaca bisa ikut masuk lagi;
+        # mark_alerts_triggered menyaringnya jadi tidak terkirim dua kali
+        self.index = index
+        logger.info(f"Reloaded {loaded} active alerts")
+        return loaded
+
+    def process_tick(self, symbol: str, price: float) -> int:
+        """Evaluasi tick dan kirim notifikasi untuk alert yang ter-trigger"""
+        triggered = self.index.on_tick(symbol, price)
+        if not triggered:
+            return 0
+
+        from app.database import crud
+
+        db = self.session_factory()
+        try:
+            active_ids = set(crud.mark_alerts_triggered(db, [alert[0] for alert in triggered]))
+        except Exception:
+            # Alert masih aktif di DB: kembalikan ke index supaya dicoba di tick berikutnya
+            self.index.add_many(triggered)
+            raise
+        finally:
+            db.close()
+
+        for alert_id, chat_id, symbol, direction, threshold in triggered:
+            if alert_id not in active_ids:
+                continue
+            arrow = "⬆️ naik ke" if direction == ABOVE else "⬇️ turun ke"
+            self.telegram.enqueue_message(
+                chat_id,
+                f"🔔 *Alert {symbol}*\n\n"
+                f"Harga {arrow} Rp {price:,.0f}\n"
+                f"Target: {'≥' if direction == ABOVE else '≤'} Rp {threshold:,.0f}"
+            )
+
+        logger.info(f"Tick {symbol}@{price}: {len(active_ids)} alerts triggered")
+        return len(active_ids)
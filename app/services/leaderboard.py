@@ -0,0 +1,61 @@
+"""
+Leaderboard saham populer dengan jendela waktu bergulir (1h/24h/7d).
+
+Counter per (jam, symbol) di tabel stock_query_hourly di-update incremental
+saat analytics di-flush. Leaderboard per jendela dihitung dari tabel kecil
+itu (ukurannya bergantung jendela, bukan panjang history) lalu disimpan
+di memori selama LEADERBOARD_REFRESH detik, jadi read cukup O(k).
+"""
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+}
+
+
+class PopularStocks:
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.refresh_interval = float(os.getenv("LEADERBOARD_REFRESH", 60))
+        self.size = int(os.getenv("LEADERBOARD_SIZE", 50))
+        self._boards = {}  # window -> (computed_at, list {"symbol", "count"})
+        self._lock = threading.Lock()
+
+    def top(self, window: str = "24h", k: int = 10) -> list:
+        """Top-k symbol untuk jendela waktu, dari memori jika masih segar"""
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+
+        with self._lock:
+            entry = self._boards.get(window)
+        if entry is None or time.monotonic() - entry[0] >= self.refresh_interval:
+            entry = self._refresh(window)
+        return entry[1][:k]
+
+    def _refresh(self, window: str):
+        from app.database import crud
+
+        since = datetime.now(timezone.utc) - WINDOWS[window]
+        db = self.session_factory()
+        try:
+            board = crud.get_popular_stocks(db, limit=self.size, since=since)
+        finally:
+            db.close()
+
+        entry = (time.monotonic(), board)
+        with self._lock:
+            self._boards[window] = entry
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._boards.clear()
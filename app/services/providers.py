@@ -0,0 +1,309 @@
+"""
+Provider data pasar untuk StockService.
+
+Setiap provider mengimplementasikan `get_quotes(symbols)` (bulk) dan
+`get_profile(symbol)`. Provider tanpa API bulk cukup mengimplementasikan
+`get_quote(symbol)`; `get_quotes` default akan fan-out secara paralel.
+
+Provider dibungkus `ResilientProvider` yang menambahkan timeout dan
+circuit breaker per provider.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger(__name__)
+
+_fanout_lock = threading.Lock()
+
+
+class ProviderError(Exception):
+    """Provider gagal mengambil data"""
+
+
+class ProviderUnavailable(ProviderError):
+    """Circuit breaker provider sedang open"""
+
+
+class MarketDataProvider:
+    """Base class provider"""
+
+    name = "base"
+    fanout_workers = 8
+
+    def get_quote(self, symbol: str) -> dict:
+        """Ambil quote satu symbol, None jika tidak ditemukan"""
+        raise NotImplementedError
+
+    def get_quotes(self, symbols: list) -> dict:
+        """
+        Ambil quote banyak symbol sekaligus.
+        Default: fan-out paralel ke get_quote untuk provider tanpa API bulk.
+
+        Returns:
+            dict symbol -> quote (symbol tidak ditemukan tidak ada di dict)
+        """
+        if len(symbols) == 1:
+            quote = self.get_quote(symbols[0])
+            return {symbols[0]: quote} if quote else {}
+
+        quotes = self._fanout_pool().map(self.get_quote, symbols)
+        return {symbol: quote for symbol, quote in zip(symbols, quotes) if quote}
+
+    def _fanout_pool(self) -> ThreadPoolExecutor:
+        """Pool fan-out dibuat sekali per provider, bukan per panggilan get_quotes"""
+        pool = getattr(self, "_fanout_executor", None)
+        if pool is None:
+            with _fanout_lock:
+                pool = getattr(self, "_fanout_executor", None)
+                if pool is None:
+                    pool = self._fanout_executor = ThreadPoolExecutor(
+                        max_workers=self.fanout_workers, thread_name_prefix=f"fanout-{self.name}"
+                    )
+        return pool
+
+    def get_profile(self, symbol: str) -> dict:
+        """Ambil data fundamental (name, high_52w, low_52w, market_cap, pe_ratio)"""
+        raise NotImplementedError
+
+
+class DummyProvider(MarketDataProvider):
+    """Data dummy dengan harga random, untuk demo"""
+
+    name = "dummy"
+
+    def __init__(self):
+        self.stocks = {
+            "BBCA": {"name": "Bank Central Asia Tbk", "base_price": 9500},
+            "BBRI": {"name": "Bank Rakyat Indonesia Tbk", "base_price": 5200},
+            "BMRI": {"name": "Bank Mandiri Tbk", "base_price": 6400},
+            "TLKM": {"name": "Telkom Indonesia Tbk", "base_price": 3800},
+            "ASII": {"name": "Astra International Tbk", "base_price": 5500},
+            "UNVR": {"name": "Unilever Indonesia Tbk", "base_price": 4200},
+            "BBNI": {"name": "Bank Negara Indonesia Tbk", "base_price": 5800},
+            "GOTO": {"name": "GoTo Gojek Tokopedia Tbk", "base_price": 120},
+        }
+
+    def get_quote(self, symbol: str) -> dict:
+        if symbol not in self.stocks:
+            return None
+
+        base = self.stocks[symbol]["base_price"]
+        # Simulasi perubahan harga random
+        change_percent = random.uniform(-5, 5)
+        price = base * (1 + change_percent / 100)
+        volume = random.randint(1000000, 50000000)
+
+        return {
+            "symbol": symbol,
+            "name": self.stocks[symbol]["name"],
+            "price": round(price),
+            "change_percent": round(change_percent, 2),
+            "volume": volume,
+            "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def get_quotes(self, symbols: list) -> dict:
+        # Data lokal: bulk cukup loop tanpa thread
+        quotes = {symbol: self.get_quote(symbol) for symbol in symbols}
+        return {symbol: quote for symbol, quote in quotes.items() if quote}
+
+    def get_profile(self, symbol: str) -> dict:
+        if symbol not in self.stocks:
+            return None
+
+        base = self.stocks[symbol]["base_price"]
+        return {
+            "symbol": symbol,
+            "name": self.stocks[symbol]["name"],
+            "high_52w": round(base * 1.3),
+            "low_52w": round(base * 0.7),
+            "market_cap": random.randint(50000, 500000),
+            "pe_ratio": round(random.uniform(10, 25), 2)
+        }
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Provider dari file lokal, untuk test offline dan replay tick.
+
+    Format file:
+    - JSON object: snapshot statis {"BBCA": {...quote...}, ...}
+    - JSON lines: satu quote per baris (wajib ada "symbol"); setiap fetch
+      mengembalikan tick berikutnya untuk symbol itu, berputar di akhir.
+
+    Field opsional "profile" di quote dipakai untuk get_profile.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ticks = {}  # symbol -> list quote
+        self._positions = {}  # symbol -> index tick berikutnya
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        with open(self.path) as f:
+            content = f.read()
+
+        try:
+            data = json.loads(content)
+        except ValueError:
+            data = None
+
+        if isinstance(data, dict) and "symbol" not in data:
+            for symbol, quote in data.items():
+                self._ticks[symbol] = [dict(quote, symbol=symbol)]
+        else:
+            for line in content.splitlines():
+                if line.strip():
+                    quote = json.loads(line)
+                    self._ticks.setdefault(quote["symbol"], []).append(quote)
+
+        logger.info(f"Replay provider loaded {len(self._ticks)} symbols from {self.path}")
+
+    def get_quote(self, symbol: str) -> dict:
+        with self._lock:
+            ticks = self._ticks.get(symbol)
+            if not ticks:
+                return None
+            position = self._positions.get(symbol, 0)
+            self._positions[symbol] = (position + 1) % len(ticks)
+
+        quote = dict(ticks[position])
+        quote.pop("profile", None)
+        quote.setdefault("name", symbol)
+        quote.setdefault("change_percent", 0.0)
+        quote.setdefault("volume", 0)
+        quote.setdefault("updated", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        return quote
+
+    def get_quotes(self, symbols: list) -> dict:
+        quotes = {symbol: self.get_quote(symbol) for symbol in symbols}
+        return {symbol: quote for symbol, quote in quotes.items() if quote}
+
+    def get_profile(self, symbol: str) -> dict:
+        ticks = self._ticks.get(symbol)
+        if not ticks:
+            return None
+        profile = dict(ticks[-1].get("profile", {}))
+        profile.setdefault("symbol", symbol)
+        profile.setdefault("name", ticks[-1].get("name", symbol))
+        price = ticks[-1].get("price", 0)
+        profile.setdefault("high_52w", price)
+        profile.setdefault("low_52w", price)
+        profile.setdefault("market_cap", 0)
+        profile.setdefault("pe_ratio", 0.0)
+        return profile
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker sederhana: open setelah `failure_threshold` kegagalan
+    berturut-turut, half-open (satu percobaan) setelah `reset_timeout` detik.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Boleh kirim request ke provider?"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ResilientProvider:
+    """Bungkus provider dengan timeout dan circuit breaker"""
+
+    def __init__(self, provider: MarketDataProvider, timeout: float = None, breaker: CircuitBreaker = None):
+        self.provider = provider
+        self.name = provider.name
+        self.timeout = timeout if timeout is not None else float(os.getenv("MARKET_DATA_TIMEOUT", 3))
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv("MARKET_DATA_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv("MARKET_DATA_BREAKER_RESET", 30))
+        )
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix=f"provider-{self.name}")
+
+    def _call(self, fn, *args):
+        if not self.breaker.allow():
+            raise ProviderUnavailable(f"Provider {self.name} circuit open")
+
+        future = self._pool.submit(fn, *args)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.breaker.record_failure()
+            raise ProviderError(f"Provider {self.name} timed out after {self.timeout}s")
+        except Exception as e:
+            self.breaker.record_failure()
+            raise ProviderError(f"Provider {self.name} failed: {e}") from e
+
+        self.breaker.record_success()
+        return result
+
+    def get_quotes(self, symbols: list) -> dict:
+        return self._call(self.provider.get_quotes, symbols)
+
+    def get_profile(self, symbol: str) -> dict:
+        return self._call(self.provider.get_profile, symbol)
+
+
+def create_providers() -> list:
+    """
+    Buat rantai provider dari env MARKET_DATA_PROVIDERS (dipisah koma,
+    urutan = prioritas fallback). Contoh: "replay,dummy": symbol yang tidak
+    ada di file replay (atau replay gagal) diambil dari dummy.
+    """
+    names = os.getenv("MARKET_DATA_PROVIDERS", "dummy")
+    providers = []
+    for name in [n.strip().lower() for n in names.split(",") if n.strip()]:
+        if name == "dummy":
+            providers.append(DummyProvider())
+        elif name == "replay":
+            providers.append(ReplayProvider(os.getenv("MARKET_DATA_REPLAY_FILE", "data/quotes.jsonl")))
+        else:
+            raise ValueError(f"Unknown market data provider: {name}")
+    return [ResilientProvider(provider) for provider in providers]
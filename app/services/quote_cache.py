@@ -0,0 +1,231 @@
+"""
+Cache quote saham multi-tier.
+
+- L1: LRU + TTL in-process
+- L2: opsional, dibagi antar worker (QUOTE_CACHE_SHARED=redis)
+
+Request bersamaan untuk symbol yang sama digabung (single-flight) sehingga
+hanya ada satu fetch ke upstream. Entry yang sudah lewat TTL tapi masih di
+dalam jendela stale dikembalikan langsung sambil di-refresh di background
+(stale-while-revalidate).
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RedisQuoteStore:
+    """Tier cache bersama di Redis"""
+
+    def __init__(self, url: str, prefix: str = "quote:"):
+        import redis  # optional dependency, hanya dibutuhkan untuk tier ini
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get_many(self, keys: list) -> dict:
+        """Return dict key -> (value, fetched_at) untuk key yang ada"""
+        raws = self.client.mget([self.prefix + key for key in keys])
+        result = {}
+        for key, raw in zip(keys, raws):
+            if raw is not None:
+                data = json.loads(raw)
+                result[key] = (data["value"], data["fetched_at"])
+        return result
+
+    def set_many(self, items: dict, ttl: float):
+        """Simpan dict key -> (value, fetched_at) dalam satu pipeline"""
+        pipe = self.client.pipeline(transaction=False)
+        for key, (value, fetched_at) in items.items():
+            payload = json.dumps({"value": value, "fetched_at": fetched_at})
+            pipe.set(self.prefix + key, payload, ex=max(int(ttl), 1))
+        pipe.execute()
+
+
+def create_shared_store():
+    """Pilih tier bersama dari env QUOTE_CACHE_SHARED (none | redis)"""
+    shared = os.getenv("QUOTE_CACHE_SHARED", "none").lower()
+    if shared == "redis":
+        return RedisQuoteStore(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    return None
+
+
+class QuoteCache:
+    def __init__(self, ttl: float = None, stale_ttl: float = None, max_size: int = None, shared=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("QUOTE_CACHE_TTL", 5))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.getenv("QUOTE_CACHE_STALE_TTL", 30))
+        self.max_size = max_size if max_size is not None else int(os.getenv("QUOTE_CACHE_SIZE", 1024))
+        self.shared = shared
+
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._inflight = {}  # key -> Future untuk single-flight
+        self._lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="quote-refresh")
+
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "errors": 0,
+        }
+
+    def get(self, key: str, loader):
+        """
+        Ambil value dari cache, panggil loader() jika miss.
+
+        Args:
+            key: cache key (symbol)
+            loader: callable tanpa argumen yang fetch ke upstream
+        """
+        return self.get_many([key], lambda keys: {key: loader()})[key]
+
+    def get_many(self, keys: list, bulk_loader) -> dict:
+        """
+        Ambil banyak key sekaligus. Semua key yang miss di-fetch dengan
+        satu panggilan bulk_loader(missing_keys) -> dict key -> value.
+        Key yang tidak ada di hasil bulk_loader disimpan sebagai None.
+        """
+        results = {}
+        stale = []
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self.stats["hits"] += 1
+                    metrics.QUOTE_CACHE.labels("hit").inc()
+                elif age < self.ttl + self.stale_ttl:
+                    self.stats["stale_hits"] += 1
+                    metrics.QUOTE_CACHE.labels("stale").inc()
+                    if key not in self._inflight:
+                        stale.append(key)
+                else:
+                    continue
+                self._entries.move_to_end(key)
+                results[key] = value
+
+        if stale:
+            self._refresh_pool.submit(self._refresh, stale, bulk_loader)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in results]
+        if missing:
+            results.update(self._load(missing, bulk_loader))
+        return results
+
+    def _refresh(self, keys: list, bulk_loader):
+        try:
+            self._load(keys, bulk_loader)
+        except Exception as e:
+            logger.warning(f"Background refresh for {', '.join(keys)} failed: {e}")
+
+    def _load(self, keys: list, bulk_loader) -> dict:
+        """
+        Fetch dengan single-flight: key yang sedang di-fetch caller lain
+        cukup ditunggu, sisanya di-fetch sekali lewat bulk_loader.
+        """
+        own = {}
+        waiting = {}
+        with self._lock:
+            for key in keys:
+                future = self._inflight.get(key)
+                if future is None:
+                    future = Future()
+                    self._inflight[key] = future
+                    own[key] = future
+                    self.stats["misses"] += 1
+                    metrics.QUOTE_CACHE.labels("miss").inc()
+                else:
+                    waiting[key] = future
+                    self.stats["coalesced"] += 1
+                    metrics.QUOTE_CACHE.labels("coalesced").inc()
+
+        results = {}
+        if own:
+            try:
+                loaded = self._load_shared(list(own), bulk_loader)
+                for key, (value, fetched_at) in loaded.items():
+                    self._store(key, value, fetched_at)
+                    results[key] = value
+                    own[key].set_result(value)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                for future in own.values():
+                    if not future.done():
+                        future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    for key in own:
+                        self._inflight.pop(key, None)
+
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return results
+
+    def _load_shared(self, keys: list, bulk_loader) -> dict:
+        """Cek tier bersama dulu, sisanya fetch ke upstream lewat bulk_loader"""
+        loaded = {}
+        if self.shared is not None:
+            try:
+                now = time.time()
+                for key, (value, fetched_at) in self.shared.get_many(keys).items():
+                    if now - fetched_at < self.ttl:
+                        loaded[key] = (value, fetched_at)
+                with self._lock:
+                    self.stats["shared_hits"] += len(loaded)
+                metrics.QUOTE_CACHE.labels("shared").inc(len(loaded))
+            except Exception as e:
+                logger.warning(f"Shared quote cache unavailable: {e}")
+
+        missing = [key for key in keys if key not in loaded]
+        if not missing:
+            return loaded
+
+        values = bulk_loader(missing)
+        fetched_at = time.time()
+        fetched = {key: (values.get(key), fetched_at) for key in missing}
+
+        if self.shared is not None:
+            try:
+                self.shared.set_many(fetched, self.ttl + self.stale_ttl)
+            except Exception as e:
+                logger.warning(f"Failed to write shared quote cache: {e}")
+
+        loaded.update(fetched)
+        return loaded
+
+    def _store(self, key: str, value, fetched_at: float):
+        with self._lock:
+            self._entries[key] = (value, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str = None):
+        """Hapus satu key, atau semua jika key None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        return stats
@@ -1,81 +1,107 @@
-import random
-from datetime import datetime
 import logging
+from app import metrics
+from app.services.quote_cache import QuoteCache, create_shared_store
+from app.services.providers import ProviderError, create_providers
 
 logger = logging.getLogger(__name__)
 
 class StockService:
     """
     Service untuk mengambil data saham.
-    Dalam implementasi nyata, integrasikan dengan API seperti:
+    Data diambil dari rantai provider (MARKET_DATA_PROVIDERS), lihat
+    app/services/providers.py. Untuk integrasi nyata tambahkan provider
+    baru, misalnya:
     - Yahoo Finance API
     - Alpha Vantage
     - IDX API
     - RTI Business API
     """
-    
-    def __init__(self):
-        # Dummy data untuk demo
-        self.stocks = {
-            "BBCA": {"name": "Bank Central Asia Tbk", "base_price": 9500},
-            "BBRI": {"name": "Bank Rakyat Indonesia Tbk", "base_price": 5200},
-            "BMRI": {"name": "Bank Mandiri Tbk", "base_price": 6400},
-            "TLKM": {"name": "Telkom Indonesia Tbk", "base_price": 3800},
-            "ASII": {"name": "Astra International Tbk", "base_price": 5500},
-            "UNVR": {"name": "Unilever Indonesia Tbk", "base_price": 4200},
-            "BBNI": {"name": "Bank Negara Indonesia Tbk", "base_price": 5800},
-            "GOTO": {"name": "GoTo Gojek Tokopedia Tbk", "base_price": 120},
-        }
-    
+
+    def __init__(self, providers: list = None):
+        self.providers = providers if providers is not None else create_providers()
+        self.quote_cache = QuoteCache(shared=create_shared_store())
+
+    def _fetch_quotes(self, symbols: list) -> dict:
+        """
+        Fetch quote lewat rantai provider (fallback berurutan). Symbol yang
+        gagal atau tidak ditemukan di satu provider dicoba di provider
+        berikutnya. Raise ProviderError jika semua provider gagal.
+        """
+        quotes = {}
+        remaining = list(symbols)
+        answered = False
+        last_error = None
+        for provider in self.providers:
+            try:
+                with metrics.QUOTE_SECONDS.labels(type(provider).__name__).time():
+                    found = provider.get_quotes(remaining)
+            except ProviderError as e:
+                metrics.ERRORS.labels("quote_provider").inc()
+                logger.warning(f"{e}, trying next provider")
+                last_error = e
+                continue
+            answered = True
+            quotes.update(found)
+            remaining = [symbol for symbol in remaining if symbol not in found]
+            if not remaining:
+                break
+        if not answered:
+            raise last_error or ProviderError("No market data provider configured")
+        return quotes
+
     def get_stock_price(self, symbol: str) -> dict:
         """
-        Ambil harga saham real-time
-        Implementasi nyata: panggil API eksternal
+        Ambil harga saham real-time (lewat quote cache)
         """
-        if symbol not in self.stocks:
-            return None
-        
-        base = self.stocks[symbol]["base_price"]
-        # Simulasi perubahan harga random
-        change_percent = random.uniform(-5, 5)
-        price = base * (1 + change_percent / 100)
-        volume = random.randint(1000000, 50000000)
-        
-        return {
-            "symbol": symbol,
-            "name": self.stocks[symbol]["name"],
-            "price": round(price),
-            "change_percent": round(change_percent, 2),
-            "volume": volume,
-            "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-    
+        return self.get_stock_prices([symbol]).get(symbol)
+
+    def get_stock_prices(self, symbols: list) -> dict:
+        """
+        Ambil harga banyak saham dengan satu bulk fetch untuk yang belum
+        ada di cache.
+
+        Returns:
+            dict symbol -> quote (None jika tidak ditemukan)
+        """
+        if not symbols:
+            return {}
+        try:
+            return self.quote_cache.get_many(symbols, self._fetch_quotes)
+        except ProviderError as e:
+            logger.error(f"Failed to fetch quotes for {', '.join(symbols)}: {e}")
+            return {}
+
     def get_stock_info(self, symbol: str) -> dict:
         """
         Ambil informasi detail saham
-        Implementasi nyata: panggil API eksternal
         """
-        if symbol not in self.stocks:
-            return None
-        
         price_data = self.get_stock_price(symbol)
-        base = self.stocks[symbol]["base_price"]
-        
+        if not price_data:
+            return None
+
+        profile = None
+        for provider in self.providers:
+            try:
+                profile = provider.get_profile(symbol)
+                if profile:
+                    break
+            except ProviderError as e:
+                logger.warning(f"{e}, trying next provider")
+
+        if not profile:
+            return None
+
         return {
             "symbol": symbol,
-            "name": self.stocks[symbol]["name"],
+            "name": profile["name"],
             "price": price_data["price"],
-            "high_52w": round(base * 1.3),
-            "low_52w": round(base * 0.7),
-            "market_cap": random.randint(50000, 500000),
-            "pe_ratio": round(random.uniform(10, 25), 2)
+            "high_52w": profile["high_52w"],
+            "low_52w": profile["low_52w"],
+            "market_cap": profile["market_cap"],
+            "pe_ratio": profile["pe_ratio"]
         }
-    
+
     def get_multiple_stocks(self, symbols: list) -> list:
         """Ambil data multiple saham sekaligus"""
-        results = []
-        for symbol in symbols:
-            data = self.get_stock_price(symbol)
-            if data:
-                results.append(data)
-        return results
\ No newline at end of file
+        quotes = self.get_stock_prices(symbols)
+        return [quotes[symbol] for symbol in symbols if quotes.get(symbol)]
@@ -0,0 +1,421 @@
+"""
+Tracing end-to-end update: webhook -> queue -> worker -> Telegram.
+
+Konteks trace dibawa dalam format W3C `traceparent` (header AMQP
+`traceparent`), jadi kompatibel dengan OpenTelemetry collector/Jaeger/Tempo.
+Span ditulis oleh exporter lokal di thread background:
+
+- TRACE_EXPORTER=none (default): tracing nonaktif, start_span() no-op
+- TRACE_EXPORTER=file: JSON per baris ke TRACE_FILE
+- TRACE_EXPORTER=otlp: OTLP/HTTP JSON ke collector lokal
+  (OTEL_EXPORTER_OTLP_ENDPOINT, default http://jaeger:4318)
+
+Sampling diputuskan sekali di root (webhook) dengan TRACE_SAMPLE_RATIO lalu
+diwariskan lewat flag `traceparent`, sehingga satu update selalu lengkap
+atau tidak tercatat sama sekali. Span yang tidak di-sample tidak
+dialokasikan waktu/atribut dan tidak masuk antrean export; antrean export
+dibatasi TRACE_QUEUE_SIZE dan span dibuang (bukan memblokir) jika penuh.
+"""
+
+import os
+import json
+import time
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+KIND_PRODUCER = 4
+KIND_CONSUMER = 5
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value):
+        """Parse header traceparent, None jika tidak valid"""
+        if isinstance(value, bytes):
+            value = value.decode(errors="ignore")
+        if not isinstance(value, str):
+            return None
+        parts = value.strip().split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            flags = int(parts[3], 16)
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None
+        return cls(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    __slots__ = ("name", "context", "parent_id", "kind", "start", "end", "attributes", "status", "error")
+
+    def __init__(self, name, context, parent_id=None, kind=KIND_INTERNAL, start=None, attributes=None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start = start
+        self.end = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error = None
+
+    @property
+    def recording(self) -> bool:
+        return self.context.sampled
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.trace_id
+
+    def set_attribute(self, key: str, value):
+        if self.context.sampled:
+            if self.attributes is None:
+                self.attributes = {}
+            self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        if self.context.sampled:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class FileExporter:
+    """Span sebagai JSON per baris (TRACE_FILE)"""
+
+    def __init__(self, path: str, service: str):
+        self.path = path
+        self.service = service
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: list):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps({
+                    "service": self.service,
+                    "trace_id": span.context.trace_id,
+                    "span_id": span.context.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "start": span.start,
+                    "duration_ms": round((span.end - span.start) * 1000, 3),
+                    "status": span.status,
+                    "error": span.error,
+                    "attributes": span.attributes or {},
+                }, default=str) + "\n")
+
+    def close(self):
+        pass
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP JSON ke collector lokal (satu session keep-alive)"""
+
+    def __init__(self, endpoint: str, service: str):
+        import requests
+
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service = service
+        self.session = requests.Session()
+        self.timeout = float(os.getenv("TRACE_EXPORT_TIMEOUT", 5))
+
+    def _span(self, span: Span) -> dict:
+        data = {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int(span.end * 1e9)),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in (span.attributes or {}).items()
+            ],
+            "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+    def export(self, spans: list):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service}}]},
+            "scopeSpans": [{"scope": {"name": "stockbot"}, "spans": [self._span(span) for span in spans]}],
+        }]}
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+class BatchProcessor:
+    """Antrean span selesai + thread export periodik (span dibuang jika antrean penuh)"""
+
+    def __init__(self, exporter, max_queue: int, batch_size: int, interval: float):
+        self.exporter = exporter
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._spans = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span):
+        with self._cond:
+            if len(self._spans) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._spans.append(span)
+            if len(self._spans) >= self.batch_size:
+                self._cond.notify()
+
+    def _take(self) -> list:
+        with self._cond:
+            batch = [self._spans.popleft() for _ in range(min(self.batch_size, len(self._spans)))]
+        return batch
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._spans) < self.batch_size:
+                    self._cond.wait(timeout=self.interval)
+                running = self._running
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning(f"Failed to export {len(batch)} spans: {e}")
+            if not running:
+                return
+
+    def shutdown(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=self.interval + 5)
+        self.exporter.close()
+
+
+class Tracer:
+    def __init__(self):
+        self.service = os.getenv("OTEL_SERVICE_NAME", "stockbot")
+        self.sample_ratio = float(os.getenv("TRACE_SAMPLE_RATIO", 0.01))
+        exporter = self._create_exporter(os.getenv("TRACE_EXPORTER", "none").lower())
+        self.processor = None
+        if exporter is not None:
+            self.processor = BatchProcessor(
+                exporter,
+                max_queue=int(os.getenv("TRACE_QUEUE_SIZE", 2048)),
+                batch_size=int(os.getenv("TRACE_BATCH_SIZE", 256)),
+                interval=float(os.getenv("TRACE_EXPORT_INTERVAL", 5)),
+            )
+            atexit.register(self.shutdown)
+
+    def _create_exporter(self, name: str):
+        if name == "none":
+            return None
+        if name == "file":
+            return FileExporter(os.getenv("TRACE_FILE", "logs/traces.jsonl"), self.service)
+        if name == "otlp":
+            endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://jaeger:4318")
+            return OtlpHttpExporter(endpoint, self.service)
+        raise ValueError(f"Unknown trace exporter: {name}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    @contextmanager
+    def start_span(self, name: str, parent=None, kind: int = KIND_INTERNAL, attributes: dict = None,
+                   start_time: float = None):
+        """
+        Buka span sebagai span aktif (contextvars).
+        parent: Span/SpanContext eksplisit; default span aktif, tanpa parent
+        berarti root baru dengan keputusan sampling sendiri.
+        """
+        if self.processor is None:
+            yield _NOOP_SPAN
+            return
+
+        if parent is None:
+            parent = _current.get()
+        parent_context = parent.context if isinstance(parent, Span) else parent
+        if parent_context is None or parent_context is _NOOP_CONTEXT:
+            context = SpanContext(_new_id(128), _new_id(64), random.random() < self.sample_ratio)
+            parent_id = None
+        else:
+            context = SpanContext(parent_context.trace_id, _new_id(64), parent_context.sampled)
+            parent_id = parent_context.span_id
+
+        if context.sampled:
+            span = Span(name, context, parent_id, kind, start_time or time.time(), attributes)
+        else:
+            span = Span(name, context)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current.reset(token)
+            if context.sampled:
+                span.end = time.time()
+                self.processor.on_end(span)
+
+    def shutdown(self):
+        if self.processor is not None:
+            self.processor.shutdown()
+            self.processor = None
+
+
+_NOOP_CONTEXT = SpanContext("0" * 32, "0" * 16, False)
+_NOOP_SPAN = Span("noop", _NOOP_CONTEXT)
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Tracer per proses, dibuat saat pertama dipakai (setelah load_dotenv)"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def start_span(name: str, parent=None, kind: int = KIND_INTERNAL, attributes: dict = None,
+               start_time: float = None):
+    return get_tracer().start_span(name, parent, kind, attributes, start_time)
+
+
+def current_span():
+    """Span aktif di context ini (span no-op jika tidak ada, aman untuk set_attribute)"""
+    return _current.get() or _NOOP_SPAN
+
+
+def inject(headers: dict) -> dict:
+    """Tambahkan traceparent span aktif ke headers (in-place)"""
+    span = _current.get()
+    if span is not None and span is not _NOOP_SPAN:
+        headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+    return headers
+
+
+def extract(headers):
+    """SpanContext dari headers AMQP, None jika tidak ada"""
+    if not headers:
+        return None
+    return SpanContext.from_traceparent(headers.get(TRACEPARENT_HEADER))
+
+
+def wrap(fn):
+    """Bungkus fn supaya berjalan di bawah span aktif saat ini (untuk thread pool)"""
+    span = _current.get()
+    if span is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(span)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+def log_suffix() -> str:
+    """` trace=<id>` untuk baris log jika span aktif di-sample"""
+    span = _current.get()
+    return f" trace={span.context.trace_id}" if span is not None and span.context.sampled else ""
+
+
+def instrument_engine(engine):
+    """Span per statement SQL di bawah span aktif (hanya jika di-sample)"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        span = _current.get()
+        if span is None or not span.context.sampled:
+            conn.info.setdefault("trace_spans", []).append(None)
+            return
+        manager = get_tracer().start_span(
+            "db " + (statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"),
+            kind=KIND_CLIENT,
+            attributes={"db.statement": statement[:500]},
+        )
+        manager.__enter__()
+        conn.info.setdefault("trace_spans", []).append(manager)
+
+    def _finish(conn, error=None):
+        spans = conn.info.get("trace_spans")
+        manager = spans.pop() if spans else None
+        if manager is None:
+            return
+        if error is not None:
+            manager.__exit__(type(error), error, error.__traceback__)
+        else:
+            manager.__exit__(None, None, None)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        _finish(conn)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        if context.connection is not None:
+            try:
+                _finish(context.connection, context.original_exception)
+            except BaseException:
+                pass
@@ -3,5 +3,6 @@ Worker module untuk consumer workers
 """
 
 from .consumer import UpdateWorker
+from .alerts import AlertWorker
 
-__all__ = ["UpdateWorker"]
+__all__ = ["UpdateWorker", "AlertWorker"]
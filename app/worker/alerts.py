@@ -0,0 +1,60 @@
+import os
+import time
+import logging
+from dotenv import load_dotenv
+from app import metrics
+from app.bot.telegram_api import TelegramAPI
+from app.services.stock_service import StockService
+from app.services.alert_engine import AlertEngine
+from app.database.db import SessionLocal
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class AlertWorker:
+    """
+    Loop evaluasi alert harga: setiap ALERT_POLL_INTERVAL detik ambil quote
+    semua symbol yang punya alert (satu batch lookup), lalu kirim tick ke
+    AlertEngine.
+    """
+
+    def __init__(self):
+        self.telegram = TelegramAPI()
+        self.stock_service = StockService()
+        self.engine = AlertEngine(self.telegram, SessionLocal)
+        self.poll_interval = float(os.getenv("ALERT_POLL_INTERVAL", 5))
+
+    def run_once(self) -> int:
+        """Satu putaran: sync alert baru, ambil quote, evaluasi tick"""
+        self.engine.sync()
+
+        symbols = self.engine.index.symbols()
+        if not symbols:
+            return 0
+
+        quotes = self.stock_service.get_stock_prices(symbols)
+        triggered = 0
+        for symbol in symbols:
+            quote = quotes.get(symbol)
+            if quote:
+                triggered += self.engine.process_tick(symbol, quote["price"])
+        return triggered
+
+    def start(self):
+        logger.info(f"Alert worker started (interval={self.poll_interval}s)")
+        metrics.start_metrics_server()
+        while True:
+            try:
+                self.run_once()
+            except KeyboardInterrupt:
+                logger.info("Alert worker stopped")
+                break
+            except Exception as e:
+                metrics.ERRORS.labels("alerts").inc()
+                logger.error(f"Error in alert loop: {e}")
+            time.sleep(self.poll_interval)
+
+if __name__ == "__main__":
+    worker = AlertWorker()
+    worker.start()
@@ -1,8 +1,15 @@
 import os
-import json
+import signal
 import logging
+import time
+import functools
 from dotenv import load_dotenv
+from app import metrics, tracing
 from app.queue.consumer import QueueConsumer
+from app.queue.sharding import get_chat_id, shard_for
+from app.queue.dedup import UpdateDeduplicator
+from app.queue.wire import decode_update
+from app.worker.executor import ChatOrderedExecutor
 from app.bot.handlers import BotHandler
 from app.database.db import SessionLocal
 
@@ -10,16 +17,55 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _handle_sigterm(signum, frame):
+    """SIGTERM (docker stop) diperlakukan seperti Ctrl+C supaya shutdown graceful"""
+    raise KeyboardInterrupt
+
 class UpdateWorker:
     def __init__(self):
         self.consumer = QueueConsumer()
         self.bot_handler = BotHandler()
+        self.dedup = UpdateDeduplicator()
+        # > 1 aktifkan mode concurrent; update dari chat yang sama tetap berurutan
+        self.concurrency = int(os.getenv("WORKER_CONCURRENCY", 1))
+        if self.concurrency > self.consumer.prefetch_count:
+            # Broker tidak mengirim lebih dari prefetch message unacked, jadi
+            # thread di atas prefetch tidak pernah mendapat kerja
+            logger.warning(
+                f"WORKER_CONCURRENCY={self.concurrency} exceeds WORKER_PREFETCH_COUNT="
+                f"{self.consumer.prefetch_count}; at most {self.consumer.prefetch_count} updates "
+                "run in parallel. Set WORKER_PREFETCH_COUNT >= WORKER_CONCURRENCY."
+            )
+        
+    def process_update(self, update_data: dict, trace_parent=None, queue_wait: float = None):
+        """
+        Process single update dari queue.
+        trace_parent: SpanContext dari header message (lanjutan trace webhook)
+        """
+        update_id = update_data.get("update_id")
+        kind = "message" if "message" in update_data else "callback_query" if "callback_query" in update_data else "other"
+        with tracing.start_span(
+            "worker.process_update", parent=trace_parent, kind=tracing.KIND_CONSUMER,
+            attributes={"update_id": update_id, "update.kind": kind}
+        ) as span:
+            if queue_wait is not None:
+                span.set_attribute("messaging.queue_wait_ms", round(queue_wait * 1000, 3))
+            self._process(update_data, update_id, kind, span)
+    
+    def _process(self, update_data: dict, update_id, kind: str, span):
+        # Retry webhook / redelivery: drop sebelum kerja DB atau HTTP apa pun.
+        # Marker durable (Postgres) hanya untuk command yang memang memakai DB
+        durable = self.bot_handler.writes_db(update_data)
+        if self.dedup.is_duplicate(update_id, durable):
+            logger.info(f"Duplicate update {update_id}, skipped")
+            metrics.UPDATES_PROCESSED.labels("duplicate").inc()
+            span.set_attribute("update.duplicate", True)
+            return
         
-    def process_update(self, update_data: dict):
-        """Process single update dari queue"""
+        started = time.perf_counter()
         db = SessionLocal()
         try:
-            logger.info(f"Processing update {update_data.get('update_id')}")
+            logger.info(f"Processing update {update_id}{tracing.log_suffix()}")
             
             # Handle message
             if "message" in update_data:
@@ -30,26 +76,92 @@ class UpdateWorker:
             elif "callback_query" in update_data:
                 callback = update_data["callback_query"]
                 self.bot_handler.handle_callback(callback, db)
+            
+            self.dedup.mark_processed(update_id, durable)
+            metrics.UPDATES_PROCESSED.labels("ok").inc()
                 
         except Exception as e:
+            metrics.UPDATES_PROCESSED.labels("error").inc()
+            metrics.ERRORS.labels("worker").inc()
+            span.record_exception(e)
             logger.error(f"Error processing update: {e}")
         finally:
             db.close()
+            metrics.PROCESS_SECONDS.labels(kind).observe(time.perf_counter() - started)
     
     def start(self):
         """Start consuming messages dari queue"""
+        signal.signal(signal.SIGTERM, _handle_sigterm)
+        metrics.start_metrics_server()
+        try:
+            if self.concurrency > 1:
+                self._start_concurrent()
+            else:
+                self._start_serial()
+        finally:
+            self.bot_handler.close()
+            self.consumer.close()
+            tracing.get_tracer().shutdown()
+    
+    def _start_serial(self):
+        """Consume satu message per waktu"""
         logger.info("Worker started, waiting for updates...")
         
         def callback(ch, method, properties, body):
+            queue_wait = metrics.observe_queue_wait(properties)
             try:
-                update_data = json.loads(body)
-                self.process_update(update_data)
+                update_data = decode_update(body, properties.content_type)
+                self.process_update(update_data, tracing.extract(properties.headers), queue_wait)
                 ch.basic_ack(delivery_tag=method.delivery_tag)
             except Exception as e:
                 logger.error(f"Error in callback: {e}")
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
         
         self.consumer.consume(callback)
+    
+    def _start_concurrent(self):
+        """Consume dengan thread pool; ack dikirim setelah tiap update selesai"""
+        logger.info(
+            f"Worker started in concurrent mode "
+            f"(concurrency={self.concurrency}, prefetch={self.consumer.prefetch_count}), "
+            "waiting for updates..."
+        )
+        executor = ChatOrderedExecutor(max_workers=self.concurrency)
+        
+        def handle(ch, delivery_tag, update_data, trace_parent, queue_wait):
+            self.process_update(update_data, trace_parent, queue_wait)
+            # Channel pika tidak thread-safe, ack harus lewat thread koneksi
+            self.consumer.add_callback_threadsafe(
+                functools.partial(ch.basic_ack, delivery_tag=delivery_tag)
+            )
+        
+        def callback(ch, method, properties, body):
+            queue_wait = metrics.observe_queue_wait(properties)
+            try:
+                update_data = decode_update(body, properties.content_type)
+            except Exception as e:
+                logger.error(f"Error in callback: {e}")
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                return
+            
+            executor.submit(
+                get_chat_id(update_data),
+                handle, ch, method.delivery_tag, update_data,
+                tracing.extract(properties.headers), queue_wait
+            )
+        
+        def is_busy(shard):
+            # Shard dengan update yang belum selesai tidak dipindah saat rebalance
+            shards = self.consumer.shards
+            return any(shard_for(chat_id, shards) == shard for chat_id in executor.keys())
+        
+        try:
+            self.consumer.consume(callback, is_busy)
+        finally:
+            # Selesaikan update yang sedang jalan, lalu kirim ack-nya sebelum
+            # koneksi ditutup di start()
+            executor.shutdown(wait=True)
+            self.consumer.flush()
 
 if __name__ == "__main__":
     worker = UpdateWorker()
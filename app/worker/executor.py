@@ -0,0 +1,53 @@
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class ChatOrderedExecutor:
+    """
+    Thread pool terbatas yang menjaga urutan per key (chat_id).
+    Task dengan key berbeda jalan paralel, task dengan key sama
+    dijalankan berurutan sesuai urutan submit.
+    """
+
+    def __init__(self, max_workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="update-worker")
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> deque task yang menunggu giliran
+
+    def submit(self, key, fn, *args):
+        """Jadwalkan fn(*args); antre di belakang task lain dengan key yang sama"""
+        with self._lock:
+            queue = self._pending.get(key)
+            if queue is not None:
+                queue.append((fn, args))
+                return
+            self._pending[key] = deque()
+
+        self._pool.submit(self._run, key, fn, args)
+
+    def _run(self, key, fn, args):
+        """Jalankan task lalu lanjut ke task berikutnya untuk key yang sama"""
+        while True:
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.error(f"Task for key {key} failed: {e}")
+
+            with self._lock:
+                queue = self._pending[key]
+                if not queue:
+                    del self._pending[key]
+                    return
+                fn, args = queue.popleft()
+
+    def keys(self) -> list:
+        """Key yang masih punya task berjalan atau menunggu"""
+        with self._lock:
+            return list(self._pending)
+
+    def shutdown(self, wait: bool = True):
+        """Tunggu semua task selesai lalu matikan pool"""
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark AlertIndex: load alert dalam jumlah besar, lalu ukur latency per
+tick dan memori yang dipakai.
+
+Usage:
+    python benchmarks/bench_alerts.py                  # 1.000.000 alert
+    python benchmarks/bench_alerts.py --alerts 100000 --symbols 50
+    python benchmarks/bench_alerts.py --baseline       # bandingkan dengan scan linear
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.alert_engine import AlertIndex, ABOVE, BELOW
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AlertIndex")
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", action="store_true", help="ukur juga scan linear per tick")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    base_prices = {symbol: rng.uniform(100, 10000) for symbol in symbols}
+
+    alerts = []
+    for alert_id in range(1, args.alerts + 1):
+        symbol = rng.choice(symbols)
+        base = base_prices[symbol]
+        if rng.random() < 0.5:
+            alerts.append((alert_id, alert_id, symbol, ABOVE, base * rng.uniform(1.0, 1.5)))
+        else:
+            alerts.append((alert_id, alert_id, symbol, BELOW, base * rng.uniform(0.5, 1.0)))
+
+    tracemalloc.start()
+    index = AlertIndex()
+    started = time.perf_counter()
+    index.add_many(alerts)
+    load_seconds = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Loaded {len(index):,} alerts in {load_seconds:.2f}s "
+          f"({args.alerts / load_seconds:,.0f} alerts/s), index memory {memory / 1024 / 1024:.1f} MiB")
+
+    started = time.perf_counter()
+    for alert_id in range(args.alerts + 1, args.alerts + 1001):
+        symbol = rng.choice(symbols)
+        index.add(alert_id, alert_id, symbol, ABOVE, base_prices[symbol] * rng.uniform(1.0, 1.5))
+    print(f"Single add: {(time.perf_counter() - started) / 1000 * 1e6:.1f}µs per alert")
+
+    # Random walk harga kecil: kebanyakan tick tidak men-trigger apa pun
+    prices = dict(base_prices)
+    latencies = []
+    triggered = 0
+    for _ in range(args.ticks):
+        symbol = rng.choice(symbols)
+        prices[symbol] *= 1 + rng.uniform(-0.002, 0.002)
+        started = time.perf_counter()
+        triggered += len(index.on_tick(symbol, prices[symbol]))
+        latencies.append(time.perf_counter() - started)
+
+    print(f"Processed {args.ticks:,} ticks, {triggered:,} alerts triggered")
+    print(f"Tick latency: p50 {percentile(latencies, 50) * 1e6:.1f}µs | "
+          f"p99 {percentile(latencies, 99) * 1e6:.1f}µs | "
+          f"max {max(latencies) * 1e6:.1f}µs")
+
+    if args.baseline:
+        # Cara naif: scan semua alert di setiap tick
+        sample = 20
+        started = time.perf_counter()
+        for _ in range(sample):
+            symbol = rng.choice(symbols)
+            price = prices[symbol]
+            sum(
+                1 for _, _, s, direction, threshold in alerts
+                if s == symbol and (price >= threshold if direction == ABOVE else price <= threshold)
+            )
+        scan = (time.perf_counter() - started) / sample
+        print(f"Linear scan baseline: {scan * 1e3:.1f}ms per tick")
+
+
+if __name__ == "__main__":
+    main()
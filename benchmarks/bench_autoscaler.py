@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark policy autoscaler dengan simulator discrete-event (tanpa Docker/RabbitMQ).
+
+Trace bisa sintetis (burst, diurnal) atau rekaman dari autoscaler produksi
+(AUTOSCALER_TRACE_FILE). Threshold policy dibaca dari env yang sama dengan
+autoscaler, jadi nilai bisa dicoba sebelum di-deploy:
+
+Usage:
+    python benchmarks/bench_autoscaler.py
+    python benchmarks/bench_autoscaler.py --trace diurnal --worker-rate 3
+    python benchmarks/bench_autoscaler.py --trace data/autoscaler_trace.csv
+    SCALE_DRAIN_SECONDS=15 python benchmarks/bench_autoscaler.py --peak 120
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.autoscaler import create_policy, simulate, load_trace
+from app.autoscaler.simulator import burst_trace, diurnal_trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark policy autoscaler")
+    parser.add_argument("--trace", default="burst", help="burst | diurnal | path file trace")
+    parser.add_argument("--duration", type=int, default=1800, help="detik (trace sintetis)")
+    parser.add_argument("--base", type=float, default=5, help="pesan/detik di luar lonjakan")
+    parser.add_argument("--peak", type=float, default=40, help="pesan/detik puncak")
+    parser.add_argument("--worker-rate", type=float, default=5, help="pesan/detik per worker")
+    parser.add_argument("--startup-delay", type=float, default=10, help="detik sampai worker baru aktif")
+    parser.add_argument("--min-workers", type=int, default=1)
+    parser.add_argument("--max-workers", type=int, default=10)
+    parser.add_argument("--policies", default="threshold:30,threshold:5,rate:5",
+                        help="daftar policy:check_interval")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.trace == "burst":
+        trace = burst_trace(args.duration, args.base, args.peak)
+    elif args.trace == "diurnal":
+        trace = diurnal_trace(args.duration, args.base, args.peak)
+    else:
+        trace = load_trace(args.trace)
+
+    print(
+        f"trace={args.trace} {len(trace)}s, ~{sum(trace):,.0f} pesan, "
+        f"worker {args.worker_rate} pesan/detik, startup {args.startup_delay:.0f}s\n"
+    )
+    print(
+        f"{'policy':<10} {'check':>6} {'p50 wait':>9} {'p99 wait':>9} {'max wait':>9} "
+        f"{'worker-s':>9} {'scales':>7} {'osc':>5}"
+    )
+    for entry in args.policies.split(","):
+        name, _, check_interval = entry.partition(":")
+        check_interval = float(check_interval or 5)
+        policy = create_policy(name, min_workers=args.min_workers, max_workers=args.max_workers)
+        result = simulate(
+            policy, trace,
+            worker_rate=args.worker_rate,
+            startup_delay=args.startup_delay,
+            check_interval=check_interval,
+            seed=args.seed,
+        )
+        print(
+            f"{name:<10} {check_interval:>5.0f}s {result['p50_wait']:>8.2f}s {result['p99_wait']:>8.1f}s "
+            f"{result['max_wait']:>8.1f}s {result['worker_seconds']:>9.0f} "
+            f"{result['scale_events']:>7} {result['oscillations']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
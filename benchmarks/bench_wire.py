@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark format wire queue: ukuran body dan CPU encode/decode per update
+untuk JSON mentah vs envelope compact (msgpack v1).
+
+Usage:
+    python benchmarks/bench_wire.py
+    python benchmarks/bench_wire.py --updates 200000 --callbacks 0.3
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.queue.wire import (
+    encode_update,
+    decode_update,
+    CONTENT_TYPE_JSON,
+    CONTENT_TYPE_COMPACT_V1,
+)
+
+
+def make_update(rng: random.Random, update_id: int, callback: bool) -> dict:
+    """Update Telegram realistis (field lengkap seperti yang dikirim Bot API)"""
+    user_id = rng.randint(10_000_000, 9_999_999_999)
+    user = {
+        "id": user_id,
+        "is_bot": False,
+        "first_name": rng.choice(["Budi", "Siti", "Andi", "Dewi"]),
+        "last_name": rng.choice(["Santoso", "Wijaya", "Pratama"]),
+        "username": f"user{user_id % 100000}",
+        "language_code": "id",
+    }
+    chat = {
+        "id": user_id,
+        "first_name": user["first_name"],
+        "last_name": user["last_name"],
+        "username": user["username"],
+        "type": "private",
+    }
+    symbol = rng.choice(["BBCA", "BBRI", "TLKM", "GOTO", "ASII"])
+    message = {
+        "message_id": rng.randint(1, 1_000_000),
+        "from": user,
+        "chat": chat,
+        "date": 1760000000 + update_id,
+        "text": f"/harga {symbol}",
+        "entities": [{"offset": 0, "length": 6, "type": "bot_command"}],
+    }
+    if not callback:
+        return {"update_id": update_id, "message": message}
+
+    bot_message = dict(message, **{
+        "from": {"id": 1, "is_bot": True, "first_name": "Stock Bot", "username": "stock_bot"},
+        "text": f"📈 {symbol}\n\nHarga: Rp 9,500\nPerubahan: +1.20%",
+        "reply_markup": {"inline_keyboard": [[{"text": "ℹ️ Info Detail", "callback_data": f"stock_{symbol}"}]]},
+    })
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(rng.getrandbits(63)),
+            "from": user,
+            "message": bot_message,
+            "chat_instance": str(rng.getrandbits(63)),
+            "data": f"stock_{symbol}",
+        },
+    }
+
+
+# Update yang hanya berisi field envelope: decode harus persis sama dengan aslinya
+ROUND_TRIP_UPDATES = [
+    {"update_id": 1, "message": {
+        "message_id": 10, "chat": {"id": 42},
+        "from": {"id": 42, "username": "budi", "first_name": "Budi", "last_name": "Santoso"},
+        "text": "/harga BBCA",
+    }},
+    {"update_id": 2, "message": {"message_id": 11, "chat": {"id": -100}, "text": "BBRI"}},
+    {"update_id": 3, "callback_query": {
+        "id": "77", "from": {"id": 42, "first_name": "Budi"},
+        "message": {"message_id": 12, "chat": {"id": 42}}, "data": "stock_TLKM",
+    }},
+]
+
+
+def check_round_trip():
+    for content_type in (CONTENT_TYPE_JSON, CONTENT_TYPE_COMPACT_V1):
+        for update in ROUND_TRIP_UPDATES:
+            decoded = decode_update(*encode_update(update, content_type))
+            assert decoded == update, f"{content_type}: {decoded} != {update}"
+
+
+def run(updates: list, content_type: str) -> dict:
+    started = time.perf_counter()
+    bodies = [encode_update(update, content_type)[0] for update in updates]
+    encode_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for body in bodies:
+        decode_update(body, content_type)
+    decode_seconds = time.perf_counter() - started
+
+    return {
+        "bytes": sum(len(body) for body in bodies),
+        "encode_us": encode_seconds / len(updates) * 1e6,
+        "decode_us": decode_seconds / len(updates) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark format wire queue")
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--callbacks", type=float, default=0.2, help="proporsi callback_query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    updates = [make_update(rng, i, rng.random() < args.callbacks) for i in range(args.updates)]
+
+    check_round_trip()
+    # Hasil decode compact harus cukup untuk handler
+    for update in updates[:1000]:
+        decoded = decode_update(*encode_update(update, CONTENT_TYPE_COMPACT_V1))
+        if "message" in update:
+            assert decoded["message"]["chat"]["id"] == update["message"]["chat"]["id"]
+            assert decoded["message"]["text"] == update["message"]["text"]
+        else:
+            assert decoded["callback_query"]["data"] == update["callback_query"]["data"]
+
+    results = {
+        "json": run(updates, CONTENT_TYPE_JSON),
+        "msgpack v1": run(updates, CONTENT_TYPE_COMPACT_V1),
+    }
+
+    print(f"{args.updates:,} updates ({args.callbacks:.0%} callback_query)\n")
+    print(f"{'format':<12} {'avg bytes':>10} {'total MiB':>10} {'encode µs':>10} {'decode µs':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<12} {result['bytes'] / args.updates:>10.0f} "
+            f"{result['bytes'] / 1024 / 1024:>10.2f} "
+            f"{result['encode_us']:>10.2f} {result['decode_us']:>10.2f}"
+        )
+
+    baseline, compact = results["json"], results["msgpack v1"]
+    print(
+        f"\nmsgpack v1: {1 - compact['bytes'] / baseline['bytes']:.0%} lebih kecil, "
+        f"decode {baseline['decode_us'] / compact['decode_us']:.1f}x lebih cepat"
+    )
+
+
+if __name__ == "__main__":
+    main()
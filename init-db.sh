@@ -11,8 +11,7 @@ psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-E
     -- Grant all privileges
     GRANT ALL PRIVILEGES ON DATABASE $POSTGRES_DB TO $POSTGRES_USER;
     
-    -- Create indexes untuk performa (tables dibuat oleh SQLAlchemy)
-    -- Index akan ditambahkan setelah tables dibuat
+    -- Tables dan index dibuat oleh migrasi Alembic (alembic upgrade head)
     
     SELECT 'Database initialized successfully!' AS status;
 EOSQL
@@ -0,0 +1,117 @@
+"""initial schema
+
+Tabel yang sebelumnya dibuat oleh Base.metadata.create_all. Tabel yang
+sudah ada (database lama hasil init_db) dilewati, jadi upgrade aman
+dijalankan di database baru maupun lama.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    offline = context.is_offline_mode()
+    bind = op.get_bind()
+    existing = set() if offline else set(sa.inspect(bind).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+            sa.Column("username", sa.String(), nullable=True),
+            sa.Column("first_name", sa.String(), nullable=True),
+            sa.Column("last_name", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+
+    if "watchlist" not in existing:
+        op.create_table(
+            "watchlist",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("symbol", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.UniqueConstraint("user_id", "symbol", name="unique_user_symbol"),
+        )
+        op.create_index("ix_watchlist_id", "watchlist", ["id"])
+        op.create_index("ix_watchlist_symbol", "watchlist", ["symbol"])
+
+    if "price_alerts" not in existing:
+        op.create_table(
+            "price_alerts",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("chat_id", sa.BigInteger(), nullable=False),
+            sa.Column("symbol", sa.String(), nullable=False),
+            sa.Column("direction", sa.String(), nullable=False),
+            sa.Column("threshold", sa.Float(), nullable=False),
+            sa.Column("active", sa.Boolean(), nullable=False, server_default="true"),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("triggered_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_price_alerts_id", "price_alerts", ["id"])
+        op.create_index("ix_price_alerts_active_symbol", "price_alerts", ["active", "symbol"])
+        op.create_index("ix_price_alerts_user_active", "price_alerts", ["user_id", "active"])
+
+    if "stock_queries" not in existing:
+        # Tabel lama yang belum terpartisi dikonversi oleh app.database.maintenance
+        op.create_table(
+            "stock_queries",
+            sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("symbol", sa.String(), nullable=False),
+            sa.Column("query_type", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.PrimaryKeyConstraint("id", "created_at"),
+            postgresql_partition_by="RANGE (created_at)",
+        )
+        op.create_index("ix_stock_queries_symbol", "stock_queries", ["symbol"])
+        if bind.dialect.name == "postgresql":
+            op.execute("CREATE TABLE IF NOT EXISTS stock_queries_default PARTITION OF stock_queries DEFAULT")
+
+    if "stock_query_hourly" not in existing:
+        op.create_table(
+            "stock_query_hourly",
+            sa.Column("bucket", sa.DateTime(timezone=True), primary_key=True),
+            sa.Column("symbol", sa.String(), primary_key=True),
+            sa.Column("query_count", sa.Integer(), nullable=False),
+        )
+
+    if "stock_query_rollups" not in existing:
+        op.create_table(
+            "stock_query_rollups",
+            sa.Column("bucket", sa.DateTime(timezone=True), primary_key=True),
+            sa.Column("symbol", sa.String(), primary_key=True),
+            sa.Column("query_type", sa.String(), primary_key=True),
+            sa.Column("query_count", sa.Integer(), nullable=False),
+            sa.Column("user_count", sa.Integer(), nullable=False),
+        )
+
+    if bind.dialect.name == "postgresql" and not offline:
+        # Partisi untuk hari ini dan ke depan supaya insert langsung jalan
+        from app.database.maintenance import StockQueryMaintenance
+
+        maintenance = StockQueryMaintenance(None)
+        if maintenance.is_partitioned(bind):
+            maintenance.ensure_partitions(bind)
+
+
+def downgrade():
+    op.drop_table("stock_query_rollups")
+    op.drop_table("stock_query_hourly")
+    op.drop_table("stock_queries")
+    op.drop_table("price_alerts")
+    op.drop_table("watchlist")
+    op.drop_table("users")
@@ -0,0 +1,49 @@
+"""hot path indexes
+
+- price_alerts(id) WHERE active: keyset scan iter_active_alerts
+- stock_queries(symbol, created_at): analytics per symbol per rentang waktu
+- stock_query_hourly(bucket) INCLUDE (symbol, query_count): leaderboard
+  /populer sebagai index-only scan
+
+Lookup watchlist (user_id, symbol) sudah ditangani index unique_user_symbol.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_price_alerts_active_id",
+        "price_alerts",
+        ["id"],
+        postgresql_where=sa.text("active IS true"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_stock_queries_symbol_created_at",
+        "stock_queries",
+        ["symbol", "created_at"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_stock_query_hourly_bucket",
+        "stock_query_hourly",
+        ["bucket"],
+        postgresql_include=["symbol", "query_count"],
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_stock_query_hourly_bucket", table_name="stock_query_hourly")
+    op.drop_index("ix_stock_queries_symbol_created_at", table_name="stock_queries")
+    op.drop_index("ix_price_alerts_active_id", table_name="price_alerts")
@@ -0,0 +1,29 @@
+"""processed updates
+
+Marker update Telegram yang sudah diproses worker (deduplikasi update_id).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "processed_updates",
+        sa.Column("update_id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_processed_updates_processed_at", "processed_updates", ["processed_at"])
+
+
+def downgrade():
+    op.drop_index("ix_processed_updates_processed_at", table_name="processed_updates")
+    op.drop_table("processed_updates")
@@ -21,6 +21,7 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 BASE_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
 
 
 def set_webhook(webhook_url: str):
@@ -33,6 +34,9 @@ def set_webhook(webhook_url: str):
         "allowed_updates": ["message", "callback_query"],
         "drop_pending_updates": True  # Hapus pending updates
     }
+    if SECRET_TOKEN:
+        # Dikirim Telegram di header X-Telegram-Bot-Api-Secret-Token
+        payload["secret_token"] = SECRET_TOKEN
     
     try:
         response = requests.post(url, json=payload, timeout=10)